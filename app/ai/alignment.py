@@ -0,0 +1,87 @@
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+# ArcFace 5-point template in a 112x112 crop (left eye, right eye, nose, left/right mouth corner)
+ARCFACE_112 = np.array(
+    [[38.2946, 51.6963], [73.5318, 51.5014], [56.0252, 71.7366], [41.5493, 92.3655], [70.7299, 92.2041]],
+    dtype=np.float32,
+)
+
+
+def template(size: int, padding: float = 0.0) -> np.ndarray:
+    """把 112 模板缩放到 size×size 裁剪；padding>0 时人脸在裁剪中更小（留出头发/下巴）。"""
+    pts = (ARCFACE_112 - 56.0) / (1.0 + padding) + 56.0
+    return pts * (size / 112.0)
+
+
+def estimate_affine(landmarks: np.ndarray, size: int, padding: float = 0.0) -> np.ndarray:
+    """五点关键点 → 帧到裁剪的 2x3 相似变换。"""
+    M, _ = cv2.estimateAffinePartial2D(
+        np.asarray(landmarks, dtype=np.float32).reshape(5, 2), template(size, padding), method=cv2.LMEDS
+    )
+    if M is None:
+        raise ValueError("degenerate landmarks")
+    return M.astype(np.float32)
+
+
+def affine_from_bbox(bbox, size: int, scale: float = 1.3) -> np.ndarray:
+    """无关键点时的退化对齐：以 bbox 中心取边长 max(w,h)*scale 的正方形。"""
+    x1, y1, x2, y2 = bbox
+    side = max(x2 - x1, y2 - y1) * scale
+    s = size / max(side, 1.0)
+    cx, cy = (x1 + x2) / 2.0, (y1 + y2) / 2.0
+    return np.array([[s, 0, size / 2.0 - s * cx], [0, s, size / 2.0 - s * cy]], dtype=np.float32)
+
+
+def face_affine(detection, size: int, padding: float = 0.0) -> np.ndarray:
+    lm = getattr(detection, "landmarks", None)
+    if lm is not None:
+        try:
+            return estimate_affine(lm, size, padding)
+        except ValueError:
+            pass
+    return affine_from_bbox(detection.bbox, size, 1.3 * (1.0 + padding))
+
+
+def invert(M: np.ndarray) -> np.ndarray:
+    return cv2.invertAffineTransform(M).astype(np.float32)
+
+
+def warp_crop(frame: np.ndarray, M: np.ndarray, size: int, out: Optional[np.ndarray] = None) -> np.ndarray:
+    return cv2.warpAffine(frame, M, (size, size), dst=out, flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+
+
+def paste_roi(M_inv: np.ndarray, size: int, width: int, height: int) -> Optional[Tuple[int, int, int, int]]:
+    """裁剪四角经逆变换落在帧上的外接矩形 (x, y, w, h)，已裁剪到画面；完全在画面外时返回 None。"""
+    corners = np.array([[0, 0, 1], [size, 0, 1], [0, size, 1], [size, size, 1]], dtype=np.float32) @ M_inv.T
+    x1, y1 = np.floor(corners.min(axis=0)).astype(int)
+    x2, y2 = np.ceil(corners.max(axis=0)).astype(int)
+    x1, y1, x2, y2 = max(x1, 0), max(y1, 0), min(x2, width), min(y2, height)
+    if x2 <= x1 or y2 <= y1:
+        return None
+    return x1, y1, x2 - x1, y2 - y1
+
+
+def paste_back(crop: np.ndarray, M_inv: np.ndarray, dst: np.ndarray, blend_max: bool = True) -> None:
+    """
+    把对齐空间中的 crop（mask 或图像）经逆仿射贴回 dst，只在其外接矩形内做 warp。
+    blend_max=True 时与已有内容取最大值（多张脸的 mask 合并）。
+    """
+    h, w = dst.shape[:2]
+    roi = paste_roi(M_inv, crop.shape[0], w, h)
+    if roi is None:
+        return
+    x, y, rw, rh = roi
+    # Shift the inverse transform so it renders straight into the ROI view
+    M = M_inv.copy()
+    M[0, 2] -= x
+    M[1, 2] -= y
+    view = dst[y:y + rh, x:x + rw]
+    warped = cv2.warpAffine(crop, M, (rw, rh), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT, borderValue=0)
+    if blend_max:
+        cv2.max(view, warped, dst=view)
+    else:
+        np.copyto(view, warped)
@@ -1,7 +1,155 @@
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from .composition import AlphaCompositor
+from .face_tracking import expand_box
+
+
+@dataclass
+class _ColorMatch:
+    lut: np.ndarray  # 1x256x3 uint8, swapped -> target per channel
+    frame: int  # blend call index the LUT was built at
+    luma: float  # target mean brightness at build time
+    used: int = 0  # blend call index the LUT was last used at
+
+
 class FaceBlender:
-    def __init__(self):
-        pass
+    """
+    换脸结果融合到前景（原地写入 fgr）：
+    - 只处理人脸框外扩 margin 的 ROI，代价与人脸面积成正比；
+    - 腐蚀/羽化核按 ROI 尺寸（32px 量化）预计算缓存；
+    - 每个 track 的颜色匹配 LUT（按通道均值/方差对齐到目标肤色）每 lut_interval 帧
+      或目标亮度变化超过 relight_threshold 时才重新计算，其余帧只做一次 cv2.LUT；
+      连续 max_idle 次调用未出现的 track 丢弃其 LUT。
+    同一实例不可被多个线程并发使用（缓冲复用）。
+    """
+
+    def __init__(
+        self, margin: float = 0.2, lut_interval: int = 15, relight_threshold: float = 8.0, max_idle: int = 50
+    ):
+        self.margin = margin
+        self.lut_interval = lut_interval
+        self.relight_threshold = relight_threshold
+        self.max_idle = max_idle
+        self._engine = AlphaCompositor()
+        self._kernels: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+        self._luts: Dict[int, _ColorMatch] = {}
+        self._calls = 0
+        # Grow-only scratch buffers, used through ROI-sized views
+        self._mask_a = np.empty((0, 0), dtype=np.uint8)
+        self._mask_b = np.empty((0, 0), dtype=np.uint8)
+        self._face = np.empty((0, 0, 3), dtype=np.uint8)
+
+        self.lut_builds = 0
+
+    def blend(self, fgr, swapped_face, mask, detection=None, crops=None):
+        """
+        fgr: HxWx3 uint8 前景（被原地修改并返回）；swapped_face: 与 fgr 同尺寸的帧空间换脸图像
+        （仅 ROI 内有效）；mask: HxW uint8 人脸 mask。任一缺失时原样返回 fgr。
+        crops: 本帧的 FaceCrops，ROI 限制在换脸结果实际贴回的区域内。
+        """
+        if fgr is None or swapped_face is None or mask is None:
+            return fgr
+        self._calls += 1
+        self._prune()
+        h, w = fgr.shape[:2]
+        roi = self._roi(mask, detection, w, h, crops)
+        if roi is None:
+            return fgr
+        x1, y1, x2, y2 = roi
+        rh, rw = y2 - y1, x2 - x1
+        sl = (slice(y1, y2), slice(x1, x2))
+        self._ensure(rh, rw)
+
+        # Shrink then feather the mask so the seam falls inside the face
+        erode_k, gauss_k = self._kernels_for(max(rh, rw))
+        soft = self._mask_b[:rh, :rw]
+        cv2.erode(mask[sl], erode_k, dst=self._mask_a[:rh, :rw])
+        cv2.sepFilter2D(self._mask_a[:rh, :rw], -1, gauss_k, gauss_k, dst=soft)
+
+        face = self._face[:rh, :rw]
+        lut = self._color_lut(detection, swapped_face[sl], fgr[sl], mask[sl])
+        if lut is not None:
+            cv2.LUT(swapped_face[sl], lut, dst=face)
+        else:
+            np.copyto(face, swapped_face[sl])
+
+        view = fgr[sl]
+        self._engine.blend(face, soft, view, out=view)
+        return fgr
+
+    # ---- internals ----
+
+    def _prune(self) -> None:
+        # Tracks that left the frame (or were replaced by a new track id) stop being used
+        for tid in [t for t, cm in self._luts.items() if self._calls - cm.used > self.max_idle]:
+            del self._luts[tid]
+
+    def _roi(self, mask, detection, w: int, h: int, crops=None) -> Optional[Tuple[int, int, int, int]]:
+        if detection is not None:
+            box = expand_box(detection.bbox, self.margin, w, h)
+            pasted = crops.pasted(detection, "swap") if crops is not None else None
+            if pasted is not None:
+                # Outside the pasted region swapped_face holds no face pixels
+                box = (max(box[0], pasted[0]), max(box[1], pasted[1]), min(box[2], pasted[2]), min(box[3], pasted[3]))
+        else:
+            x, y, bw, bh = cv2.boundingRect(mask)
+            if bw == 0 or bh == 0:
+                return None
+            box = (x, y, x + bw, y + bh)
+        if box[2] - box[0] < 2 or box[3] - box[1] < 2:
+            return None
+        return box
+
+    def _ensure(self, h: int, w: int) -> None:
+        if self._mask_a.shape[0] >= h and self._mask_a.shape[1] >= w:
+            return
+        h, w = max(h, self._mask_a.shape[0]), max(w, self._mask_a.shape[1])
+        self._mask_a = np.empty((h, w), dtype=np.uint8)
+        self._mask_b = np.empty((h, w), dtype=np.uint8)
+        self._face = np.empty((h, w, 3), dtype=np.uint8)
+
+    def _kernels_for(self, side: int) -> Tuple[np.ndarray, np.ndarray]:
+        q = max(side // 32, 1)
+        k = self._kernels.get(q)
+        if k is None:
+            size = q * 32
+            e = max(int(size * 0.03) | 1, 3)
+            g = max(int(size * 0.08) | 1, 3)
+            k = self._kernels[q] = (
+                cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (e, e)),
+                cv2.getGaussianKernel(g, -1).astype(np.float32),
+            )
+        return k
 
-    def blend(self, fgr, swapped_face, mask):
-        # returns blended foreground
-        return None
\ No newline at end of file
+    def _color_lut(self, detection, src, dst, mask) -> Optional[np.ndarray]:
+        tid = getattr(detection, "track_id", -1)
+        luma = cv2.mean(dst, mask=mask)
+        luma = 0.114 * luma[0] + 0.587 * luma[1] + 0.299 * luma[2]
+        cm = self._luts.get(tid)
+        if (
+            cm is not None
+            and self._calls - cm.frame < self.lut_interval
+            and abs(luma - cm.luma) < self.relight_threshold
+        ):
+            cm.used = self._calls
+            return cm.lut
+        if cv2.countNonZero(mask) < 16:
+            if cm is None:
+                return None
+            cm.used = self._calls
+            return cm.lut
+        # Per-channel mean/std transfer inside the face mask
+        ms, ss = cv2.meanStdDev(src, mask=mask)
+        mt, st = cv2.meanStdDev(dst, mask=mask)
+        v = np.arange(256, dtype=np.float32)
+        lut = np.empty((1, 256, 3), dtype=np.uint8)
+        for c in range(3):
+            gain = float(st[c, 0]) / max(float(ss[c, 0]), 1.0)
+            lut[0, :, c] = np.clip((v - ms[c, 0]) * gain + mt[c, 0] + 0.5, 0, 255).astype(np.uint8)
+        self._luts[tid] = _ColorMatch(lut, self._calls, luma, self._calls)
+        self.lut_builds += 1
+        return lut
@@ -1,7 +1,115 @@
+from typing import Optional, Tuple, Union
+
+import cv2
+import numpy as np
+
+
+Roi = Tuple[int, int, int, int]  # x, y, w, h
+
+
+def to_alpha_u8(pha) -> np.ndarray:
+    """把 alpha 统一为 HxW uint8（0..255）；float 输入视为 0..1。"""
+    if pha.ndim == 3:
+        pha = pha[..., 0]
+    if pha.dtype == np.uint8:
+        return pha
+    return cv2.convertScaleAbs(pha, alpha=255.0)
+
+
+def alpha_bbox(alpha_u8: np.ndarray) -> Optional[Roi]:
+    """alpha>0 区域的外接矩形；全透明时返回 None。"""
+    x, y, w, h = cv2.boundingRect(alpha_u8)
+    if w == 0 or h == 0:
+        return None
+    return x, y, w, h
+
+
+class AlphaCompositor:
+    """
+    uint8 alpha 合成引擎：out = fgr*a/255 + bgr*(255-a)/255（误差不超过 1 LSB）。
+    - 全程 uint8 缓冲，使用 OpenCV 饱和运算（SIMD），不产生 float32 临时数组；中间缓冲按分辨率预分配复用。
+    - roi="auto" 时只处理 alpha>0 的外接矩形，其余像素直接取背景。
+    - 同一实例不可被多个线程并发使用（缓冲复用）。
+    """
+
+    def __init__(self):
+        self._shape = None
+        self._a3: Optional[np.ndarray] = None  # alpha broadcast to 3 channels
+        self._inv: Optional[np.ndarray] = None  # 255 - alpha
+        self._t1: Optional[np.ndarray] = None
+        self._t2: Optional[np.ndarray] = None
+        self._alpha: Optional[np.ndarray] = None  # resized alpha
+
+    def _ensure(self, h: int, w: int):
+        # Grow-only: callers blending varying ROIs (e.g. face boxes) reuse views of the largest buffers
+        if self._shape is not None and self._shape[0] >= h and self._shape[1] >= w:
+            return
+        if self._shape is not None:
+            h, w = max(h, self._shape[0]), max(w, self._shape[1])
+        self._shape = (h, w)
+        self._a3 = np.empty((h, w, 3), dtype=np.uint8)
+        self._inv = np.empty((h, w, 3), dtype=np.uint8)
+        self._t1 = np.empty((h, w, 3), dtype=np.uint8)
+        self._t2 = np.empty((h, w, 3), dtype=np.uint8)
+        self._alpha = np.empty((h, w), dtype=np.uint8)
+
+    def blend(
+        self,
+        fgr: np.ndarray,
+        pha: np.ndarray,
+        bgr: Optional[np.ndarray] = None,
+        out: Optional[np.ndarray] = None,
+        roi: Union[str, Roi, None] = "auto",
+    ) -> np.ndarray:
+        """
+        fgr/bgr: HxWx3 uint8（bgr 为 None 时视为黑底，须与 fgr 同尺寸）；pha: HxW(x1) uint8 或 0..1 float。
+        out: 输出缓冲（可与 bgr 相同）；为 None 时新分配。
+        """
+        h, w = fgr.shape[:2]
+        self._ensure(h, w)
+        a = to_alpha_u8(pha)
+        if a.shape[:2] != (h, w):
+            a = cv2.resize(a, (w, h), dst=self._alpha[:h, :w], interpolation=cv2.INTER_LINEAR)
+
+        if out is None:
+            out = np.empty_like(fgr)
+        if bgr is None:
+            out.fill(0)
+        elif bgr is not out:
+            np.copyto(out, bgr)
+
+        if roi == "auto":
+            roi = alpha_bbox(a)
+            if roi is None:
+                return out
+        elif roi is None:
+            roi = (0, 0, w, h)
+        x, y, rw, rh = roi
+        sl = (slice(y, y + rh), slice(x, x + rw))
+
+        # ROI views into the preallocated buffers; OpenCV writes into them in place
+        b = out[sl]
+        a3 = self._a3[:rh, :rw]
+        inv = self._inv[:rh, :rw]
+        t1 = self._t1[:rh, :rw]
+        t2 = self._t2[:rh, :rw]
+        al = a[sl]
+        cv2.merge((al, al, al), dst=a3)
+        cv2.bitwise_not(a3, dst=inv)
+        cv2.multiply(fgr[sl], a3, dst=t1, scale=1.0 / 255.0)
+        cv2.multiply(b, inv, dst=t2, scale=1.0 / 255.0)
+        cv2.add(t1, t2, dst=b)
+        return out
+
+
 class Composer:
     def __init__(self):
-        pass
+        self.engine = AlphaCompositor()
 
-    def compose(self, final_fgr, pha, bgr):
+    def compose(self, final_fgr, pha, bgr, out=None):
         # Final_Image = final_fgr * pha + bgr * (1.0 - pha)
-        return None
\ No newline at end of file
+        if final_fgr is None or pha is None:
+            return final_fgr
+        if bgr is not None and bgr.shape[:2] != final_fgr.shape[:2]:
+            bgr = cv2.resize(bgr, (final_fgr.shape[1], final_fgr.shape[0]), interpolation=cv2.INTER_AREA)
+        return self.engine.blend(final_fgr, pha, bgr, out=out)
@@ -0,0 +1,182 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Tuple
+
+from ..config import settings
+from . import runtime
+
+
+logger = logging.getLogger("fusion.pipeline")
+
+DFM_DIR = os.path.join(settings.models_dir, "dfm")
+DFM_EXTENSIONS = (".dfm", ".onnx")
+
+
+def list_dfm_models() -> list:
+    """可选的换脸模型：assets/models/dfm 下的 .dfm/.onnx，以及默认的 dfl.onnx。"""
+    out = []
+    default = os.path.join(settings.models_dir, "dfl.onnx")
+    if os.path.exists(default):
+        out.append(default)
+    if os.path.isdir(DFM_DIR):
+        out.extend(
+            os.path.join(DFM_DIR, n) for n in sorted(os.listdir(DFM_DIR)) if n.lower().endswith(DFM_EXTENSIONS)
+        )
+    return out
+
+
+def resolve_dfm_path(path: str) -> str:
+    if not os.path.isabs(path):
+        path = os.path.join(DFM_DIR, path)
+    if not os.path.isfile(path):
+        raise FileNotFoundError(path)
+    return path
+
+
+@dataclass
+class _Entry:
+    session: object
+    device: str
+    nbytes: int
+    load_s: float
+    last_used: float = field(default_factory=time.monotonic)
+
+
+Key = Tuple[str, str, int, int]  # runtime.registry.key: (model path, provider, device id, threads)
+
+
+class DfmModelCache:
+    """
+    换脸模型会话缓存：
+    - prewarm() 在后台线程经 ai.runtime 创建会话并预热，同一模型的并发请求只加载一次；
+    - 保留最近使用的模型，按模型文件大小估算内存，超出 budget_mb 或 max_models 时淘汰最久未用的；
+    - 正在被流水线使用的模型（pin）不会被淘汰。
+    """
+
+    def __init__(self, budget_mb: int = settings.dfm_cache_mb, max_models: int = settings.dfm_cache_models):
+        self.budget_bytes = budget_mb * 1024 * 1024
+        self.max_models = max(max_models, 1)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Key, _Entry]" = OrderedDict()
+        self._loading: Dict[Key, Future] = {}
+        self._pins: Dict[Key, int] = {}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="DfmLoad")
+
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(path: str, device=None) -> Key:
+        # Same identity as the shared session registry: device and thread budget, not just the group name
+        return runtime.registry.key(path, device)
+
+    def get(self, path: str, device=None):
+        """已加载则返回会话（并标记为最近使用），否则 None。"""
+        k = self.key(path, device)
+        with self._lock:
+            entry = self._entries.get(k)
+            if entry is None:
+                return None
+            entry.last_used = time.monotonic()
+            self._entries.move_to_end(k)
+            self.hits += 1
+            return entry.session
+
+    def prewarm(self, path: str, device=None) -> Future:
+        """后台加载并预热；返回 Future[session]。已加载时立即完成。"""
+        session = self.get(path, device)
+        if session is not None:
+            fut: Future = Future()
+            fut.set_result(session)
+            return fut
+        k = self.key(path, device)
+        with self._lock:
+            fut = self._loading.get(k)
+            if fut is None:
+                fut = self._loading[k] = self._executor.submit(self._load, k, device)
+            return fut
+
+    def pin(self, path: str, device=None) -> None:
+        k = self.key(path, device)
+        with self._lock:
+            self._pins[k] = self._pins.get(k, 0) + 1
+
+    def unpin(self, path: str, device=None) -> None:
+        k = self.key(path, device)
+        with self._lock:
+            n = self._pins.get(k, 0) - 1
+            if n > 0:
+                self._pins[k] = n
+            else:
+                self._pins.pop(k, None)
+            self._evict()
+
+    def state(self, path: str, device=None) -> str:
+        k = self.key(path, device)
+        with self._lock:
+            if k in self._entries:
+                return "ready"
+            return "loading" if k in self._loading else "cold"
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "models": [
+                    {
+                        "path": k[0],
+                        "device": e.device,
+                        "threads": k[3],
+                        "mb": round(e.nbytes / 1048576, 1),
+                        "load_s": round(e.load_s, 3),
+                        "pinned": k in self._pins,
+                    }
+                    for k, e in self._entries.items()
+                ],
+                "loading": [k[0] for k in self._loading],
+                "used_mb": round(sum(e.nbytes for e in self._entries.values()) / 1048576, 1),
+                "budget_mb": self.budget_bytes // 1048576,
+                "hits": self.hits,
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }
+
+    # ---- internals ----
+
+    def _load(self, k: Key, device):
+        path = k[0]
+        try:
+            t0 = time.perf_counter()
+            session = runtime.registry.create_session(path, device)
+            runtime.registry.warmup(session, path)
+            name = device.name if device is not None else "cpu"
+            entry = _Entry(session, name, os.path.getsize(path), time.perf_counter() - t0)
+            with self._lock:
+                self._entries[k] = entry
+                self._entries.move_to_end(k)
+                self.loads += 1
+                self._evict()
+            logger.info("dfm model ready: %s (%.2fs)", os.path.basename(path), entry.load_s)
+            return session
+        finally:
+            with self._lock:
+                self._loading.pop(k, None)
+
+    def _evict(self) -> None:
+        # Caller holds the lock. Oldest unpinned entries go first.
+        def over() -> bool:
+            used = sum(e.nbytes for e in self._entries.values())
+            return len(self._entries) > self.max_models or used > self.budget_bytes
+
+        for k in list(self._entries):
+            if not over():
+                break
+            if k in self._pins:
+                continue
+            del self._entries[k]
+            self.evictions += 1
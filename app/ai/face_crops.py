@@ -0,0 +1,95 @@
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from . import alignment
+
+
+Key = Tuple[int, float]  # (crop size, padding)
+
+
+@dataclass
+class AlignedFace:
+    detection: object
+    affines: Dict[Key, Tuple[np.ndarray, np.ndarray]] = field(default_factory=dict)  # key -> (M, M_inv)
+    crops: Dict[Key, np.ndarray] = field(default_factory=dict)
+    # Frame-space boxes (x1, y1, x2, y2) written by paste(), by role ("mask", "swap", ...)
+    pasted: Dict[str, Tuple[int, int, int, int]] = field(default_factory=dict)
+
+
+class FaceCrops:
+    """
+    单帧的对齐人脸缓存，随 FramePacket 在解析 → 换脸 → 融合之间传递，按 track_id 区分人脸：
+    - 每个 padding 的仿射只估计一次，其他尺寸按比例缩放得到，矩阵与逆矩阵都缓存；
+    - 裁剪按需生成、只生成一次：同一 padding 已有更大的裁剪时由它缩放得到，否则才对整帧做 warpAffine；
+    - paste() 经缓存的逆矩阵贴回帧空间，并记录贴回区域，供融合阶段确定 ROI。
+    borrow(shape) 提供裁剪缓冲（流水线中借自帧的缓冲池，随帧归还）。
+    """
+
+    def __init__(self, frame: np.ndarray, borrow: Optional[Callable[[tuple], np.ndarray]] = None):
+        self.frame = frame
+        self._borrow = borrow
+        self._faces: Dict[int, AlignedFace] = {}
+        self.warps = 0
+        self.resizes = 0
+        self.hits = 0
+
+    def face(self, det) -> AlignedFace:
+        tid = getattr(det, "track_id", -1)
+        key = tid if tid >= 0 else -1 - id(det)
+        f = self._faces.get(key)
+        if f is None:
+            f = self._faces[key] = AlignedFace(det)
+        return f
+
+    def affine(self, det, size: int, padding: float = 0.0) -> Tuple[np.ndarray, np.ndarray]:
+        """(M, M_inv)：帧 → size×size 对齐裁剪及其逆变换。"""
+        f = self.face(det)
+        k = (size, padding)
+        m = f.affines.get(k)
+        if m is None:
+            ref = next(((s, M) for (s, p), (M, _) in f.affines.items() if p == padding), None)
+            # The template scales linearly with crop size, so other sizes of one aligned space only rescale M
+            M = ref[1] * (size / ref[0]) if ref is not None else alignment.face_affine(det, size, padding)
+            m = f.affines[k] = (M, alignment.invert(M))
+        return m
+
+    def crop(self, det, size: int, padding: float = 0.0) -> np.ndarray:
+        """size×size 的 BGR 对齐裁剪（只读，同帧内各阶段共用）。"""
+        f = self.face(det)
+        k = (size, padding)
+        c = f.crops.get(k)
+        if c is not None:
+            self.hits += 1
+            return c
+        out = self._borrow((size, size, 3)) if self._borrow is not None else None
+        # Same aligned space at a larger size: a small resize instead of another full-frame warp
+        larger = [s for (s, p) in f.crops if p == padding and s > size]
+        if larger:
+            c = cv2.resize(f.crops[(min(larger), padding)], (size, size), dst=out, interpolation=cv2.INTER_AREA)
+            self.resizes += 1
+        else:
+            c = alignment.warp_crop(self.frame, self.affine(det, size, padding)[0], size, out=out)
+            self.warps += 1
+        f.crops[k] = c
+        return c
+
+    def paste(self, det, crop: np.ndarray, padding: float, dst: np.ndarray, role: str, blend_max: bool = True) -> bool:
+        """把对齐空间中的 crop 贴回帧空间 dst，并记录该人脸此角色的贴回区域；完全在画面外时返回 False。"""
+        _, M_inv = self.affine(det, crop.shape[0], padding)
+        h, w = dst.shape[:2]
+        roi = alignment.paste_roi(M_inv, crop.shape[0], w, h)
+        if roi is None:
+            return False
+        alignment.paste_back(crop, M_inv, dst, blend_max=blend_max)
+        x, y, rw, rh = roi
+        self.face(det).pasted[role] = (int(x), int(y), int(x + rw), int(y + rh))
+        return True
+
+    def pasted(self, det, role: str) -> Optional[Tuple[int, int, int, int]]:
+        return self.face(det).pasted.get(role)
+
+    def stats(self) -> dict:
+        return {"faces": len(self._faces), "warps": self.warps, "resizes": self.resizes, "hits": self.hits}
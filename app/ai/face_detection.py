@@ -1,18 +1,154 @@
+import os
 from dataclasses import dataclass
-from typing import Any, List, Tuple
+from typing import Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..config import settings
+from . import retinaface_post as post
+from . import runtime
+from .face_tracking import Box, FaceTracker
+
+
+MODEL_FILE = "retinaface_mnet.onnx"
 
 
 @dataclass
 class Detection:
-    bbox: Tuple[int, int, int, int]
+    bbox: Tuple[int, int, int, int]  # x1, y1, x2, y2
     score: float
+    # Stable across frames while the face is tracked; -1 when tracking is disabled
+    track_id: int = -1
+    landmarks: Any = None  # 5x2 float32 (eyes, nose, mouth corners) when the model provides them
 
 
 class FaceDetector:
-    def __init__(self, device_id: int = 0):
-        self.device_id = device_id
-        # TODO: load ONNX RetinaFace model via onnxruntime-gpu
+    """
+    人脸检测。tracking=True 时完整检测只在关键帧 / 跟踪丢失 / 每 detect_interval 帧运行，
+    中间帧由 FaceTracker 的光流传播人脸框；返回值仍为 List[Detection]（附 track_id）。
+    """
+
+    def __init__(
+        self,
+        device_id: int = 0,
+        device=None,
+        tracking: bool = True,
+        detect_interval: int = 10,
+        min_track_confidence: float = 0.5,
+        roi_margin: float = 0.5,
+        input_size: Tuple[int, int] = (640, 640),
+        roi_input_size: Tuple[int, int] = (320, 320),
+        conf_thresh: float = 0.5,
+        nms_thresh: float = 0.4,
+        model_path: Optional[str] = None,
+    ):
+        # device: processing.placement.DeviceGroup (provider, thread budget); None = default CPU session
+        self.device = device
+        self.device_id = device.device_id if device is not None else device_id
+        self.tracker: Optional[FaceTracker] = (
+            FaceTracker(detect_interval, min_confidence=min_track_confidence, roi_margin=roi_margin)
+            if tracking
+            else None
+        )
+        self.input_size = input_size
+        self.roi_input_size = roi_input_size
+        self.conf_thresh = conf_thresh
+        self.nms_thresh = nms_thresh
+        self.model_path = model_path or os.path.join(settings.models_dir, MODEL_FILE)
+        self.session = None
+        self._runner: Optional[runtime.BoundRunner] = None
+        self._input_name = None
+        self._max_batch: Optional[int] = None
+        if os.path.exists(self.model_path):
+            self._load()
+
+    def _load(self):
+        self.session = runtime.get_session(self.model_path, self.device)
+        self._runner = runtime.BoundRunner(self.session)
+        inp = self.session.get_inputs()[0]
+        self._input_name = inp.name
+        if isinstance(inp.shape[0], int):
+            self._max_batch = inp.shape[0]
+        h, w = inp.shape[2], inp.shape[3]
+        if isinstance(h, int) and isinstance(w, int):
+            # Static-shape export: every call must use the model's own size
+            self.input_size = self.roi_input_size = (h, w)
+
+    def detect(self, frame, pyramid=None) -> List[Detection]:
+        # pyramid: the frame's shared FramePyramid, if any (full detection and tracking take their downscales from it)
+        if frame is None:
+            return []
+        if self.tracker is None:
+            return self._detect_full(frame, pyramid)
+        tracks = self.tracker.step(frame, lambda f: self._detect_full(f, pyramid), self._detect_roi, pyramid)
+        return [
+            Detection(bbox=bbox, score=score, track_id=tid, landmarks=landmarks)
+            for tid, bbox, score, landmarks in tracks
+        ]
+
+    def detect_batch(self, frames) -> List[List[Detection]]:
+        # Offline/batch entry point: with tracking frames go in order, otherwise one batched model call
+        if self.tracker is not None:
+            return [self.detect(f) for f in frames]
+        return self._run_batch(frames, self.input_size)
+
+    def set_detect_interval(self, n: int) -> None:
+        if self.tracker is not None:
+            self.tracker.detect_interval = max(int(n), 1)
+
+    def keyframe(self) -> None:
+        """场景切换 / 输入源变化：下一帧强制完整检测。"""
+        if self.tracker is not None:
+            self.tracker.keyframe()
+
+    def reset(self) -> None:
+        if self.tracker is not None:
+            self.tracker.reset()
+
+    def stats(self) -> dict:
+        return self.tracker.stats() if self.tracker is not None else {}
+
+    def _detect_full(self, frame, pyramid=None) -> List[Detection]:
+        if pyramid is None:
+            return self._run_batch([frame], self.input_size)[0]
+        # Fitted level from the pyramid: prepare_batch only pads it, boxes are scaled back to the frame
+        ih, iw = self.input_size
+        img, r = pyramid.fit(iw, ih)
+        return self._run_batch([img], self.input_size, scale=r, size=frame.shape[:2])[0]
+
+    def _detect_roi(self, frame, roi: Box) -> List[Detection]:
+        # Re-detect inside an expanded track box only, then map back to frame coordinates
+        x1, y1, x2, y2 = roi
+        if x2 - x1 < 16 or y2 - y1 < 16:
+            return []
+        dets = self._run_batch([frame[y1:y2, x1:x2]], self.roi_input_size)[0]
+        for d in dets:
+            bx1, by1, bx2, by2 = d.bbox
+            d.bbox = (bx1 + x1, by1 + y1, bx2 + x1, by2 + y1)
+            if d.landmarks is not None:
+                d.landmarks = d.landmarks + (x1, y1)
+        return dets
 
-    def detect(self, frame) -> List[Detection]:
-        # TODO: implement detection + tracking optimization
-        return []
\ No newline at end of file
+    def _run_batch(
+        self, imgs: Sequence[Any], input_size: Tuple[int, int], scale: float = 1.0, size: Optional[Tuple[int, int]] = None
+    ) -> List[List[Detection]]:
+        # Detections in each image's own coordinates; no model -> no faces.
+        # scale/size: imgs are already downscaled by `scale` from frames of `size` (h, w), map back to those
+        if self.session is None or not len(imgs):
+            return [[] for _ in imgs]
+        if self._max_batch and len(imgs) > self._max_batch:
+            n = self._max_batch
+            return [d for i in range(0, len(imgs), n) for d in self._run_batch(imgs[i:i + n], input_size)]
+        blob, scales = post.prepare_batch(imgs, input_size)
+        if scale != 1.0:
+            scales = [s * scale for s in scales]
+        loc, conf, landms = self._runner.run({self._input_name: blob})[:3]
+        faces = post.postprocess(
+            loc, conf, landms, input_size, scales, conf_thresh=self.conf_thresh, nms_thresh=self.nms_thresh
+        )
+        out = []
+        for (img, (boxes, scores, pts)) in zip(imgs, faces):
+            h, w = size or img.shape[:2]
+            boxes = np.clip(np.rint(boxes), 0, [w, h, w, h]).astype(int)
+            out.append([Detection(tuple(b.tolist()), float(sc), landmarks=lm) for b, sc, lm in zip(boxes, scores, pts)])
+        return out
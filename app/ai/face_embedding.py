@@ -0,0 +1,53 @@
+import os
+from typing import Optional
+
+import numpy as np
+
+from ..config import settings
+from . import runtime
+from . import alignment
+from .face_detection import FaceDetector
+
+
+MODEL_FILE = "arcface.onnx"
+ALIGN_SIZE = 112
+
+
+class FaceEncoder:
+    """
+    源人脸编码：检测 → 五点对齐到 112×112 → 编码。
+    有 arcface.onnx 时输出 L2 归一化的身份向量；否则输出对齐后的人脸（CHW float32, [0,1]），
+    供以源图为条件的换脸模型直接使用。
+    """
+
+    def __init__(self, device=None, model_path: Optional[str] = None):
+        self.device = device
+        self.detector = FaceDetector(device=device, tracking=False)
+        self.model_path = model_path or os.path.join(settings.models_dir, MODEL_FILE)
+        self.session = None
+        if os.path.exists(self.model_path):
+            self.session = runtime.get_session(self.model_path, device)
+
+    def encode_image(self, img: np.ndarray) -> np.ndarray:
+        """对一张源图编码；未检测到人脸时抛 ValueError。"""
+        dets = self.detector.detect(img)
+        if not dets and self.detector.session is not None:
+            raise ValueError("No face found in source image")
+        if dets:
+            det = max(dets, key=lambda d: (d.bbox[2] - d.bbox[0]) * (d.bbox[3] - d.bbox[1]))
+            M = alignment.face_affine(det, ALIGN_SIZE)
+        else:
+            # No detector model yet: treat the whole image as the face crop
+            h, w = img.shape[:2]
+            M = alignment.affine_from_bbox((0, 0, w, h), ALIGN_SIZE, scale=1.0)
+        crop = alignment.warp_crop(img, M, ALIGN_SIZE)
+        return self.encode_crop(crop)
+
+    def encode_crop(self, crop: np.ndarray) -> np.ndarray:
+        chw = crop[:, :, ::-1].transpose(2, 0, 1).astype(np.float32)
+        if self.session is None:
+            return np.ascontiguousarray(chw / 255.0)
+        # ArcFace input: RGB, (x - 127.5) / 127.5
+        blob = ((chw - 127.5) / 127.5)[None]
+        emb = self.session.run(None, {self.session.get_inputs()[0].name: blob})[0][0].astype(np.float32)
+        return emb / max(float(np.linalg.norm(emb)), 1e-6)
@@ -1,8 +1,134 @@
+import os
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence
+
+import cv2
+import numpy as np
+
+from ..config import settings
+from . import runtime
+from .face_crops import FaceCrops
+
+
+MODEL_FILE = "bisenet.onnx"
+# CelebAMask-HQ labels kept in the swap mask: skin, brows, eyes, glasses, nose, mouth, lips
+FACE_CLASSES = (1, 2, 3, 4, 5, 6, 10, 11, 12, 13)
+_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32) * 255.0
+_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32) * 255.0
+
+
+@dataclass
+class _Parsed:
+    landmarks: np.ndarray  # frame-space points the mask was computed for
+    mask: np.ndarray  # size x size uint8 in aligned space
+    age: int = 0
+
+
 class FaceParsing:
-    def __init__(self):
-        # TODO: load BiSeNet onnx model
-        pass
+    """
+    人脸解析（BiSeNet）：只对对齐后的人脸裁剪（模型原生尺寸）推理，再经逆仿射把 mask 贴回整帧。
+    同一 track 的关键点自上次解析后位移小于 reuse_threshold（相对两眼距离）时，直接复用对齐空间中的
+    上次 mask、按当前变换贴回，不再推理；最多连续复用 max_reuse 帧。
+    """
+
+    def __init__(
+        self,
+        device=None,
+        size: int = 512,
+        padding: float = 0.25,
+        reuse_threshold: float = 0.03,
+        max_reuse: int = 5,
+        model_path: Optional[str] = None,
+    ):
+        self.device = device  # DeviceGroup the BiSeNet session runs on
+        self.padding = padding
+        self.reuse_threshold = reuse_threshold
+        self.max_reuse = max_reuse
+        self.model_path = model_path or os.path.join(settings.models_dir, MODEL_FILE)
+        self.session = None
+        if os.path.exists(self.model_path):
+            self.session = runtime.get_session(self.model_path, device)
+        self._input_name = None
+        self._runner = None
+        # Static-shape exports only accept their native size; set_size() is a no-op for them
+        self.dynamic = False
+        if self.session is not None:
+            inp = self.session.get_inputs()[0]
+            self._input_name = inp.name
+            self._runner = runtime.BoundRunner(self.session)
+            self.dynamic = not all(isinstance(d, int) for d in inp.shape[2:])
+            if not self.dynamic:
+                size = int(inp.shape[2])
+        self.size = size
+        self._want_size = size
+        self._lut = np.zeros(256, dtype=np.uint8)
+        self._lut[list(FACE_CLASSES)] = 255
+        self._blob = np.empty((1, 3, size, size), dtype=np.float32)
+        self._cache: Dict[int, _Parsed] = {}
+
+        self.inferences = 0
+        self.reused = 0
+
+    def stats(self) -> dict:
+        return {"inferences": self.inferences, "reused": self.reused, "tracks": len(self._cache), "size": self.size}
+
+    def set_size(self, size: int) -> None:
+        """调整对齐裁剪边长（仅动态输入的模型）；在下一次 parse() 开始时生效。"""
+        if self.dynamic:
+            self._want_size = int(size)
+
+    def parse(self, frame, detections: Sequence = (), out: Optional[np.ndarray] = None, crops: Optional[FaceCrops] = None):
+        """返回整帧 HxW uint8 人脸 mask（写入 out），无模型 / 无人脸时返回 None。crops：本帧共享的对齐裁剪。"""
+        if self.session is None or frame is None or not detections:
+            self._cache.clear()
+            return None
+        if self._want_size != self.size:
+            self._resize(self._want_size)
+        if crops is None:
+            crops = FaceCrops(frame)
+        h, w = frame.shape[:2]
+        mask = out if out is not None else np.empty((h, w), dtype=np.uint8)
+        mask.fill(0)
+        seen = set()
+        for det in detections:
+            crop_mask = self._crop_mask(crops, det)
+            seen.add(det.track_id)
+            crops.paste(det, crop_mask, self.padding, mask, "mask")
+        # Forget faces that left the frame
+        for tid in [t for t in self._cache if t not in seen]:
+            del self._cache[tid]
+        return mask
+
+    def parse_crop(self, crop: np.ndarray) -> np.ndarray:
+        """对已对齐的 size×size 裁剪推理，返回同尺寸 uint8 mask。"""
+        # HWC BGR uint8 -> normalised RGB NCHW, into the preallocated blob
+        rgb = self._blob[0]
+        np.subtract(crop[:, :, ::-1].transpose(2, 0, 1), _MEAN[:, None, None], out=rgb, casting="unsafe")
+        rgb /= _STD[:, None, None]
+        logits = self._runner.run({self._input_name: self._blob})[0]
+        self.inferences += 1
+        labels = logits[0].argmax(axis=0).astype(np.uint8)
+        return cv2.LUT(labels, self._lut)
+
+    def _resize(self, size: int) -> None:
+        self.size = size
+        self._blob = np.empty((1, 3, size, size), dtype=np.float32)
+        # Cached masks live in the old aligned space
+        self._cache.clear()
 
-    def parse(self, face_crop):
-        # returns segmentation and refined mask
-        return None
\ No newline at end of file
+    def _crop_mask(self, crops: FaceCrops, det) -> np.ndarray:
+        tid = det.track_id
+        lm = getattr(det, "landmarks", None)
+        prev = self._cache.get(tid) if tid >= 0 else None
+        if prev is not None and lm is not None and prev.age < self.max_reuse:
+            eye = max(float(np.linalg.norm(lm[1] - lm[0])), 1.0)
+            moved = float(np.abs(lm - prev.landmarks).max()) / eye
+            if moved < self.reuse_threshold:
+                # Face barely moved: the aligned-space mask is still valid, only the transform changes
+                prev.age += 1
+                self.reused += 1
+                return prev.mask
+        crop_mask = self.parse_crop(crops.crop(det, self.size, self.padding))
+        if tid >= 0 and lm is not None:
+            self._cache[tid] = _Parsed(np.array(lm, dtype=np.float32), crop_mask)
+        return crop_mask
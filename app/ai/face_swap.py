@@ -1,8 +1,155 @@
+import logging
+import os
+import threading
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from ..config import settings
+from .dfm_cache import DfmModelCache
+from .face_crops import FaceCrops
+
+
+logger = logging.getLogger("fusion.pipeline")
+
+
 class FaceSwap:
-    def __init__(self):
-        # TODO: load DFL/SAEHD onnx model and cache source embedding in GPU
-        pass
+    """
+    换脸：在本帧共享的对齐裁剪（模型原生尺寸）上推理，结果经逆仿射贴回帧空间（只写人脸区域）。
+    DFM（DeepFaceLive）模型输入 NHWC BGR [0,1] 的人脸，输出中取 celeb_face；带第二个输入的模型额外喂源人脸向量。
+    """
+
+    # Aligned crop margin, same meaning as FaceParsing.padding
+    padding = 0.25
+    default_size = 224
+
+    def __init__(self, device=None, models: Optional[DfmModelCache] = None, model_path: Optional[str] = None):
+        self.device = device  # DeviceGroup the DFL session runs on
+        # Shared across sessions so a model prewarmed from the API is ready for every stream
+        self.models = models or DfmModelCache()
+        # (path, session) swapped in one assignment, so a frame sees either the old or the new model
+        self._active = (None, None)
+        self._pending = None  # (path, Future) while a selected model loads in the background
+        # Guards _pending/_active between the API thread (use_model) and the swap thread (_poll_pending)
+        self._lock = threading.Lock()
+        self.last_error: Optional[str] = None
+        self._layout_for = None  # (session, layout) of the active model
+        self.default_model = model_path or os.path.join(settings.models_dir, "dfl.onnx")
+        if os.path.exists(self.default_model):
+            self.use_model(self.default_model)
+        # source_embedding comes from processing.embeddings.SourceEmbeddingCache (encoded once per image)
+
+    @property
+    def model_path(self) -> Optional[str]:
+        return self._active[0]
+
+    def use_model(self, path: str) -> str:
+        """选择换脸模型：已预热则立即切换（"ready"），否则后台加载，加载完成后在帧间切换（"loading"）。"""
+        fut = self.models.prewarm(path, self.device)
+        with self._lock:
+            if fut.done() and fut.exception() is None:
+                self._pending = None
+                self._activate(path, fut.result())
+                return "ready"
+            self._pending = (path, fut)
+            return "loading"
+
+    def stats(self) -> dict:
+        pending = self._pending
+        return {
+            "model": self.model_path,
+            "pending": pending[0] if pending else None,
+            "last_error": self.last_error,
+        }
+
+    def swap(self, frame, detection, source_embedding, crops: Optional[FaceCrops] = None, out=None):
+        """返回帧空间的换脸图像（out，只有贴回区域有效，区域记在 crops 的 "swap" 角色下）；无模型时 None。"""
+        return self.swap_batch([frame], [detection], source_embedding, [crops], [out])[0]
+
+    def swap_batch(
+        self,
+        frames: Sequence,
+        detections: Sequence,
+        source_embedding,
+        crops: Optional[Sequence[Optional[FaceCrops]]] = None,
+        outs: Optional[Sequence] = None,
+    ) -> List:
+        """
+        多帧换脸（离线批处理）：各帧人脸的对齐裁剪堆叠成一个 N×H×W×3 输入，一次模型调用；
+        batch 维固定的模型按其大小分块（不足时补零）。detections[i] 为 None 的帧跳过，返回与 frames 对应的列表。
+        """
+        self._poll_pending()
+        n = len(frames)
+        results: List = [None] * n
+        session = self._active[1]
+        todo = [i for i in range(n) if frames[i] is not None and detections[i] is not None]
+        if session is None or not todo:
+            return results
+        crops = list(crops) if crops is not None else [None] * n
+        outs = list(outs) if outs is not None else [None] * n
+        for i in todo:
+            if crops[i] is None:
+                crops[i] = FaceCrops(frames[i])
+        nhwc, size, face_name = self._layout(session)
+        inputs = session.get_inputs()
+        fixed = inputs[0].shape[0] if isinstance(inputs[0].shape[0], int) else None
+        step = fixed or len(todo)
+        for k in range(0, len(todo), step):
+            chunk = todo[k:k + step]
+            blob = np.zeros((fixed or len(chunk), size, size, 3), dtype=np.float32)
+            for j, i in enumerate(chunk):
+                np.multiply(crops[i].crop(detections[i], size, self.padding), 1.0 / 255.0, out=blob[j], casting="unsafe")
+            feeds = {inputs[0].name: blob if nhwc else blob.transpose(0, 3, 1, 2)}
+            if len(inputs) > 1 and source_embedding is not None:
+                emb = np.asarray(source_embedding, dtype=np.float32).reshape(1, -1)
+                feeds[inputs[1].name] = np.repeat(emb, len(blob), axis=0)
+            result = session.run([face_name], feeds)[0][: len(chunk)]
+            if not nhwc:
+                result = result.transpose(0, 2, 3, 1)
+            faces = np.clip(result * 255.0 + 0.5, 0, 255).astype(np.uint8)
+            for i, face in zip(chunk, faces):
+                out = outs[i] if outs[i] is not None else np.empty_like(frames[i])
+                if crops[i].paste(detections[i], face, self.padding, out, "swap", blend_max=False):
+                    results[i] = out
+        return results
+
+    def _layout(self, session):
+        # (nhwc, crop size, face output name), cached per session
+        cached = self._layout_for
+        if cached is not None and cached[0] is session:
+            return cached[1]
+        shape = session.get_inputs()[0].shape
+        nhwc = shape[-1] == 3
+        dims = shape[1:3] if nhwc else shape[2:4]
+        size = dims[0] if isinstance(dims[0], int) else self.default_size
+        names = [o.name for o in session.get_outputs()]
+        face = next((n for n in names if "celeb_face" in n and "mask" not in n), names[0])
+        layout = (nhwc, size, face)
+        self._layout_for = (session, layout)
+        return layout
+
+    def _poll_pending(self):
+        if self._pending is None:
+            return  # common case, no lock on the per-frame path
+        with self._lock:
+            pending = self._pending
+            if pending is None or not pending[1].done():
+                return
+            self._pending = None
+            path, fut = pending
+            exc = fut.exception()
+            if exc is not None:
+                self.last_error = f"{type(exc).__name__}: {exc}"
+                logger.warning("dfm model load failed: %s: %s", path, self.last_error)
+                return
+            self._activate(path, fut.result())
 
-    def swap(self, frame, detection, source_embedding):
-        # returns swapped face image aligned to target
-        return None
\ No newline at end of file
+    def _activate(self, path: str, session) -> None:
+        # Caller holds self._lock
+        old = self._active[0]
+        if old == path:
+            return
+        self.models.pin(path, self.device)
+        self._active = (path, session)
+        if old is not None:
+            self.models.unpin(old, self.device)
@@ -0,0 +1,278 @@
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+Box = Tuple[int, int, int, int]  # x1, y1, x2, y2 in frame pixels
+
+# Lucas-Kanade parameters for bbox propagation
+_LK_PARAMS = dict(
+    winSize=(21, 21),
+    maxLevel=3,
+    criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03),
+)
+
+
+def iou(a: Box, b: Box) -> float:
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(ix2 - ix1, 0) * max(iy2 - iy1, 0)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def expand_box(box: Box, margin: float, width: int, height: int) -> Box:
+    """按比例外扩 bbox 并裁剪到画面内。"""
+    x1, y1, x2, y2 = box
+    dx, dy = (x2 - x1) * margin, (y2 - y1) * margin
+    return (
+        max(int(x1 - dx), 0),
+        max(int(y1 - dy), 0),
+        min(int(x2 + dx), width),
+        min(int(y2 + dy), height),
+    )
+
+
+@dataclass
+class Track:
+    track_id: int
+    bbox: Tuple[float, float, float, float]
+    score: float
+    landmarks: Optional[np.ndarray] = None  # 5x2, moved with the box between detections
+    points: Optional[np.ndarray] = None  # Nx1x2 float32 in tracking-image coordinates
+    seeded: int = 0
+    confidence: float = 1.0
+    age: int = 0  # frames since the last model detection
+
+
+class FaceTracker:
+    """
+    检测 + 跟踪：仅在关键帧、跟踪丢失或每 detect_interval 帧时运行完整检测；
+    其余帧用金字塔 LK 光流（前后向校验）在缩小的灰度图上传播每个人脸框。
+    光流置信度低于 min_confidence 时只在外扩 roi_margin 的区域内重新检测。
+    跨完整检测按 IoU 关联，保持 track_id 稳定。
+    """
+
+    def __init__(
+        self,
+        detect_interval: int = 10,
+        min_confidence: float = 0.5,
+        roi_margin: float = 0.5,
+        match_iou: float = 0.3,
+        max_points: int = 40,
+        track_width: int = 640,
+    ):
+        self.detect_interval = max(int(detect_interval), 1)
+        self.min_confidence = min_confidence
+        self.roi_margin = roi_margin
+        self.match_iou = match_iou
+        self.max_points = max_points
+        self.track_width = track_width
+        self.tracks: List[Track] = []
+        self._prev_gray: Optional[np.ndarray] = None
+        # Tracker-owned copy of the previous gray frame (pyramid levels are pooled per frame)
+        self._prev_buf: Optional[np.ndarray] = None
+        self._scale = 1.0
+        self._since_full = 0
+        self._force = True
+        self._next_id = 0
+
+        self.full_detections = 0
+        self.roi_detections = 0
+        self.tracked_frames = 0
+        self.lost = 0
+
+    def keyframe(self) -> None:
+        """下一帧强制完整检测（场景切换、输入源变化时调用）。"""
+        self._force = True
+
+    def reset(self) -> None:
+        self.tracks = []
+        self._prev_gray = None
+        self._force = True
+
+    def stats(self) -> dict:
+        return {
+            "tracks": len(self.tracks),
+            "full_detections": self.full_detections,
+            "roi_detections": self.roi_detections,
+            "tracked_frames": self.tracked_frames,
+            "lost": self.lost,
+        }
+
+    def step(
+        self,
+        frame: np.ndarray,
+        detect_full: Callable[[np.ndarray], list],
+        detect_roi: Callable[[np.ndarray, Box], list],
+        pyramid=None,
+    ) -> List[Tuple[int, Box, float, Optional[np.ndarray]]]:
+        """处理一帧，返回 [(track_id, bbox, score, landmarks)]，按分数降序。pyramid 为该帧共享的 FramePyramid（可选）。"""
+        gray = self._gray(frame, pyramid)
+        h, w = frame.shape[:2]
+        self._since_full += 1
+        need_full = (
+            self._force
+            or self._prev_gray is None
+            or self._prev_gray.shape != gray.shape
+            or self._since_full >= self.detect_interval
+        )
+
+        if not need_full and self.tracks:
+            kept: List[Track] = []
+            for track in self.tracks:
+                if self._propagate(track, gray):
+                    if track.confidence < self.min_confidence:
+                        # Weak flow: confirm with the model in an expanded ROI only
+                        self.roi_detections += 1
+                        roi = expand_box(self._int_box(track.bbox, w, h), self.roi_margin, w, h)
+                        dets = detect_roi(frame, roi)
+                        best = self._best_match(track.bbox, dets)
+                        if best is None:
+                            self.lost += 1
+                            need_full = True
+                            continue
+                        self._refresh(track, best, gray)
+                    kept.append(track)
+                else:
+                    self.lost += 1
+                    need_full = True
+            self.tracks = kept
+            if not need_full:
+                self.tracked_frames += 1
+
+        if need_full:
+            self.full_detections += 1
+            self._associate(detect_full(frame), gray)
+            self._since_full = 0
+            self._force = False
+
+        if pyramid is not None:
+            # The pyramid's gray level goes back to the buffer pool with its frame and is reused
+            # by later frames: keep a private copy, or the next flow step compares a frame to itself
+            if self._prev_buf is None or self._prev_buf.shape != gray.shape:
+                self._prev_buf = np.empty_like(gray)
+            np.copyto(self._prev_buf, gray)
+            gray = self._prev_buf
+        self._prev_gray = gray
+        out = [(t.track_id, self._int_box(t.bbox, w, h), t.score * t.confidence, t.landmarks) for t in self.tracks]
+        out.sort(key=lambda item: -item[2])
+        return out
+
+    # ---- internals ----
+
+    def _gray(self, frame: np.ndarray, pyramid=None) -> np.ndarray:
+        h, w = frame.shape[:2]
+        self._scale = min(self.track_width / float(w), 1.0)
+        size = (max(int(round(w * self._scale)), 1), max(int(round(h * self._scale)), 1))
+        if pyramid is not None and frame.ndim == 3:
+            # Same rounding as the detector's fitted level, so a 640-wide frame level is shared
+            return pyramid.gray(*size)
+        if self._scale < 1.0:
+            frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+
+    @staticmethod
+    def _int_box(b, w: int, h: int) -> Box:
+        return (
+            int(np.clip(b[0], 0, w)),
+            int(np.clip(b[1], 0, h)),
+            int(np.clip(b[2], 0, w)),
+            int(np.clip(b[3], 0, h)),
+        )
+
+    def _seed(self, track: Track, gray: np.ndarray) -> None:
+        s = self._scale
+        x1, y1, x2, y2 = (int(v * s) for v in track.bbox)
+        # Inner 80% of the box: avoid background corners that move differently
+        mx, my = (x2 - x1) // 10, (y2 - y1) // 10
+        x1, y1, x2, y2 = max(x1 + mx, 0), max(y1 + my, 0), min(x2 - mx, gray.shape[1]), min(y2 - my, gray.shape[0])
+        pts = None
+        if x2 - x1 >= 8 and y2 - y1 >= 8:
+            pts = cv2.goodFeaturesToTrack(gray[y1:y2, x1:x2], self.max_points, 0.01, 3)
+        if pts is None or len(pts) < 4:
+            # Low-texture face: fall back to a regular grid
+            xs, ys = np.meshgrid(np.linspace(0, max(x2 - x1 - 1, 0), 5), np.linspace(0, max(y2 - y1 - 1, 0), 5))
+            pts = np.stack([xs.ravel(), ys.ravel()], axis=1).reshape(-1, 1, 2)
+        pts = pts.astype(np.float32)
+        pts[:, 0, 0] += x1
+        pts[:, 0, 1] += y1
+        track.points = pts
+        track.seeded = len(pts)
+
+    def _propagate(self, track: Track, gray: np.ndarray) -> bool:
+        if track.points is None or len(track.points) < 4:
+            return False
+        p0 = track.points
+        p1, st, _ = cv2.calcOpticalFlowPyrLK(self._prev_gray, gray, p0, None, **_LK_PARAMS)
+        if p1 is None:
+            return False
+        # Forward-backward consistency rejects points that drifted onto the background
+        pb, st_b, _ = cv2.calcOpticalFlowPyrLK(gray, self._prev_gray, p1, None, **_LK_PARAMS)
+        fb = np.linalg.norm((p0 - pb).reshape(-1, 2), axis=1)
+        good = (st.ravel() == 1) & (st_b.ravel() == 1) & (fb < 1.0)
+        n = int(good.sum())
+        if n < 4:
+            return False
+        a, b = p0[good].reshape(-1, 2), p1[good].reshape(-1, 2)
+        d = np.median(b - a, axis=0)
+        # Scale from the spread of the point cloud around its median
+        sa = np.median(np.linalg.norm(a - np.median(a, axis=0), axis=1))
+        sb = np.median(np.linalg.norm(b - np.median(b, axis=0), axis=1))
+        scale = float(sb / sa) if sa > 1e-3 else 1.0
+
+        inv = 1.0 / self._scale
+        x1, y1, x2, y2 = track.bbox
+        cx, cy = (x1 + x2) / 2 + d[0] * inv, (y1 + y2) / 2 + d[1] * inv
+        hw, hh = (x2 - x1) / 2 * scale, (y2 - y1) / 2 * scale
+        track.bbox = (cx - hw, cy - hh, cx + hw, cy + hh)
+        if track.landmarks is not None:
+            # Same similarity (shift + scale about the box centre) as the box
+            c0 = np.array([(x1 + x2) / 2, (y1 + y2) / 2], dtype=np.float32)
+            track.landmarks = (track.landmarks - c0) * scale + np.array([cx, cy], dtype=np.float32)
+        track.points = p1[good].reshape(-1, 1, 2)
+        track.confidence = n / float(max(track.seeded, 1))
+        track.age += 1
+        return True
+
+    def _best_match(self, bbox, dets) -> Optional[object]:
+        best, best_iou = None, 0.0
+        for det in dets:
+            o = iou(tuple(bbox), det.bbox)
+            if o > best_iou:
+                best, best_iou = det, o
+        return best if best_iou >= self.match_iou else None
+
+    def _refresh(self, track: Track, det, gray: np.ndarray) -> None:
+        track.bbox = tuple(float(v) for v in det.bbox)
+        track.score = det.score
+        track.landmarks = getattr(det, "landmarks", None)
+        track.confidence = 1.0
+        track.age = 0
+        self._seed(track, gray)
+
+    def _associate(self, dets, gray: np.ndarray) -> None:
+        # Greedy IoU matching keeps IDs stable; the detector is authoritative for everything else
+        pairs = sorted(
+            ((iou(tuple(t.bbox), d.bbox), ti, di) for ti, t in enumerate(self.tracks) for di, d in enumerate(dets)),
+            reverse=True,
+        )
+        used_t, used_d, tracks = set(), set(), []
+        for o, ti, di in pairs:
+            if o < self.match_iou or ti in used_t or di in used_d:
+                continue
+            used_t.add(ti)
+            used_d.add(di)
+            track = self.tracks[ti]
+            self._refresh(track, dets[di], gray)
+            tracks.append(track)
+        for di, det in enumerate(dets):
+            if di in used_d:
+                continue
+            track = Track(self._next_id, tuple(float(v) for v in det.bbox), det.score, getattr(det, "landmarks", None))
+            self._next_id += 1
+            self._seed(track, gray)
+            tracks.append(track)
+        self.tracks = tracks
@@ -1,8 +1,168 @@
+import os
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from ..config import settings
+from . import runtime
+
+
+MODEL_FILE = "rvm.onnx"
+STATE_NAMES = ("r1", "r2", "r3", "r4")
+
+
+def auto_downsample_ratio(height: int, width: int, target: int = 512) -> float:
+    """按输入分辨率选择 downsample_ratio，使 RVM 内部推理尺寸（长边）约为 target。"""
+    # Quantised to 1/16 so small resolution jitter does not change the internal shape
+    ratio = min(1.0, target / float(max(height, width)))
+    return max(round(ratio * 16) / 16, 1 / 16)
+
+
 class HumanMatting:
-    def __init__(self):
-        # TODO: load RVM onnx model
-        self.state = None  # r1i, r2i ... placeholder
+    """
+    RVM（Robust Video Matting）引擎：
+    - r1..r4 循环状态保存在预分配的双缓冲中，经 IO binding 原地读写，帧间不分配内存；
+    - 检测到场景切换（缩略图平均差超过阈值）、分辨率变化或调用 reset() 时清零状态；
+    - downsample_ratio 按分辨率自动选择，内部推理尺寸近似恒定，抠图耗时不随输出分辨率增长。
+    """
+
+    def __init__(
+        self,
+        device=None,
+        target_size: int = 512,
+        scene_cut_threshold: float = 40.0,
+        model_path: Optional[str] = None,
+    ):
+        self.device = device  # DeviceGroup the RVM session runs on
+        self.target_size = target_size
+        self.scene_cut_threshold = scene_cut_threshold
+        self.model_path = model_path or os.path.join(settings.models_dir, MODEL_FILE)
+        self.session = None
+        if os.path.exists(self.model_path):
+            self.session = runtime.get_session(self.model_path, device)
+
+        # Per-resolution buffers, (re)built by _allocate
+        self._shape: Optional[Tuple[int, int]] = None
+        self._ratio = np.zeros(1, dtype=np.float32)
+        self._src: Optional[np.ndarray] = None  # 1x3xHxW float32 RGB [0,1]
+        self._fgr: Optional[np.ndarray] = None  # 1x3xHxW
+        self._pha: Optional[np.ndarray] = None  # 1x1xHxW
+        self._hwc: Optional[np.ndarray] = None  # HxWx3 float32 scratch for the BGR uint8 conversion
+        self.state: Optional[List[List[np.ndarray]]] = None  # [ping, pong] x (r1..r4)
+        self._cur = 0
+        self._thumb: Optional[np.ndarray] = None
+        self._pending_reset = True
+
+        self.resets = 0
+        self.scene_cuts = 0
+
+    @property
+    def downsample_ratio(self) -> float:
+        return float(self._ratio[0])
+
+    def reset(self) -> None:
+        """下一帧从零状态开始（输入源切换时调用）。"""
+        self._pending_reset = True
+
+    def set_target_size(self, target_size: int) -> None:
+        if target_size != self.target_size:
+            self.target_size = target_size
+            # Recurrent state shapes depend on the internal size, so rebuild on the next frame
+            self._shape = None
+
+    def stats(self) -> dict:
+        return {
+            "downsample_ratio": self.downsample_ratio,
+            "resets": self.resets,
+            "scene_cuts": self.scene_cuts,
+        }
+
+    def infer(self, frame, out=None, pyramid=None):
+        # returns fgr, pha; out=(fgr_buf HxWx3 uint8, pha_buf HxW uint8) preallocated by the caller;
+        # pyramid: the frame's shared FramePyramid, if any (scene-cut thumbnail)
+        if self.session is None or frame is None:
+            return None, None
+        h, w = frame.shape[:2]
+        if self._shape != (h, w):
+            self._allocate(h, w)
+        if self._is_scene_cut(frame, pyramid):
+            self.scene_cuts += 1
+            self._pending_reset = True
+        if self._pending_reset:
+            self._zero_state()
+
+        # BGR uint8 HWC -> RGB float32 NCHW in one pass into the preallocated input
+        np.multiply(frame[:, :, ::-1].transpose(2, 0, 1), 1.0 / 255.0, out=self._src[0], casting="unsafe")
+        if self.state is None:
+            self._first_run()
+        else:
+            self._run_bound()
+
+        fgr_out, pha_out = out if out is not None else (np.empty((h, w, 3), np.uint8), np.empty((h, w), np.uint8))
+        np.multiply(self._fgr[0, ::-1].transpose(1, 2, 0), 255.0, out=self._hwc)
+        cv2.convertScaleAbs(self._hwc, dst=fgr_out)
+        cv2.convertScaleAbs(self._pha[0, 0], dst=pha_out, alpha=255.0)
+        return fgr_out, pha_out
+
+    # ---- internals ----
+
+    def _allocate(self, h: int, w: int) -> None:
+        self._shape = (h, w)
+        self._ratio[0] = auto_downsample_ratio(h, w, self.target_size)
+        self._src = np.empty((1, 3, h, w), dtype=np.float32)
+        self._fgr = np.empty((1, 3, h, w), dtype=np.float32)
+        self._pha = np.empty((1, 1, h, w), dtype=np.float32)
+        self._hwc = np.empty((h, w, 3), dtype=np.float32)
+        # State shapes are only known after one run at this resolution/ratio
+        self.state = None
+        self._thumb = None
+        self._pending_reset = True
+
+    def _zero_state(self) -> None:
+        self._pending_reset = False
+        self.resets += 1
+        if self.state is not None:
+            for buf in self.state[self._cur]:
+                buf.fill(0)
+
+    def _is_scene_cut(self, frame, pyramid=None) -> bool:
+        if pyramid is not None:
+            # Pyramid levels go back to the pool with the frame; keep a private copy for the next comparison
+            thumb = pyramid.get(64, 36).copy()
+        else:
+            thumb = cv2.resize(frame, (64, 36), interpolation=cv2.INTER_AREA)
+        prev, self._thumb = self._thumb, thumb
+        if prev is None:
+            return False
+        return float(cv2.norm(thumb, prev, cv2.NORM_L1)) / thumb.size > self.scene_cut_threshold
+
+    def _first_run(self) -> None:
+        # Zero [1,1,1,1] states are the documented RVM initial input; the outputs tell us the real shapes
+        zero = np.zeros((1, 1, 1, 1), dtype=np.float32)
+        feeds = {"src": self._src, "downsample_ratio": self._ratio}
+        feeds.update({f"{n}i": zero for n in STATE_NAMES})
+        names = ["fgr", "pha"] + [f"{n}o" for n in STATE_NAMES]
+        outs = self.session.run(names, feeds)
+        np.copyto(self._fgr, outs[0])
+        np.copyto(self._pha, outs[1])
+        ping = [np.ascontiguousarray(o) for o in outs[2:]]
+        self.state = [ping, [np.empty_like(o) for o in ping]]
+        self._cur = 0
+
+    def _run_bound(self) -> None:
+        import onnxruntime as ort
 
-    def infer(self, frame):
-        # returns fgr, pha
-        return None, None
\ No newline at end of file
+        cur, nxt = self.state[self._cur], self.state[1 - self._cur]
+        io = self.session.io_binding()
+        io.bind_cpu_input("src", self._src)
+        io.bind_cpu_input("downsample_ratio", self._ratio)
+        for name, buf in zip(STATE_NAMES, cur):
+            io.bind_cpu_input(f"{name}i", buf)
+        # Outputs land directly in our buffers: fgr/pha and the other half of the state ping-pong
+        io.bind_ortvalue_output("fgr", ort.OrtValue.ortvalue_from_numpy(self._fgr))
+        io.bind_ortvalue_output("pha", ort.OrtValue.ortvalue_from_numpy(self._pha))
+        for name, buf in zip(STATE_NAMES, nxt):
+            io.bind_ortvalue_output(f"{name}o", ort.OrtValue.ortvalue_from_numpy(buf))
+        self.session.run_with_iobinding(io)
+        self._cur = 1 - self._cur
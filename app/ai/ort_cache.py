@@ -0,0 +1,169 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from typing import Dict, Optional, Tuple
+
+from ..config import settings
+
+
+logger = logging.getLogger("fusion.pipeline")
+
+INDEX_FILE = "index.json"
+# Initializers at least this large go to a side file that ORT memory-maps on load
+EXTERNAL_MIN_BYTES = 1024
+# <stem>.<hash16>.ort<version>.<provider><ext>[.data]
+_ARTIFACT_RE = re.compile(r"^(?P<stem>.+)\.[0-9a-f]{16}\.ort[^/]+?\.(?P<tail>[a-z0-9]+\.(?:ort|onnx))(?:\.data)?$")
+
+
+def _provider_tag(provider: str) -> str:
+    return provider.replace("ExecutionProvider", "").lower() or "cpu"
+
+
+class OptimizedModelCache:
+    """
+    ORT 图优化结果的磁盘缓存：首次加载时把优化后的模型序列化到 cache_dir，之后直接加载，跳过图优化。
+    - 产物文件名包含 (模型内容 SHA-256, onnxruntime 版本, provider)，任一变化即换新文件，旧产物随之清理；
+    - CPU 保存为 ORT 格式，加载时直接使用读入的字节（不再二次拷贝初始化器）；
+      GPU 保存为 ONNX 格式，较大的初始化器写到旁路 .data 文件，由 ORT 内存映射加载；
+    - 模型哈希按 (路径, mtime, size) 记在 index.json，重启时不必重读整个模型文件。
+    """
+
+    def __init__(self, cache_dir: str = settings.ort_cache_dir, enabled: bool = settings.ort_cache):
+        self.cache_dir = cache_dir
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._index: Optional[Dict[str, list]] = None
+        self.hits = 0
+        self.misses = 0
+        self.failures = 0
+
+    # ---- keys ----
+
+    def digest(self, model_path: str) -> str:
+        st = os.stat(model_path)
+        stamp = [st.st_mtime_ns, st.st_size]
+        with self._lock:
+            index = self._load_index()
+            entry = index.get(model_path)
+            if entry is not None and entry[:2] == stamp:
+                return entry[2]
+        h = hashlib.sha256()
+        with open(model_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        with self._lock:
+            self._load_index()[model_path] = stamp + [digest]
+            self._save_index()
+        return digest
+
+    def artifact(self, model_path: str, provider: str) -> str:
+        import onnxruntime as ort
+
+        stem = os.path.splitext(os.path.basename(model_path))[0]
+        ext = ".ort" if _provider_tag(provider) == "cpu" else ".onnx"
+        name = f"{stem}.{self.digest(model_path)[:16]}.ort{ort.__version__}.{_provider_tag(provider)}{ext}"
+        return os.path.join(self.cache_dir, name)
+
+    # ---- load / store ----
+
+    def open(self, artifact: str, so) -> Tuple[object, object]:
+        """已有产物时返回 (path_or_bytes, 调整后的 SessionOptions)，否则 (None, so)。"""
+        if not os.path.exists(artifact):
+            self.misses += 1
+            return None, so
+        import onnxruntime as ort
+
+        # Already optimised for this ORT version and provider
+        so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+        if artifact.endswith(".ort"):
+            with open(artifact, "rb") as f:
+                data = f.read()
+            # The session keeps a reference to these bytes and uses them in place
+            so.add_session_config_entry("session.use_ort_model_bytes_directly", "1")
+            so.add_session_config_entry("session.use_ort_model_bytes_for_initializers", "1")
+            return data, so
+        return artifact, so
+
+    def prepare_save(self, artifact: str, so) -> str:
+        """让本次会话创建把优化结果写到临时文件；返回临时路径，成功后交给 commit()。"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp = f"{artifact}.tmp{os.getpid()}.{threading.get_ident()}"
+        so.optimized_model_filepath = tmp
+        if artifact.endswith(".ort"):
+            so.add_session_config_entry("session.save_model_format", "ORT")
+        else:
+            # Relative to the model file; named after the final artifact so the rename keeps it valid
+            so.add_session_config_entry(
+                "session.optimized_model_external_initializers_file_name", os.path.basename(artifact) + ".data"
+            )
+            so.add_session_config_entry(
+                "session.optimized_model_external_initializers_min_size_in_bytes", str(EXTERNAL_MIN_BYTES)
+            )
+        return tmp
+
+    def commit(self, tmp: str, artifact: str) -> None:
+        if not os.path.exists(tmp):
+            return
+        os.replace(tmp, artifact)
+        self._prune(artifact)
+        logger.info("saved optimized model %s", os.path.basename(artifact))
+
+    def discard(self, artifact: str) -> None:
+        """产物无法加载（损坏或不兼容）时删除，下次重新生成。"""
+        self.failures += 1
+        for p in (artifact, artifact + ".data"):
+            try:
+                os.remove(p)
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "dir": self.cache_dir,
+            "hits": self.hits,
+            "misses": self.misses,
+            "failures": self.failures,
+        }
+
+    # ---- internals ----
+
+    def _prune(self, artifact: str) -> None:
+        # Other artifacts of the same model and provider are stale (old hash or ORT version)
+        name = os.path.basename(artifact)
+        m = _ARTIFACT_RE.match(name)
+        for other in os.listdir(self.cache_dir):
+            o = _ARTIFACT_RE.match(other)
+            if o is None or other in (name, name + ".data"):
+                continue
+            if (o.group("stem"), o.group("tail")) == (m.group("stem"), m.group("tail")):
+                try:
+                    os.remove(os.path.join(self.cache_dir, other))
+                except OSError:
+                    pass
+
+    def _load_index(self) -> Dict[str, list]:
+        # Caller holds the lock
+        if self._index is None:
+            try:
+                with open(os.path.join(self.cache_dir, INDEX_FILE)) as f:
+                    self._index = json.load(f)
+            except (OSError, ValueError):
+                self._index = {}
+        return self._index
+
+    def _save_index(self) -> None:
+        # Caller holds the lock
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = os.path.join(self.cache_dir, INDEX_FILE)
+            tmp = f"{path}.tmp{os.getpid()}"
+            with open(tmp, "w") as f:
+                json.dump(self._index, f)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning("cannot write %s: %s", INDEX_FILE, e)
@@ -0,0 +1,68 @@
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from .runtime import MODEL_FILES
+
+
+# Lifecycle of one pipeline model, in order; "error" can follow any of them
+STATES = ("missing", "downloading", "loading", "warming", "ready", "error")
+
+
+class ModelReadiness:
+    """
+    各 AI 阶段模型的就绪状态（missing / downloading / loading / warming / ready / error），彼此独立推进。
+    流水线只启用已就绪的阶段；subscribe() 的回调在某阶段变为 ready 时被调用（在加载线程中），
+    运行中的会话借此补上该阶段。
+    """
+
+    def __init__(self, models: Optional[Dict[str, str]] = None):
+        self.models = dict(models or MODEL_FILES)  # stage -> model file
+        self._lock = threading.Lock()
+        self._state: Dict[str, list] = {stage: ["missing", None, time.time()] for stage in self.models}
+        self._listeners: List[Callable[[str], None]] = []
+
+    def stage_for(self, filename: str) -> Optional[str]:
+        return next((s for s, f in self.models.items() if f == filename), None)
+
+    def set(self, stage: str, state: str, error: Optional[str] = None) -> None:
+        assert state in STATES, state
+        with self._lock:
+            entry = self._state[stage]
+            if entry[0] == state and entry[1] == error:
+                return
+            self._state[stage] = [state, error, time.time()]
+            listeners = list(self._listeners) if state == "ready" else []
+        for fn in listeners:
+            fn(stage)
+
+    def state(self, stage: str) -> str:
+        with self._lock:
+            return self._state[stage][0]
+
+    def ready(self, stage: str) -> bool:
+        return self.state(stage) == "ready"
+
+    def ready_stages(self) -> List[str]:
+        with self._lock:
+            return [s for s, e in self._state.items() if e[0] == "ready"]
+
+    @property
+    def all_ready(self) -> bool:
+        return len(self.ready_stages()) == len(self.models)
+
+    def subscribe(self, fn: Callable[[str], None]) -> None:
+        with self._lock:
+            self._listeners.append(fn)
+
+    def unsubscribe(self, fn: Callable[[str], None]) -> None:
+        with self._lock:
+            if fn in self._listeners:
+                self._listeners.remove(fn)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                stage: {"model": self.models[stage], "state": e[0], "error": e[1], "since": round(e[2], 3)}
+                for stage, e in self._state.items()
+            }
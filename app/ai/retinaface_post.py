@@ -0,0 +1,135 @@
+from functools import lru_cache
+from typing import List, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+
+# RetinaFace (mobilenet0.25 / resnet50) anchor configuration
+MIN_SIZES = ((16, 32), (64, 128), (256, 512))
+STEPS = (8, 16, 32)
+VARIANCE = (0.1, 0.2)
+MEAN_BGR = np.array([104.0, 117.0, 123.0], dtype=np.float32)
+
+# (boxes Kx4 x1y1x2y2, scores K, landmarks Kx5x2) in original-frame pixels
+Faces = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+@lru_cache(maxsize=8)
+def priors(height: int, width: int) -> np.ndarray:
+    """输入分辨率对应的先验框 (N,4: cx,cy,w,h，归一化)，按分辨率缓存，只读。"""
+    parts = []
+    for step, sizes in zip(STEPS, MIN_SIZES):
+        fh, fw = -(-height // step), -(-width // step)
+        # Same ordering as the reference implementation: row, column, then anchor size
+        ys, xs = np.meshgrid(np.arange(fh, dtype=np.float32), np.arange(fw, dtype=np.float32), indexing="ij")
+        cx = ((xs + 0.5) * step / width).ravel()
+        cy = ((ys + 0.5) * step / height).ravel()
+        for_level = np.empty((cx.size, len(sizes), 4), dtype=np.float32)
+        for k, s in enumerate(sizes):
+            for_level[:, k, 0] = cx
+            for_level[:, k, 1] = cy
+            for_level[:, k, 2] = s / width
+            for_level[:, k, 3] = s / height
+        parts.append(for_level.reshape(-1, 4))
+    out = np.concatenate(parts, axis=0)
+    out.setflags(write=False)
+    return out
+
+
+def decode_boxes(loc: np.ndarray, pri: np.ndarray, variance: Sequence[float] = VARIANCE) -> np.ndarray:
+    """loc (...,N,4) → x1y1x2y2（归一化），一次向量化完成，支持批维度。"""
+    centers = pri[..., :2] + loc[..., :2] * variance[0] * pri[..., 2:]
+    sizes = pri[..., 2:] * np.exp(loc[..., 2:] * variance[1])
+    half = sizes * 0.5
+    return np.concatenate((centers - half, centers + half), axis=-1)
+
+
+def decode_landmarks(landms: np.ndarray, pri: np.ndarray, variance: Sequence[float] = VARIANCE) -> np.ndarray:
+    """landms (...,N,10) → (...,N,5,2) 归一化坐标。"""
+    pts = landms.reshape(landms.shape[:-1] + (5, 2))
+    return pri[..., None, :2] + pts * variance[0] * pri[..., None, 2:]
+
+
+def nms(boxes: np.ndarray, scores: np.ndarray, iou_thresh: float = 0.4) -> np.ndarray:
+    """贪心 NMS：每次保留最高分框并向量化地剔除与其 IoU 过高的框；迭代次数等于保留框数。"""
+    if boxes.shape[0] == 0:
+        return np.empty(0, dtype=np.int64)
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = (x2 - x1) * (y2 - y1)
+    order = np.argsort(-scores, kind="stable")
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        w = np.clip(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0, None)
+        h = np.clip(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0, None)
+        inter = w * h
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-12)
+        order = rest[iou <= iou_thresh]
+    return np.asarray(keep, dtype=np.int64)
+
+
+def prepare_batch(frames: Sequence[np.ndarray], input_size: Tuple[int, int]) -> Tuple[np.ndarray, List[float]]:
+    """
+    把若干帧缩放（保持比例、左上对齐补零）到同一输入尺寸 (H,W)，返回 NCHW float32 blob
+    和每帧缩放比（原图坐标 = 网络坐标 / scale）。
+    """
+    ih, iw = input_size
+    blob = np.zeros((len(frames), 3, ih, iw), dtype=np.float32)
+    scales = []
+    for i, f in enumerate(frames):
+        h, w = f.shape[:2]
+        r = min(iw / float(w), ih / float(h))
+        nw, nh = max(int(round(w * r)), 1), max(int(round(h * r)), 1)
+        img = f if (nw, nh) == (w, h) else cv2.resize(f, (nw, nh), interpolation=cv2.INTER_LINEAR)
+        # HWC uint8 -> CHW float32 minus mean, written straight into the blob
+        np.subtract(img.transpose(2, 0, 1), MEAN_BGR[:, None, None], out=blob[i, :, :nh, :nw], casting="unsafe")
+        scales.append(r)
+    return blob, scales
+
+
+def postprocess(
+    loc: np.ndarray,
+    conf: np.ndarray,
+    landms: np.ndarray,
+    input_size: Tuple[int, int],
+    scales: Sequence[float],
+    conf_thresh: float = 0.5,
+    nms_thresh: float = 0.4,
+    top_k: int = 750,
+    keep_top_k: int = 50,
+) -> List[Faces]:
+    """
+    RetinaFace 原始输出 → 每帧的人脸框/分数/关键点（原图像素坐标）。
+    loc (B,N,4)、conf (B,N,2)、landms (B,N,10)；先在整批上按分数阈值预筛，一次解码全部幸存先验框，
+    再逐帧做 top_k 截断与 NMS。
+    """
+    ih, iw = input_size
+    pri = priors(ih, iw)
+    loc = loc.reshape(-1, pri.shape[0], 4)
+    conf = conf.reshape(-1, pri.shape[0], 2)
+    landms = landms.reshape(-1, pri.shape[0], 10)
+    wh = np.array([iw, ih], dtype=np.float32)
+
+    # Score pre-filter over the whole batch, then decode every survivor in one pass
+    bi, ni = np.nonzero(conf[:, :, 1] > conf_thresh)
+    p = pri[ni]
+    inv = (1.0 / np.asarray(scales, dtype=np.float32))[bi, None]
+    boxes = decode_boxes(loc[bi, ni], p) * np.tile(wh, 2) * inv
+    pts = decode_landmarks(landms[bi, ni], p) * wh * inv[:, :, None]
+    scores = conf[bi, ni, 1]
+
+    results: List[Faces] = []
+    bounds = np.searchsorted(bi, np.arange(loc.shape[0] + 1))
+    for b in range(loc.shape[0]):
+        lo, hi = bounds[b], bounds[b + 1]
+        s = scores[lo:hi]
+        sel = np.arange(lo, hi)
+        if s.size > top_k:
+            part = np.argpartition(-s, top_k - 1)[:top_k]
+            sel, s = sel[part], s[part]
+        keep = sel[nms(boxes[sel], s, nms_thresh)[:keep_top_k]]
+        results.append((boxes[keep].astype(np.float32), scores[keep].astype(np.float32), pts[keep].astype(np.float32)))
+    return results
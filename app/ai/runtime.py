@@ -0,0 +1,256 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from .ort_cache import OptimizedModelCache
+
+logger = logging.getLogger("fusion.pipeline")
+
+CPU_PROVIDER = "CPUExecutionProvider"
+
+# Pipeline model files (under settings.models_dir) by stage
+MODEL_FILES = {
+    "detect": "retinaface_mnet.onnx",
+    "matting": "rvm.onnx",
+    "parsing": "bisenet.onnx",
+    "swap": "dfl.onnx",
+}
+
+
+def _warm_retinaface(inputs) -> List[Dict[str, np.ndarray]]:
+    # Full-frame and tracker-ROI sizes used by FaceDetector
+    name = inputs[0].name
+    return [{name: np.zeros((1, 3, s, s), dtype=np.float32)} for s in (640, 320)]
+
+
+def _warm_rvm(inputs) -> List[Dict[str, np.ndarray]]:
+    feeds = {}
+    for inp in inputs:
+        if inp.name == "src":
+            feeds["src"] = np.zeros((1, 3, 720, 1280), dtype=np.float32)
+        elif inp.name == "downsample_ratio":
+            feeds["downsample_ratio"] = np.array([0.375], dtype=np.float32)
+        else:
+            feeds[inp.name] = np.zeros((1, 1, 1, 1), dtype=np.float32)
+    return [feeds]
+
+
+def _warm_bisenet(inputs) -> List[Dict[str, np.ndarray]]:
+    return [{inputs[0].name: np.zeros((1, 3, 512, 512), dtype=np.float32)}]
+
+
+# Expected input feeds per model file; others get their static shape with dynamic dims = 1
+WARMUP_FEEDS: Dict[str, Callable[[list], List[Dict[str, np.ndarray]]]] = {
+    "retinaface_mnet.onnx": _warm_retinaface,
+    "rvm.onnx": _warm_rvm,
+    "bisenet.onnx": _warm_bisenet,
+}
+
+
+def default_feeds(inputs) -> List[Dict[str, np.ndarray]]:
+    feeds = {}
+    for inp in inputs:
+        shape = [d if isinstance(d, int) and d > 0 else 1 for d in inp.shape]
+        dtype = np.float16 if "float16" in inp.type else np.float32
+        feeds[inp.name] = np.zeros(shape, dtype=dtype)
+    return [feeds]
+
+
+class OrtSessionRegistry:
+    """
+    进程内唯一的 ONNX Runtime 会话登记处：
+    - 所有 InferenceSession 都经此创建，统一图优化级别、线程数、内存 arena 与 CUDA provider 选项；
+    - 线程预算来自设备组（同组各阶段瓜分该组核心），并关闭线程自旋，多路流共享会话而不超额占用 CPU；
+    - 相同 (模型, provider, 设备, 线程数) 只创建一次会话，多路流共享（InferenceSession.run 线程安全）；
+    - 图优化结果经 OptimizedModelCache 落盘，重启后直接加载；
+    - warmup() 在期望输入形状上各跑一次，使首帧不承担 kernel 选择与 arena 扩张的开销。
+    """
+
+    def __init__(self, cache: Optional[OptimizedModelCache] = None):
+        self.cache = cache or OptimizedModelCache()
+        self._lock = threading.Lock()
+        self._sessions: Dict[tuple, object] = {}
+        self._key_locks: Dict[tuple, threading.Lock] = {}
+        self.load_s: Dict[str, float] = {}
+        self.warm: Dict[str, float] = {}
+
+    @staticmethod
+    def _threads(device) -> int:
+        if device is not None:
+            return device.intra_op_threads()
+        cores = os.sched_getaffinity(0) if hasattr(os, "sched_getaffinity") else range(os.cpu_count() or 1)
+        return max(len(cores), 1)
+
+    def key(self, model_path: str, device=None) -> tuple:
+        provider = device.provider if device is not None else CPU_PROVIDER
+        device_id = device.device_id if device is not None else 0
+        return model_path, provider, device_id, self._threads(device)
+
+    def session_options(self, device=None):
+        import onnxruntime as ort
+
+        so = ort.SessionOptions()
+        so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        so.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        so.intra_op_num_threads = self._threads(device)
+        so.inter_op_num_threads = 1
+        so.enable_cpu_mem_arena = True
+        so.enable_mem_pattern = True
+        # Idle ORT workers sleep instead of spinning, so they do not steal cores from other stages
+        so.add_session_config_entry("session.intra_op.allow_spinning", "0")
+        so.add_session_config_entry("session.inter_op.allow_spinning", "0")
+        return so
+
+    @staticmethod
+    def providers(device=None) -> list:
+        if device is None or device.provider == CPU_PROVIDER:
+            return [CPU_PROVIDER]
+        return [
+            (
+                device.provider,
+                {
+                    "device_id": device.device_id,
+                    # Grow the GPU arena only by what is requested instead of doubling
+                    "arena_extend_strategy": "kSameAsRequested",
+                    "cudnn_conv_algo_search": "HEURISTIC",
+                    "do_copy_in_default_stream": True,
+                },
+            ),
+            CPU_PROVIDER,
+        ]
+
+    def create_session(self, model_path: str, device=None):
+        """新建会话（不登记）；供自行管理生命周期的缓存（如 DFM 模型 LRU）使用。"""
+        import onnxruntime as ort
+
+        t0 = time.perf_counter()
+        providers = self.providers(device)
+        sess = None
+        artifact = None
+        if self.cache.enabled:
+            try:
+                artifact = self.cache.artifact(model_path, device.provider if device is not None else CPU_PROVIDER)
+            except OSError as e:
+                logger.warning("optimized model cache unavailable for %s: %s", model_path, e)
+        if artifact is not None:
+            src, so = self.cache.open(artifact, self.session_options(device))
+            if src is not None:
+                try:
+                    sess = ort.InferenceSession(src, sess_options=so, providers=providers)
+                    self.cache.hits += 1
+                except Exception as e:
+                    logger.warning("discarding optimized model %s: %s", os.path.basename(artifact), e)
+                    self.cache.discard(artifact)
+        if sess is None:
+            so = self.session_options(device)
+            tmp = self.cache.prepare_save(artifact, so) if artifact is not None else None
+            sess = ort.InferenceSession(model_path, sess_options=so, providers=providers)
+            if tmp is not None:
+                try:
+                    self.cache.commit(tmp, artifact)
+                except OSError as e:
+                    logger.warning("cannot save optimized model %s: %s", os.path.basename(artifact), e)
+        self.load_s[os.path.basename(model_path)] = time.perf_counter() - t0
+        return sess
+
+    def session(self, model_path: str, device=None):
+        """取得共享会话，首次调用时创建。"""
+        k = self.key(model_path, device)
+        with self._lock:
+            sess = self._sessions.get(k)
+            if sess is not None:
+                return sess
+            key_lock = self._key_locks.setdefault(k, threading.Lock())
+        # Create outside the registry lock so loading one model does not block the others
+        with key_lock:
+            with self._lock:
+                sess = self._sessions.get(k)
+            if sess is None:
+                sess = self.create_session(model_path, device)
+                with self._lock:
+                    self._sessions[k] = sess
+        return sess
+
+    def warmup(self, session, model_path: str) -> float:
+        """在期望输入形状上运行一次；返回耗时（秒）。失败只记录日志。"""
+        name = os.path.basename(model_path)
+        make = WARMUP_FEEDS.get(name, default_feeds)
+        t0 = time.perf_counter()
+        try:
+            for feeds in make(session.get_inputs()):
+                session.run(None, feeds)
+        except Exception as e:
+            logger.warning("warmup of %s failed: %s", name, e)
+        dt = time.perf_counter() - t0
+        self.warm[name] = dt
+        return dt
+
+    def preload(self, models_dir: str, placement) -> Dict[str, float]:
+        """按放置方案为各 AI 阶段创建并预热会话（换脸模型由 DfmModelCache 管理，除外）。"""
+        out = {}
+        for stage, filename in MODEL_FILES.items():
+            path = os.path.join(models_dir, filename)
+            if stage == "swap" or not os.path.exists(path):
+                continue
+            sess = self.session(path, placement.group_for(stage))
+            out[filename] = self.warmup(sess, path)
+        return out
+
+    def stats(self) -> dict:
+        with self._lock:
+            keys = list(self._sessions)
+        return {
+            "sessions": [
+                {"model": os.path.basename(k[0]), "provider": k[1], "device_id": k[2], "threads": k[3]} for k in keys
+            ],
+            "load_s": {k: round(v, 3) for k, v in self.load_s.items()},
+            "warmup_s": {k: round(v, 3) for k, v in self.warm.items()},
+            "optimized_cache": self.cache.stats(),
+        }
+
+
+class BoundRunner:
+    """
+    IO binding 封装：按输入形状缓存预分配的输出数组，稳态推理直接写入这些数组、不再分配。
+    返回的数组在下一次 run 之前有效；每个调用方（AI 模块实例）各持一个，不可跨线程共享。
+    """
+
+    def __init__(self, session, max_shapes: int = 4):
+        self.session = session
+        self.max_shapes = max_shapes
+        self.output_names = [o.name for o in session.get_outputs()]
+        self._outputs: "OrderedDict[tuple, List[np.ndarray]]" = OrderedDict()
+
+    def run(self, feeds: Dict[str, np.ndarray]) -> List[np.ndarray]:
+        key = tuple((k, v.shape, v.dtype.str) for k, v in feeds.items())
+        outs = self._outputs.get(key)
+        if outs is None:
+            # First call at this shape learns the output shapes
+            outs = [np.ascontiguousarray(o) for o in self.session.run(self.output_names, feeds)]
+            self._outputs[key] = outs
+            while len(self._outputs) > self.max_shapes:
+                self._outputs.popitem(last=False)
+            return outs
+        self._outputs.move_to_end(key)
+        import onnxruntime as ort
+
+        io = self.session.io_binding()
+        for name, arr in feeds.items():
+            io.bind_cpu_input(name, np.ascontiguousarray(arr))
+        for name, buf in zip(self.output_names, outs):
+            io.bind_ortvalue_output(name, ort.OrtValue.ortvalue_from_numpy(buf))
+        self.session.run_with_iobinding(io)
+        return outs
+
+
+# Process-wide registry
+registry = OrtSessionRegistry()
+
+
+def get_session(model_path: str, device=None):
+    return registry.session(model_path, device)
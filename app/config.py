@@ -20,6 +20,23 @@ DEFAULT_MODEL_URLS = ModelURLs(
 )
 
 
+class ModelHashes(BaseModel):
+    # Hex SHA-256 per model; empty = not verified
+    rvm: str = ""
+    retinaface: str = ""
+    bisenet: str = ""
+    dfl: str = ""
+
+
+# 可选的 SHA-256 校验值（MODEL_SHA256_RVM 等），为空时不校验
+DEFAULT_MODEL_SHA256 = ModelHashes(
+    rvm=os.getenv("MODEL_SHA256_RVM", ""),
+    retinaface=os.getenv("MODEL_SHA256_RETINAFACE", ""),
+    bisenet=os.getenv("MODEL_SHA256_BISENET", ""),
+    dfl=os.getenv("MODEL_SHA256_DFL", ""),
+)
+
+
 BASE_DIR = pathlib.Path(__file__).resolve().parents[1]
 ASSETS_DIR = BASE_DIR / "assets"
 MODELS_DIR = ASSETS_DIR / "models"
@@ -27,8 +44,32 @@ MODELS_DIR = ASSETS_DIR / "models"
 
 class Settings(BaseModel):
     model_urls: ModelURLs = DEFAULT_MODEL_URLS
+    model_sha256: ModelHashes = DEFAULT_MODEL_SHA256
+    # Models downloaded concurrently at startup
+    download_workers: int = int(os.getenv("DOWNLOAD_WORKERS", "4"))
     models_dir: str = str(MODELS_DIR)
     debug: bool = True
+    # JPEG quality for /stream/frame snapshots
+    jpeg_quality: int = 85
+    # Worker threads for per-frame WebRTC compute (decode/composite/encode-prep), off the event loop
+    webrtc_workers: int = int(os.getenv("WEBRTC_WORKERS", "2"))
+    # Multi-session streaming: initial capacity estimate (refined from measured throughput),
+    # frames allowed in flight across all sessions, and the floor for degraded admission
+    stream_capacity_fps: float = float(os.getenv("STREAM_CAPACITY_FPS", "30"))
+    stream_slots: int = int(os.getenv("STREAM_SLOTS", "4"))
+    min_session_fps: float = float(os.getenv("MIN_SESSION_FPS", "10"))
+    # Full face detection every N frames; frames in between are tracked with optical flow
+    detect_interval: int = int(os.getenv("DETECT_INTERVAL", "10"))
+    # Face swap (DFM) model cache: warm sessions kept under this budget (model file size)
+    dfm_cache_mb: int = int(os.getenv("DFM_CACHE_MB", "4096"))
+    dfm_cache_models: int = int(os.getenv("DFM_CACHE_MODELS", "3"))
+    # Adaptive quality: trade matting/parsing resolution, detection interval and frame skip
+    # for this end-to-end latency (capture -> publish, p90) and each session's target fps
+    adaptive_quality: bool = os.getenv("ADAPTIVE_QUALITY", "1") != "0"
+    quality_latency_ms: float = float(os.getenv("QUALITY_LATENCY_MS", "150"))
+    # ORT graph-optimised models serialized here and reused across restarts
+    ort_cache: bool = os.getenv("ORT_CACHE", "1") != "0"
+    ort_cache_dir: str = os.getenv("ORT_CACHE_DIR", str(MODELS_DIR / ".ort_cache"))
     log_level: str = "DEBUG"
 
 
@@ -0,0 +1,198 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional
+
+import requests
+
+
+logger = logging.getLogger("fusion.pipeline")
+
+CHUNK_SIZE = 1 << 20
+# Small network reads: a dropped connection loses at most one read, the rest is kept for resume
+READ_SIZE = 64 * 1024
+PART_SUFFIX = ".part"
+
+
+class ChecksumError(RuntimeError):
+    pass
+
+
+@dataclass
+class ModelDownload:
+    filename: str
+    url: str
+    sha256: Optional[str] = None
+    # pending | verifying | downloading | ready | error
+    state: str = "pending"
+    done: int = 0
+    total: int = 0
+    resumed_from: int = 0
+    error: Optional[str] = None
+    elapsed_s: float = 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "state": self.state,
+            "bytes": self.done,
+            "total": self.total,
+            "percent": round(self.done * 100.0 / self.total, 1) if self.total else None,
+            "resumed_from": self.resumed_from,
+            "error": self.error,
+            "elapsed_s": round(self.elapsed_s, 2),
+        }
+
+
+def sha256_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class ModelDownloader:
+    """
+    模型下载器：
+    - 多个模型并行下载，先写 <文件>.part，校验通过后原子重命名，半截文件不会被当作已存在；
+    - 中断后重启时按 .part 的大小发 HTTP Range 续传（服务器不支持时从头下载）；
+    - 配置了 SHA-256 时校验下载结果与已有文件，不匹配则重新下载；
+    - start() 在后台线程运行，progress() 给出每个模型的状态与进度（/system/status）。
+    """
+
+    def __init__(
+        self,
+        models_dir: str,
+        downloads: Iterable[ModelDownload],
+        workers: int = 4,
+        retries: int = 3,
+        timeout: float = 60.0,
+        session: Optional[requests.Session] = None,
+        on_state: Optional[Callable[[ModelDownload], None]] = None,
+    ):
+        self.models_dir = models_dir
+        self.downloads: Dict[str, ModelDownload] = {d.filename: d for d in downloads}
+        self.workers = max(workers, 1)
+        self.retries = max(retries, 1)
+        self.timeout = timeout
+        self.http = session or requests.Session()
+        # Called (in the download thread) on every state change, e.g. to load a model as soon as it lands
+        self.on_state = on_state
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._done = threading.Event()
+
+    def path(self, filename: str) -> str:
+        return os.path.join(self.models_dir, filename)
+
+    def start(self) -> None:
+        """后台下载全部模型，立即返回。"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self.run, name="ModelDownloader", daemon=True)
+        self._thread.start()
+
+    def run(self) -> List[ModelDownload]:
+        """阻塞下载全部模型；返回失败的条目。"""
+        os.makedirs(self.models_dir, exist_ok=True)
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ModelDownload") as pool:
+                list(pool.map(self._fetch, list(self.downloads.values())))
+        finally:
+            self._done.set()
+        return [d for d in self.downloads.values() if d.state == "error"]
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    @property
+    def finished(self) -> bool:
+        return self._done.is_set()
+
+    def progress(self) -> dict:
+        with self._lock:
+            return {name: d.to_dict() for name, d in self.downloads.items()}
+
+    # ---- internals ----
+
+    def _set(self, d: ModelDownload, **kw) -> None:
+        with self._lock:
+            changed = "state" in kw and kw["state"] != d.state
+            for k, v in kw.items():
+                setattr(d, k, v)
+        if changed and self.on_state is not None:
+            self.on_state(d)
+
+    def _fetch(self, d: ModelDownload) -> None:
+        t0 = time.perf_counter()
+        dst = self.path(d.filename)
+        try:
+            if os.path.exists(dst):
+                size = os.path.getsize(dst)
+                self._set(d, state="verifying", done=size, total=size)
+                if self._verified(dst, d.sha256):
+                    self._set(d, elapsed_s=time.perf_counter() - t0, state="ready")
+                    return
+                logger.warning("%s: checksum mismatch, downloading again", d.filename)
+                os.remove(dst)
+            self._set(d, state="downloading")
+            last: Optional[Exception] = None
+            for attempt in range(self.retries):
+                try:
+                    self._download(d, dst)
+                    break
+                except ChecksumError:
+                    raise
+                except (requests.RequestException, OSError) as e:
+                    last = e
+                    logger.warning("%s: attempt %d failed: %s", d.filename, attempt + 1, e)
+                    time.sleep(min(2.0 ** attempt, 10.0))
+            else:
+                raise last
+            self._set(d, elapsed_s=time.perf_counter() - t0, state="ready")
+        except Exception as e:
+            logger.error("model download failed: %s: %s", d.filename, e)
+            self._set(d, elapsed_s=time.perf_counter() - t0, state="error", error=str(e))
+
+    def _download(self, d: ModelDownload, dst: str) -> None:
+        part = dst + PART_SUFFIX
+        offset = os.path.getsize(part) if os.path.exists(part) else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        with self.http.get(d.url, stream=True, timeout=self.timeout, headers=headers) as r:
+            if r.status_code == 416:
+                # Nothing left to fetch: the part file is already complete
+                total = offset
+            else:
+                r.raise_for_status()
+                if offset and r.status_code != 206:
+                    # Server ignored the range, start over
+                    offset = 0
+                length = int(r.headers.get("content-length", 0))
+                total = offset + length if length else 0
+                self._set(d, state="downloading", done=offset, total=total, resumed_from=offset)
+                with open(part, "ab" if offset else "wb") as f:
+                    for chunk in r.iter_content(chunk_size=READ_SIZE):
+                        if not chunk:
+                            continue
+                        f.write(chunk)
+                        with self._lock:
+                            d.done += len(chunk)
+                    f.flush()
+                    os.fsync(f.fileno())
+                total = os.path.getsize(part) if not total else total
+        size = os.path.getsize(part)
+        if total and size != total:
+            raise OSError(f"incomplete download: {size}/{total} bytes")
+        self._set(d, state="verifying", done=size, total=size)
+        if not self._verified(part, d.sha256):
+            os.remove(part)
+            raise ChecksumError(f"{d.filename}: SHA-256 mismatch")
+        os.replace(part, dst)
+
+    @staticmethod
+    def _verified(path: str, sha256: Optional[str]) -> bool:
+        return not sha256 or sha256_file(path) == sha256.lower()
@@ -1,21 +1,80 @@
+import logging
+import os
+
 from fastapi import FastAPI
 
+from .ai import runtime
 from .config import settings
-from .utils import download_models
+from .downloader import ModelDownload, ModelDownloader
+
+
+logger = logging.getLogger("fusion.pipeline")
+
+# (file name, key in settings.model_urls / settings.model_sha256)
+MODEL_SOURCES = [
+    ("rvm.onnx", "rvm"),
+    ("retinaface_mnet.onnx", "retinaface"),
+    ("bisenet.onnx", "bisenet"),
+    ("dfl.onnx", "dfl"),
+]
+
+
+def build_downloader(on_state=None) -> ModelDownloader:
+    downloads = [
+        ModelDownload(
+            filename,
+            getattr(settings.model_urls, key),
+            sha256=getattr(settings.model_sha256, key) or None,
+        )
+        for filename, key in MODEL_SOURCES
+    ]
+    return ModelDownloader(settings.models_dir, downloads, workers=settings.download_workers, on_state=on_state)
+
+
+def load_model(app: FastAPI, stage: str) -> None:
+    """创建并预热一个阶段的共享会话（在其下载线程中运行，各模型互不等待）。
+    每种放置方案（use_multi_gpu 开/关）中该阶段所在的设备组都预热，ready 之后任何会话都不会冷加载。"""
+    readiness = app.state.readiness
+    path = os.path.join(settings.models_dir, readiness.models[stage])
+    groups = app.state.sessions.groups_for(stage, path)
+    try:
+        readiness.set(stage, "loading")
+        if stage == "swap":
+            # Face swap sessions live in the DFM cache (load + warmup in one step)
+            for fut in [app.state.dfm_models.prewarm(path, group) for group in groups]:
+                fut.result()
+        else:
+            sessions = [runtime.registry.session(path, group) for group in groups]
+            readiness.set(stage, "warming")
+            for sess in sessions:
+                runtime.registry.warmup(sess, path)
+        readiness.set(stage, "ready")
+    except Exception as e:
+        logger.error("loading %s failed: %s", readiness.models[stage], e)
+        readiness.set(stage, "error", f"{type(e).__name__}: {e}")
+    app.state.status["models_ready"] = readiness.all_ready
+
+
+def _on_download_state(app: FastAPI, d: ModelDownload) -> None:
+    readiness = app.state.readiness
+    stage = readiness.stage_for(d.filename)
+    if stage is None:
+        return
+    if d.state in ("verifying", "downloading"):
+        readiness.set(stage, "downloading")
+    elif d.state == "error":
+        readiness.set(stage, "error", d.error)
+    elif d.state == "ready":
+        load_model(app, stage)
 
 
 def register_startup_events(app: FastAPI):
     @app.on_event("startup")
     async def on_startup():
-        # Trigger model auto download (F-FILE-AUTO)
-        url_pairs = [
-            ("rvm.onnx", settings.model_urls.rvm),
-            ("retinaface_mnet.onnx", settings.model_urls.retinaface),
-            ("bisenet.onnx", settings.model_urls.bisenet),
-            ("dfl.onnx", settings.model_urls.dfl),
-        ]
-        try:
-            download_models(url_pairs)
-            app.state.status["models_ready"] = True
-        except Exception as e:
-            app.state.status.update({"state": "ERROR", "error": str(e), "models_ready": False})
\ No newline at end of file
+        # Event-loop blocking metric (/system/metrics)
+        app.state.loop_monitor.start()
+        # Trigger model auto download (F-FILE-AUTO) in the background; the API is up immediately.
+        # Each model is loaded and warmed as soon as its file is in place, independently of the
+        # others, and /system/status reports per-model state and download progress
+        app.state.downloader = build_downloader(on_state=lambda d: _on_download_state(app, d))
+        app.state.downloader.start()
@@ -0,0 +1,53 @@
+import asyncio
+import time
+from typing import Optional
+
+
+class LoopLagMonitor:
+    """
+    事件循环阻塞监测：周期性 sleep(interval)，实际唤醒时间超出预期的部分即为循环被阻塞的时长。
+    """
+
+    def __init__(self, interval: float = 0.1, stall_ms: float = 50.0):
+        self.interval = interval
+        self.stall_ms = stall_ms
+        self._task: Optional[asyncio.Task] = None
+        self.samples = 0
+        self.last_ms = 0.0
+        self.avg_ms = 0.0
+        self.max_ms = 0.0
+        self.stalls = 0
+        self.blocked_ms_total = 0.0
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "samples": self.samples,
+            "lag_last_ms": round(self.last_ms, 3),
+            "lag_avg_ms": round(self.avg_ms, 3),
+            "lag_max_ms": round(self.max_ms, 3),
+            "stalls": self.stalls,
+            "stall_threshold_ms": self.stall_ms,
+            "blocked_ms_total": round(self.blocked_ms_total, 1),
+        }
+
+    async def _run(self):
+        while True:
+            t0 = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag_ms = max((time.perf_counter() - t0 - self.interval) * 1000.0, 0.0)
+            self.last_ms = lag_ms
+            self.avg_ms = (0.9 * self.avg_ms + 0.1 * lag_ms) if self.samples else lag_ms
+            self.max_ms = max(self.max_ms, lag_ms)
+            self.samples += 1
+            self.blocked_ms_total += lag_ms
+            if lag_ms >= self.stall_ms:
+                self.stalls += 1
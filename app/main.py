@@ -1,5 +1,6 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
 
 def create_app() -> FastAPI:
@@ -18,12 +19,32 @@ def create_app() -> FastAPI:
     app.state.status = {"state": "IDLE", "error": None, "models_ready": False}
     app.state.manager = None
 
+    from .ai.dfm_cache import DfmModelCache
+    from .ai.readiness import ModelReadiness
+    from .processing.embeddings import SourceEmbeddingCache
+    from .processing.sessions import SessionRegistry, UnknownSessionError
+    app.state.embeddings = SourceEmbeddingCache()
+    app.state.dfm_models = DfmModelCache()
+    # Per-model state (missing/downloading/loading/warming/ready); streams run with the ready stages
+    app.state.readiness = ModelReadiness()
+    app.state.sessions = SessionRegistry(
+        embeddings=app.state.embeddings, models=app.state.dfm_models, readiness=app.state.readiness
+    )
+
+    @app.exception_handler(UnknownSessionError)
+    async def unknown_session(request: Request, exc: UnknownSessionError):
+        return JSONResponse(status_code=404, content={"detail": str(exc)})
+
+    from .loop_monitor import LoopLagMonitor
+    app.state.loop_monitor = LoopLagMonitor()
+
     # Include routers (added later)
-    from .routers import system, files, stream, webrtc
+    from .routers import system, files, stream, webrtc, models
     app.include_router(system.router, prefix="/system", tags=["system"])
     app.include_router(files.router, prefix="/files", tags=["files"])
     app.include_router(stream.router, prefix="/stream", tags=["stream"])
     app.include_router(webrtc.router, prefix="/webrtc", tags=["webrtc"])
+    app.include_router(models.router, prefix="/models", tags=["models"])
 
     # Register startup events
     from .events import register_startup_events
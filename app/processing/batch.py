@@ -0,0 +1,285 @@
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import av
+import cv2
+import numpy as np
+
+from ..ai.face_detection import FaceDetector
+from ..ai.human_matting import HumanMatting
+from ..ai.face_parsing import FaceParsing
+from ..ai.face_swap import FaceSwap
+from ..ai.blending import FaceBlender
+from ..ai.face_crops import FaceCrops
+from ..ai.composition import Composer
+from ..ai.face_embedding import FaceEncoder
+from .buffer_pool import BufferPool
+
+
+_EOF = object()
+
+
+@dataclass
+class BatchConfig:
+    input_path: str
+    source_face: str
+    output_path: str
+    background: Optional[str] = None
+    batch_size: int = 8
+    queue_depth: int = 4  # batches buffered between decode -> infer -> encode
+    codec: str = "libx264"
+    crf: int = 18
+    threads: int = 0  # 0 = all cores (OpenCV / codec threads)
+
+
+class _Background:
+    """背景源：静态图片，或循环读取的视频（逐帧与输入对齐）。"""
+
+    def __init__(self, path: Optional[str]):
+        self._img = None
+        self._container = None
+        self._iter = None
+        if not path:
+            return
+        if path.lower().endswith((".jpg", ".jpeg", ".png", ".webp", ".bmp")):
+            self._img = cv2.imread(path)
+            if self._img is None:
+                raise ValueError(f"Cannot read background image: {path}")
+        else:
+            self._container = av.open(path)
+            self._container.streams.video[0].thread_type = "AUTO"
+            self._iter = self._container.decode(video=0)
+
+    def next(self, w: int, h: int):
+        if self._img is not None:
+            img = self._img
+        elif self._container is not None:
+            try:
+                frame = next(self._iter)
+            except StopIteration:
+                self._container.seek(0)
+                self._iter = self._container.decode(video=0)
+                frame = next(self._iter)
+            img = frame.to_ndarray(format="bgr24")
+        else:
+            return None
+        if img.shape[:2] != (h, w):
+            img = cv2.resize(img, (w, h), interpolation=cv2.INTER_AREA)
+            if self._img is not None:
+                self._img = img  # static image: resize once
+        return img
+
+    def close(self):
+        if self._container is not None:
+            self._container.close()
+
+
+class BatchRenderer:
+    """
+    离线视频到视频渲染：与实时流水线相同的 FaceDetector → HumanMatting → FaceParsing → FaceSwap
+    → FaceBlender → Composer 链路，但以吞吐为目标：
+    - 解码线程、推理（主线程）、编码线程三者并行，之间用有界队列衔接；
+    - 检测与换脸每批 batch_size 帧一次模型调用（检测不做帧间跟踪，整批一个输入张量）；
+      抠图与人脸解析按帧顺序执行以保留 RVM 循环状态；
+    - 结束时报告整体 fps 与各阶段耗时。
+    """
+
+    def __init__(self, config: BatchConfig):
+        self.config = config
+        self.stage_s: Dict[str, float] = defaultdict(float)
+        self.frames = 0
+        self._error: Optional[BaseException] = None
+        self._q_dec: queue.Queue = queue.Queue(maxsize=config.queue_depth)
+        self._q_enc: queue.Queue = queue.Queue(maxsize=config.queue_depth)
+        self._pool = BufferPool(max_per_key=(config.queue_depth + 2) * config.batch_size)
+
+    def run(self) -> dict:
+        cfg = self.config
+        if not os.path.exists(cfg.input_path):
+            raise FileNotFoundError(cfg.input_path)
+        if cv2.imread(cfg.source_face) is None:
+            raise ValueError(f"Cannot read source face: {cfg.source_face}")
+        if cfg.threads:
+            cv2.setNumThreads(cfg.threads)
+
+        in_container = av.open(cfg.input_path)
+        in_stream = in_container.streams.video[0]
+        in_stream.thread_type = "AUTO"
+        rate = in_stream.average_rate or 30
+        width, height = in_stream.codec_context.width, in_stream.codec_context.height
+
+        t_start = time.perf_counter()
+        decoder = threading.Thread(target=self._decode, args=(in_container, in_stream), name="BatchDecode", daemon=True)
+        encoder = threading.Thread(target=self._encode, args=(rate, width, height), name="BatchEncode", daemon=True)
+        decoder.start()
+        encoder.start()
+        try:
+            self._infer()
+        except BaseException as e:
+            self._error = self._error or e
+        finally:
+            self._put(self._q_enc, _EOF)
+            encoder.join()
+            decoder.join(timeout=5)
+            in_container.close()
+        if self._error is not None:
+            raise self._error
+        wall = time.perf_counter() - t_start
+        return self.report(wall)
+
+    def report(self, wall_s: float) -> dict:
+        n = max(self.frames, 1)
+        return {
+            "frames": self.frames,
+            "wall_s": round(wall_s, 3),
+            "fps": round(self.frames / wall_s, 2) if wall_s > 0 else 0.0,
+            "stages_ms_per_frame": {k: round(v * 1000.0 / n, 3) for k, v in self.stage_s.items()},
+        }
+
+    # ---- threads ----
+
+    def _decode(self, container, stream):
+        batch: List[np.ndarray] = []
+        try:
+            frames = container.decode(stream)
+            while self._error is None:
+                t0 = time.perf_counter()
+                frame = next(frames, None)
+                if frame is None:
+                    break
+                batch.append(frame.to_ndarray(format="bgr24"))
+                self.stage_s["decode"] += time.perf_counter() - t0
+                if len(batch) == self.config.batch_size:
+                    if not self._put(self._q_dec, batch):
+                        return
+                    batch = []
+            if batch:
+                self._put(self._q_dec, batch)
+        except BaseException as e:
+            self._error = e
+        finally:
+            self._put(self._q_dec, _EOF)
+
+    def _put(self, q: queue.Queue, item) -> bool:
+        # Bounded put that gives up once another thread has failed
+        while True:
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                if self._error is not None:
+                    return False
+
+    def _get(self, q: queue.Queue):
+        # Bounded get that reads as end of stream once another thread has failed
+        while True:
+            try:
+                return q.get(timeout=0.5)
+            except queue.Empty:
+                if self._error is not None:
+                    return _EOF
+
+    def _encode(self, rate, width: int, height: int):
+        cfg = self.config
+        out = None
+        try:
+            out = av.open(cfg.output_path, mode="w")
+            codec = cfg.codec if cfg.codec in av.codecs_available else "mpeg4"
+            stream = out.add_stream(codec, rate=rate)
+            stream.width, stream.height = width, height
+            stream.pix_fmt = "yuv420p"
+            stream.thread_type = "AUTO"
+            if codec == "libx264":
+                stream.options = {"crf": str(cfg.crf), "preset": "medium"}
+            while True:
+                batch = self._get(self._q_enc)
+                if batch is _EOF:
+                    break
+                t0 = time.perf_counter()
+                for img in batch:
+                    vf = av.VideoFrame.from_ndarray(img, format="bgr24")
+                    self._pool.release(img)
+                    for packet in stream.encode(vf):
+                        out.mux(packet)
+                self.stage_s["encode"] += time.perf_counter() - t0
+            for packet in stream.encode():
+                out.mux(packet)
+        except BaseException as e:
+            # The inference thread sees the error and stops feeding (its puts give up on error)
+            self._error = e
+        finally:
+            if out is not None:
+                out.close()
+
+    # ---- inference (main thread) ----
+
+    def _timed(self, stage: str, fn, *args):
+        t0 = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self.stage_s[stage] += time.perf_counter() - t0
+
+    def _infer(self):
+        # No inter-frame tracking here: every batch is one detector call over all its frames
+        fd = FaceDetector(tracking=False)
+        rvm = HumanMatting()
+        parser = FaceParsing()
+        swapper = FaceSwap()
+        blender = FaceBlender()
+        composer = Composer()
+        background = _Background(self.config.background)
+        # Encoded in memory: an offline render never writes next to the user's input files
+        source_embedding = FaceEncoder().encode_image(cv2.imread(self.config.source_face))
+        try:
+            while True:
+                frames = self._get(self._q_dec)
+                if frames is _EOF or self._error is not None:
+                    break
+                detections = self._timed("detect", fd.detect_batch, frames)
+                mattes = []
+                for f in frames:
+                    # Sequential on purpose: RVM carries recurrent state frame to frame
+                    h, w = f.shape[:2]
+                    out = (self._pool.acquire((h, w, 3)), self._pool.acquire((h, w)))
+                    mattes.append((self._timed("matting", rvm.infer, f, out), out))
+                masks, mask_bufs = [], []
+                # One aligned-crop cache per frame, shared by parsing, swap and blend
+                crops = [FaceCrops(f) for f in frames]
+                for f, dets, fc in zip(frames, detections, crops):
+                    buf = self._pool.acquire(f.shape[:2]) if dets else None
+                    masks.append(self._timed("parsing", parser.parse, f, dets[:1], buf, fc) if dets else None)
+                    mask_bufs.append(buf)
+
+                faces = [dets[0] if dets else None for dets in detections]
+                swaps = self._timed("swap", swapper.swap_batch, frames, faces, source_embedding, crops)
+
+                outputs = []
+                for f, dets, ((fgr, pha), bufs), mask, mask_buf, fc, swapped in zip(
+                    frames, detections, mattes, masks, mask_bufs, crops, swaps
+                ):
+                    final_fgr = self._timed(
+                        "blend", blender.blend, fgr, swapped, mask, dets[0] if dets else None, fc
+                    )
+                    h, w = f.shape[:2]
+                    bgr = background.next(w, h)
+                    if final_fgr is None:
+                        # Stub stages: pass the input through so the output video is still complete
+                        final_fgr, pha = f, None
+                    out = self._pool.acquire(f.shape)
+                    img = self._timed("compose", composer.compose, final_fgr, pha, bgr, out)
+                    if img is not out:
+                        np.copyto(out, img)
+                    for b in bufs + ((mask_buf,) if mask_buf is not None else ()):
+                        self._pool.release(b)
+                    outputs.append(out)
+                self.frames += len(outputs)
+                if not self._put(self._q_enc, outputs):
+                    break
+        finally:
+            background.close()
@@ -0,0 +1,61 @@
+import threading
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+
+class BufferPool:
+    """
+    按 (shape, dtype) 复用的 numpy 帧缓冲池（线程安全）。
+    - acquire 优先取空闲缓冲，没有时才分配；release 归还后可被后续帧复用。
+    - 每种规格最多保留 max_per_key 个空闲缓冲，超出部分交给 GC，避免无界增长。
+    """
+
+    def __init__(self, max_per_key: int = 16):
+        self.max_per_key = max_per_key
+        self._lock = threading.Lock()
+        self._free: Dict[Tuple, List[np.ndarray]] = defaultdict(list)
+        self.allocations = 0
+        self.reuses = 0
+        self.discarded = 0
+
+    @staticmethod
+    def _key(shape, dtype) -> Tuple:
+        return tuple(int(d) for d in shape), np.dtype(dtype).str
+
+    def acquire(self, shape, dtype=np.uint8) -> np.ndarray:
+        """借出一个未初始化的缓冲（内容为上一次使用者留下的数据）。"""
+        key = self._key(shape, dtype)
+        with self._lock:
+            free = self._free.get(key)
+            if free:
+                self.reuses += 1
+                return free.pop()
+            self.allocations += 1
+        return np.empty(key[0], dtype=dtype)
+
+    def release(self, arr: np.ndarray) -> None:
+        # Only whole arrays are pooled; views would alias someone else's memory
+        if arr is None or arr.base is not None:
+            return
+        key = self._key(arr.shape, arr.dtype)
+        with self._lock:
+            free = self._free[key]
+            if len(free) < self.max_per_key:
+                free.append(arr)
+            else:
+                self.discarded += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            idle = sum(len(v) for v in self._free.values())
+            keys = len(self._free)
+        return {
+            "max_per_key": self.max_per_key,
+            "keys": keys,
+            "idle": idle,
+            "allocations": self.allocations,
+            "reuses": self.reuses,
+            "discarded": self.discarded,
+        }
@@ -0,0 +1,132 @@
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from ..ai.face_embedding import FaceEncoder
+
+
+logger = logging.getLogger("fusion.pipeline")
+
+
+class SourceEmbeddingCache:
+    """
+    源人脸向量缓存：
+    - 按文件内容 SHA-256 计算，结果保存为素材旁的 <asset>.<hash16>.npy（先写临时文件再原子替换）；
+    - 内存中保留最近使用的 capacity 个向量（LRU）；
+    - 计算在单独的后台线程中进行，同一内容的并发请求合并为一次，调用方从不阻塞在编码上。
+    """
+
+    def __init__(self, capacity: int = 16, encoder_factory: Callable[[], FaceEncoder] = FaceEncoder):
+        self.capacity = capacity
+        self._encoder_factory = encoder_factory
+        self._encoder: Optional[FaceEncoder] = None
+        self._lock = threading.Lock()
+        self._lru: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        # (path, mtime_ns, size) -> digest, so repeated lookups do not re-hash the file;
+        # bounded like the LRU (edited or replaced files would otherwise pile up)
+        self._digests: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="SourceEmbed")
+
+        self.hits = 0
+        self.disk_loads = 0
+        self.computed = 0
+
+    @staticmethod
+    def npy_path(path: str, digest: str) -> str:
+        return f"{path}.{digest[:16]}.npy"
+
+    def digest(self, path: str) -> str:
+        st = os.stat(path)
+        key = (path, st.st_mtime_ns, st.st_size)
+        with self._lock:
+            d = self._digests.get(key)
+            if d is not None:
+                self._digests.move_to_end(key)
+                return d
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        d = h.hexdigest()
+        with self._lock:
+            self._digests[key] = d
+            while len(self._digests) > self.capacity:
+                self._digests.popitem(last=False)
+        return d
+
+    def get(self, path: str) -> Optional[np.ndarray]:
+        """内存 → 磁盘 .npy；都没有时返回 None（不触发计算）。"""
+        digest = self.digest(path)
+        with self._lock:
+            emb = self._lru.get(digest)
+            if emb is not None:
+                self._lru.move_to_end(digest)
+                self.hits += 1
+                return emb
+        npy = self.npy_path(path, digest)
+        if not os.path.exists(npy):
+            return None
+        emb = np.load(npy)
+        self.disk_loads += 1
+        self._remember(digest, emb)
+        return emb
+
+    def submit(self, path: str) -> Future:
+        """返回该源图向量的 Future；已缓存时立即完成，否则排入后台计算（同内容只算一次）。"""
+        emb = self.get(path)
+        if emb is not None:
+            fut: Future = Future()
+            fut.set_result(emb)
+            return fut
+        digest = self.digest(path)
+        with self._lock:
+            fut = self._inflight.get(digest)
+            if fut is None:
+                fut = self._inflight[digest] = self._executor.submit(self._compute, path, digest)
+            return fut
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "cached": len(self._lru),
+                "pending": len(self._inflight),
+                "hits": self.hits,
+                "disk_loads": self.disk_loads,
+                "computed": self.computed,
+            }
+
+    def _remember(self, digest: str, emb: np.ndarray) -> None:
+        with self._lock:
+            self._lru[digest] = emb
+            self._lru.move_to_end(digest)
+            while len(self._lru) > self.capacity:
+                self._lru.popitem(last=False)
+
+    def _compute(self, path: str, digest: str) -> np.ndarray:
+        try:
+            img = cv2.imread(path)
+            if img is None:
+                raise ValueError(f"Cannot read source face: {path}")
+            if self._encoder is None:
+                self._encoder = self._encoder_factory()
+            emb = self._encoder.encode_image(img)
+            npy = self.npy_path(path, digest)
+            tmp = f"{npy}.tmp"
+            with open(tmp, "wb") as f:
+                np.save(f, emb)
+            os.replace(tmp, npy)
+            self.computed += 1
+            self._remember(digest, emb)
+            logger.info("source embedding ready: %s", os.path.basename(path))
+            return emb
+        finally:
+            with self._lock:
+                self._inflight.pop(digest, None)
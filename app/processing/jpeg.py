@@ -0,0 +1,56 @@
+import threading
+import uuid
+from dataclasses import dataclass
+from typing import Optional
+
+import cv2
+
+from .mailbox import FrameMailbox
+
+
+def encode_jpeg(img, quality: int = 85) -> bytes:
+    ok, buf = cv2.imencode(".jpg", img, [int(cv2.IMWRITE_JPEG_QUALITY), int(quality)])
+    if not ok:
+        raise RuntimeError("Failed to encode frame")
+    return buf.tobytes()
+
+
+@dataclass(frozen=True)
+class EncodedFrame:
+    seq: int
+    ts: float
+    data: bytes
+    etag: str
+
+
+class JpegCache:
+    """
+    按帧序号缓存最新输出帧的 JPEG 编码：每帧至多编码一次，所有读者共享结果。
+    ETag 由实例标签与帧序号组成，重启流水线后不会与旧帧冲突。
+    """
+
+    def __init__(self, mailbox: FrameMailbox, quality: int = 85):
+        self._mailbox = mailbox
+        self.quality = quality
+        self._tag = uuid.uuid4().hex[:8]
+        self._lock = threading.Lock()
+        self._cached: Optional[EncodedFrame] = None
+        self.encodes = 0
+
+    def get(self) -> Optional[EncodedFrame]:
+        snap = self._mailbox.read()
+        if snap is None:
+            return None
+        cached = self._cached
+        if cached is not None and cached.seq >= snap.seq:
+            return cached
+        # Concurrent readers of a new frame wait here instead of encoding it again
+        with self._lock, self._mailbox.hold() as snap:
+            cached = self._cached
+            if snap is None or (cached is not None and cached.seq >= snap.seq):
+                return cached
+            # hold() keeps the (possibly pooled) image from being reused while encoding
+            data = encode_jpeg(snap.image, self.quality)
+            self.encodes += 1
+            self._cached = EncodedFrame(seq=snap.seq, ts=snap.ts, data=data, etag=f'"{self._tag}-{snap.seq}"')
+            return self._cached
@@ -0,0 +1,100 @@
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Iterator, Optional
+
+
+@dataclass(frozen=True)
+class OutputFrame:
+    seq: int
+    ts: float  # capture timestamp of the source frame
+    image: Any
+
+
+class _Slot:
+    __slots__ = ("frame", "release", "pins", "evicted")
+
+    def __init__(self, frame: OutputFrame, release: Optional[Callable[[Any], None]]):
+        self.frame = frame
+        self.release = release
+        self.pins = 0
+        self.evicted = False
+
+
+class FrameMailbox:
+    """
+    单槽“最新输出”邮箱：写入方覆盖旧帧，读取方 O(1) 读取且不消费。
+    任意数量的读者（/stream/frame 轮询、全屏/OBS 页面）看到的都是同一帧，互不抢占。
+
+    图像来自缓冲池时，publish 可传入 release 回调：帧被新帧替换且没有读者 hold 时归还缓冲。
+    需要在一段时间内访问像素的读者（如 JPEG 编码）应使用 hold()，read() 只保证元数据有效。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._slot: Optional[_Slot] = None
+
+    def publish(self, seq: int, ts: float, image, release: Optional[Callable[[Any], None]] = None) -> bool:
+        """写入新帧；序号不大于当前帧时忽略（保证单调递增），此时 release 由调用方负责。"""
+        with self._lock:
+            if self._slot is not None and seq <= self._slot.frame.seq:
+                return False
+            old = self._slot
+            self._slot = _Slot(OutputFrame(seq=seq, ts=ts, image=image), release)
+            freed = self._evict(old)
+            self._cond.notify_all()
+        self._release(freed)
+        return True
+
+    def read(self) -> Optional[OutputFrame]:
+        with self._lock:
+            return self._slot.frame if self._slot is not None else None
+
+    @contextmanager
+    def hold(self) -> Iterator[Optional[OutputFrame]]:
+        """在 with 块内固定当前帧，期间其缓冲不会被归还复用。"""
+        with self._lock:
+            slot = self._slot
+            if slot is not None:
+                slot.pins += 1
+        try:
+            yield slot.frame if slot is not None else None
+        finally:
+            if slot is not None:
+                with self._lock:
+                    slot.pins -= 1
+                    freed = slot if (slot.evicted and slot.pins == 0) else None
+                self._release(freed)
+
+    def wait_newer(self, seq: int, timeout: Optional[float] = None) -> Optional[OutputFrame]:
+        """阻塞等待序号大于 seq 的帧；超时返回 None。"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._slot is not None and self._slot.frame.seq > seq, timeout=timeout)
+            if self._slot is not None and self._slot.frame.seq > seq:
+                return self._slot.frame
+            return None
+
+    @property
+    def seq(self) -> int:
+        with self._lock:
+            return self._slot.frame.seq if self._slot is not None else -1
+
+    def clear(self):
+        with self._lock:
+            freed = self._evict(self._slot)
+            self._slot = None
+        self._release(freed)
+
+    @staticmethod
+    def _evict(slot: Optional[_Slot]) -> Optional[_Slot]:
+        # Caller holds the lock; returns the slot if it can be released right away
+        if slot is None:
+            return None
+        slot.evicted = True
+        return slot if slot.pins == 0 else None
+
+    @staticmethod
+    def _release(slot: Optional[_Slot]):
+        if slot is not None and slot.release is not None:
+            slot.release(slot.frame.image)
@@ -1,14 +1,35 @@
 import threading
 import queue
+import time
 from dataclasses import dataclass
-from typing import Any, Optional
+from typing import TYPE_CHECKING, Dict, Optional
+
+import numpy as np
 
 from ..ai.face_detection import FaceDetector
 from ..ai.human_matting import HumanMatting
 from ..ai.face_parsing import FaceParsing
+from ..ai.dfm_cache import DfmModelCache
+from ..ai.readiness import ModelReadiness
 from ..ai.face_swap import FaceSwap
 from ..ai.blending import FaceBlender
+from ..ai.face_crops import FaceCrops
 from ..ai.composition import Composer
+from ..config import settings
+from .buffer_pool import BufferPool
+from .embeddings import SourceEmbeddingCache
+from .jpeg import JpegCache
+from .mailbox import FrameMailbox
+from .mjpeg import MjpegBroadcaster
+from .packet import FramePacket
+from .placement import PlacementPlan, plan_placement
+from .pyramid import FramePyramid
+from .quality import QualityController, QualityLevel
+from .sources import FrameSource, create_source
+from .stage import StageWorker
+
+if TYPE_CHECKING:
+    from .sessions import FairScheduler
 
 
 @dataclass
@@ -17,13 +38,74 @@ class PipelineConfig:
     input_source: dict | None = None
 
 
+# Stage execution order; each stage reads the queue in front of it
+STAGE_ORDER = ("detect", "matting", "parsing", "swap", "blend", "compose", "publish")
+
+
+def put_drop_oldest(q: queue.Queue, item) -> bool:
+    """非阻塞入队：队列满时丢弃最旧的一项。返回是否发生了丢弃。"""
+    dropped = False
+    while True:
+        try:
+            q.put_nowait(item)
+            return dropped
+        except queue.Full:
+            try:
+                q.get_nowait()
+                dropped = True
+            except queue.Empty:
+                pass
+
+
 class ProcessingManager:
-    def __init__(self, config: PipelineConfig):
+    def __init__(
+        self,
+        config: PipelineConfig,
+        placement: Optional[PlacementPlan] = None,
+        scheduler: Optional["FairScheduler"] = None,
+        session_id: Optional[str] = None,
+        embeddings: Optional[SourceEmbeddingCache] = None,
+        models: Optional[DfmModelCache] = None,
+        readiness: Optional[ModelReadiness] = None,
+        target_fps: float = 25.0,
+    ):
         self.config = config
-        self._thread: Optional[threading.Thread] = None
-        self._stop_event = threading.Event()
+        # This session's own health: the last stage/source error, cleared by the next published frame
+        self.state = "PROCESSING"
+        self.error: Optional[str] = None
+        # Multi-session mode: frames enter detect only after the shared scheduler grants a slot
+        self.scheduler = scheduler
+        self.session_id = session_id
+        # Source face: the swap stage reads source_embedding once per frame, and it is
+        # replaced in one assignment when a new face finishes encoding in the background
+        self.embeddings = embeddings or SourceEmbeddingCache()
+        self.source_face: Optional[str] = None
+        self.source_embedding = None
+        # Warm face swap sessions, shared with other sessions and the /models API
+        self.models = models or DfmModelCache()
+        self.dfm_model: Optional[str] = None
+        # Per-model readiness: stages whose model is not ready yet pass frames through and are
+        # attached while running once it is (None = use whatever model files exist at start)
+        self.readiness = readiness
+        self._modules_ready = False
+        self._lock = threading.Lock()
+        # Frame counters are bumped from the submit, stage and publish threads
+        self._count_lock = threading.Lock()
+        self._next_seq = 0
+        self._last_out_seq = -1
+        self.frames_in = 0
+        self.frames_dropped = 0
+        self.frames_out = 0
+        # Subsets: frames refused by the session's rate limit, and frames skipped on purpose by the quality level
+        self.frames_throttled = 0
+        self.frames_skipped = 0
+        # FramePyramid totals: levels computed vs. requests served from an existing level
+        self.pyramid_built = 0
+        self.pyramid_hits = 0
+        # Closed-loop quality: measures latency/fps and retunes the AI modules to hold the target
+        self.quality = QualityController(target_fps=target_fps, on_change=self._apply_quality)
 
-        # Queues for pipeline stages (placeholders)
+        # Queues between pipeline stages
         self.q_in = queue.Queue(maxsize=8)
         self.q_fd = queue.Queue(maxsize=8)
         self.q_rvm = queue.Queue(maxsize=8)
@@ -31,49 +113,353 @@ class ProcessingManager:
         self.q_swap = queue.Queue(maxsize=8)
         self.q_blend = queue.Queue(maxsize=8)
         self.q_out = queue.Queue(maxsize=8)
+        queues = (self.q_in, self.q_fd, self.q_rvm, self.q_bisenet, self.q_swap, self.q_blend, self.q_out)
+        # At most one buffer of a kind per queued frame, per in-stage frame, plus the
+        # mailbox slot and one frame being encoded, so retention is bounded by queue depth.
+        self.pool = BufferPool(max_per_key=sum(q.maxsize for q in queues) + len(STAGE_ORDER) + 2)
+        # Latest output frame, readable by any number of consumers without draining q_out
+        self.latest = FrameMailbox()
+        # Encode-once JPEG view of the latest frame, shared by all HTTP viewers
+        self.jpeg = JpegCache(self.latest, quality=settings.jpeg_quality)
+        # Push (multipart MJPEG) subscribers share one encoder thread
+        self.mjpeg = MjpegBroadcaster(self.latest, self.jpeg)
+
+        # AI modules (created on first start; None while the stage's model is not ready)
+        self.fd: Optional[FaceDetector] = None
+        self.rvm: Optional[HumanMatting] = None
+        self.parser: Optional[FaceParsing] = None
+        self.swapper: Optional[FaceSwap] = None
+        self.blender: Optional[FaceBlender] = None
+        self.composer: Optional[Composer] = None
+
+        # detect -> q_fd -> matting -> q_rvm -> parsing -> q_bisenet -> swap -> q_swap -> blend -> q_blend
+        # -> compose -> q_out -> publish (latest mailbox)
+        wiring = {
+            "detect": (self._stage_detect, self.q_in, self.q_fd),
+            "matting": (self._stage_matting, self.q_fd, self.q_rvm),
+            "parsing": (self._stage_parsing, self.q_rvm, self.q_bisenet),
+            "swap": (self._stage_swap, self.q_bisenet, self.q_swap),
+            "blend": (self._stage_blend, self.q_swap, self.q_blend),
+            "compose": (self._stage_compose, self.q_blend, self.q_out),
+            "publish": (self._stage_publish, self.q_out, None),
+        }
+        # Device groups for the AI stages (honours use_multi_gpu); AI stage threads are
+        # pinned to their group's cores so groups run as parallel pipeline segments.
+        self.placement: PlacementPlan = placement or plan_placement(config.use_multi_gpu)
+        self.stages: Dict[str, StageWorker] = {}
+        for name, (fn, in_q, out_q) in wiring.items():
+            group = self.placement.group_for(name)
+            self.stages[name] = StageWorker(
+                name,
+                fn,
+                in_q,
+                out_q,
+                on_error=self._on_stage_error,
+                on_thread_start=group.pin_current_thread if group is not None else None,
+                on_drop=self._finish,
+            )
+
+        # Decoder thread feeding q_in (None for webrtc_client / no input); raises ValueError on bad config
+        self.source: Optional[FrameSource] = create_source(
+            config.input_source, self.submit, on_error=self._on_stage_error, on_open=self._on_source_open
+        )
+
+    @property
+    def running(self) -> bool:
+        return any(s.running for s in self.stages.values())
 
     def start(self):
-        if self._thread and self._thread.is_alive():
-            return
-        self._stop_event.clear()
-        self._thread = threading.Thread(target=self._run, name="ProcessingManager", daemon=True)
-        self._thread.start()
+        if self.readiness is not None:
+            self.readiness.subscribe(self._on_model_ready)
+        self._init_modules()
+        if self.mjpeg.closed:
+            self.mjpeg = MjpegBroadcaster(self.latest, self.jpeg)
+        for name in STAGE_ORDER:
+            self.stages[name].start()
+        if self.source is not None:
+            self.source.start()
 
     def stop(self):
-        self._stop_event.set()
-        if self._thread:
-            self._thread.join(timeout=5)
-
-    def _run(self):
-        # Initialize AI modules
-        fd = FaceDetector()
-        rvm = HumanMatting()
-        parser = FaceParsing()
-        swapper = FaceSwap()
-        blender = FaceBlender()
-        composer = Composer()
-
-        # Simplified placeholder loop (no real video I/O yet)
-        while not self._stop_event.is_set():
-            # 1) read frame (placeholder): would be produced by input capture
-            frame = None
-            # 2) face detection
-            detections = fd.detect(frame)
-            # 3) human matting
-            fgr, pha = rvm.infer(frame)
-            # 4) face parsing -> mask
-            mask = parser.parse(frame)
-            # 5) face swap per detection
-            swapped = None
-            if detections:
-                # pick best detection placeholder
-                swapped = swapper.swap(frame, detections[0], None)
-            # 6) blending
-            final_fgr = blender.blend(fgr, swapped, mask)
-            # 7) final composition
-            final_image = composer.compose(final_fgr, pha, None)
-            # 8) enqueue output (placeholder)
-            try:
-                self.q_out.put_nowait(final_image)
-            except queue.Full:
-                pass
\ No newline at end of file
+        # Stop upstream first so downstream stages are not fed mid-shutdown
+        if self.source is not None:
+            self.source.stop()
+        for name in STAGE_ORDER:
+            self.stages[name].stop()
+        self.mjpeg.close()
+        if self.readiness is not None:
+            self.readiness.unsubscribe(self._on_model_ready)
+
+    def start_stage(self, name: str):
+        self._init_modules()
+        self.stages[name].start()
+
+    def stop_stage(self, name: str):
+        self.stages[name].stop()
+
+    def set_source_face(self, path: str) -> str:
+        """切换源人脸：已缓存则立即生效（"ready"），否则后台编码完成后再切换（"pending"），期间沿用旧脸。"""
+        self.source_face = path
+        fut = self.embeddings.submit(path)
+        if fut.done() and fut.exception() is None:
+            self.source_embedding = fut.result()
+            return "ready"
+        fut.add_done_callback(lambda f: self._on_embedding(path, f))
+        return "pending"
+
+    def set_dfm_model(self, path: str) -> str:
+        """切换换脸模型（不阻塞）：返回 "ready" 或 "loading"。"""
+        self.dfm_model = path
+        with self._lock:
+            swapper = self.swapper
+        if swapper is None:
+            # Not started yet: prewarm now, _init_modules selects it
+            return "ready" if self.models.prewarm(path, self.placement.group_for("swap")).done() else "loading"
+        return swapper.use_model(path)
+
+    def _on_embedding(self, path: str, fut):
+        if self.source_face != path:
+            return  # superseded by a later switch
+        exc = fut.exception()
+        if exc is not None:
+            self._on_stage_error("embedding", exc)
+            return
+        self.source_embedding = fut.result()
+
+    def submit(self, frame, ts: Optional[float] = None) -> int:
+        """将一帧送入流水线（q_in 满时丢弃最旧帧），返回分配的帧序号。"""
+        # Not self._lock: that is held while models are built, and the decoder must not wait on it
+        with self._count_lock:
+            seq = self._next_seq
+            self._next_seq += 1
+            self.frames_in += 1
+        pkt = FramePacket(seq=seq, ts=ts if ts is not None else time.time(), frame=frame)
+        if put_drop_oldest(self.q_in, pkt):
+            self._count("frames_dropped")
+        self._update_quality()
+        return seq
+
+    def status(self) -> dict:
+        return {"state": self.state, "error": self.error}
+
+    def stats(self) -> dict:
+        return {
+            **self.status(),
+            "frames_in": self.frames_in,
+            "frames_dropped": self.frames_dropped,
+            "frames_out": self.frames_out,
+            "frames_throttled": self.frames_throttled,
+            "frames_skipped": self.frames_skipped,
+            "quality": self.quality.to_dict(),
+            "buffer_pool": self.pool.stats(),
+            "pyramid": {"levels_built": self.pyramid_built, "shared_hits": self.pyramid_hits},
+            "source": self.source.stats() if self.source is not None else None,
+            "placement": self.placement.to_dict(),
+            "tracking": self.fd.stats() if self.fd is not None else None,
+            "matting": self.rvm.stats() if self.rvm is not None else None,
+            "parsing": self.parser.stats() if self.parser is not None else None,
+            "swap": self.swapper.stats() if self.swapper is not None else None,
+            "active_stages": self.active_stages(),
+            "source_face": {"path": self.source_face, "ready": self.source_embedding is not None},
+            "stages": {name: self.stages[name].stats() for name in STAGE_ORDER},
+        }
+
+    def active_stages(self) -> list:
+        """当前真正运行模型的 AI 阶段（其余阶段直通）。"""
+        modules = {"detect": self.fd, "matting": self.rvm, "parsing": self.parser}
+        active = [name for name, m in modules.items() if m is not None and m.session is not None]
+        if self.swapper is not None and self.swapper.model_path is not None:
+            active.append("swap")
+        return active
+
+    def _update_quality(self) -> None:
+        # Cheap per frame; the controller evaluates once per window. Rate-limit refusals are the
+        # session's own cap, not overload, so only the remaining drops count against the pipeline.
+        stage_ms = {name: self.stages[name].avg_ms for name in ("detect", "matting", "parsing", "swap", "blend")}
+        self.quality.update(
+            self.frames_in, self.frames_out, self.frames_dropped - self.frames_throttled, stage_ms
+        )
+
+    def _apply_quality(self, level: QualityLevel) -> None:
+        # Each module picks the new setting up on its next frame, in its own stage thread
+        fd, rvm, parser = self.fd, self.rvm, self.parser
+        if fd is not None:
+            fd.set_detect_interval(level.detect_interval)
+        if rvm is not None:
+            rvm.set_target_size(level.matting_size)
+        if parser is not None:
+            parser.set_size(level.parsing_size)
+            parser.max_reuse = level.parsing_reuse
+
+    def _stage_ready(self, stage: str) -> bool:
+        return self.readiness is None or self.readiness.ready(stage)
+
+    def _init_modules(self):
+        with self._lock:
+            if self._modules_ready:
+                return
+            self._modules_ready = True
+            for stage in ("detect", "matting", "parsing"):
+                if self._stage_ready(stage):
+                    self._attach(stage)
+            self.swapper = FaceSwap(device=self.placement.group_for("swap"), models=self.models)
+            if self.dfm_model:
+                self.swapper.use_model(self.dfm_model)
+            self.blender = FaceBlender()
+            self.composer = Composer()
+            self._apply_quality(self.quality.level)
+
+    def _attach(self, stage: str) -> None:
+        # Caller holds self._lock. The module is assigned in one step; its stage thread picks it up next frame.
+        group = self.placement.group_for(stage)
+        if stage == "detect" and self.fd is None:
+            self.fd = FaceDetector(device=group, detect_interval=settings.detect_interval)
+        elif stage == "matting" and self.rvm is None:
+            self.rvm = HumanMatting(device=group)
+        elif stage == "parsing" and self.parser is None:
+            self.parser = FaceParsing(device=group)
+        elif stage == "swap" and self.swapper is not None and not self.dfm_model:
+            # Default model just finished loading (an explicit selection is left alone)
+            self.swapper.use_model(self.swapper.default_model)
+
+    def _on_model_ready(self, stage: str) -> None:
+        with self._lock:
+            if self._modules_ready:
+                self._attach(stage)
+                self._apply_quality(self.quality.level)
+
+    def _on_stage_error(self, stage: str, exc: Exception):
+        # Recorded on this session only; the next published frame marks it healthy again
+        self.error = f"{stage}: {type(exc).__name__}: {exc}"
+        self.state = "ERROR"
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._count_lock:
+            setattr(self, name, getattr(self, name) + n)
+
+    def _on_source_open(self):
+        # New or looped input: recurrent matting state and face tracks no longer apply
+        if self.rvm is not None:
+            self.rvm.reset()
+        if self.fd is not None:
+            self.fd.keyframe()
+
+    def _finish(self, pkt: FramePacket) -> None:
+        # Frame leaves the pipeline (published, dropped or failed): return buffers and its slot
+        if pkt.pyramid is not None:
+            with self._count_lock:
+                self.pyramid_built += pkt.pyramid.built
+                self.pyramid_hits += pkt.pyramid.hits
+        pkt.release(self.pool)
+        if pkt.scheduled:
+            pkt.scheduled = False
+            self.scheduler.release(self.session_id)
+
+    def _pyramid(self, pkt: FramePacket) -> FramePyramid:
+        # Downscales of this frame, built on first request and shared by detection, tracking and matting
+        if pkt.pyramid is None:
+            pkt.pyramid = FramePyramid(pkt.frame, borrow=lambda shape: self._borrow(pkt, shape))
+        return pkt.pyramid
+
+    def _faces(self, pkt: FramePacket) -> FaceCrops:
+        # Aligned crops of this frame, warped once and shared by parsing, swap and blend
+        if pkt.faces is None:
+            pkt.faces = FaceCrops(pkt.frame, borrow=lambda shape: self._borrow(pkt, shape))
+        return pkt.faces
+
+    def _borrow(self, pkt: FramePacket, shape, dtype=np.uint8) -> np.ndarray:
+        buf = self.pool.acquire(shape, dtype)
+        pkt.buffers.append(buf)
+        return buf
+
+    # ---- stages ----
+
+    def _stage_detect(self, pkt: FramePacket) -> Optional[FramePacket]:
+        if not self.quality.should_process(pkt.seq):
+            # Frame skip at the current quality level: never takes a scheduler slot
+            self._count("frames_skipped")
+            pkt.release(self.pool)
+            return None
+        if self.scheduler is not None:
+            if not self.scheduler.acquire(self.session_id):
+                # Over this session's rate or no slot freed in time: drop (newer frames follow)
+                with self._count_lock:
+                    self.frames_dropped += 1
+                    self.frames_throttled += 1
+                pkt.release(self.pool)
+                return None
+            pkt.scheduled = True
+        fd = self.fd
+        pkt.detections = fd.detect(pkt.frame, self._pyramid(pkt)) if fd is not None and pkt.frame is not None else []
+        return pkt
+
+    def _stage_matting(self, pkt: FramePacket) -> FramePacket:
+        if pkt.frame is None:
+            pkt.fgr, pkt.pha = None, None
+            return pkt
+        h, w = pkt.frame.shape[:2]
+        rvm = self.rvm
+        if rvm is None or rvm.session is None:
+            # No matting model yet: the whole frame is foreground (blend modifies fgr in place, so copy)
+            pkt.fgr = self._borrow(pkt, (h, w, 3))
+            np.copyto(pkt.fgr, pkt.frame)
+            pkt.pha = None
+            return pkt
+        out = (self._borrow(pkt, (h, w, 3)), self._borrow(pkt, (h, w)))
+        pkt.fgr, pkt.pha = rvm.infer(pkt.frame, out=out, pyramid=self._pyramid(pkt))
+        return pkt
+
+    def _stage_parsing(self, pkt: FramePacket) -> FramePacket:
+        # Only the face that gets swapped is parsed, on its aligned crop
+        faces = pkt.detections[:1]
+        parser = self.parser
+        if faces and pkt.frame is not None and parser is not None:
+            out = self._borrow(pkt, pkt.frame.shape[:2])
+            pkt.mask = parser.parse(pkt.frame, faces, out=out, crops=self._faces(pkt))
+        return pkt
+
+    def _stage_swap(self, pkt: FramePacket) -> FramePacket:
+        if pkt.detections and pkt.frame is not None:
+            out = self._borrow(pkt, pkt.frame.shape)
+            pkt.swapped = self.swapper.swap(
+                pkt.frame, pkt.detections[0], self.source_embedding, crops=self._faces(pkt), out=out
+            )
+        return pkt
+
+    def _stage_blend(self, pkt: FramePacket) -> FramePacket:
+        # In place into the pooled fgr buffer, limited to the swapped face's box
+        face = pkt.detections[0] if pkt.detections else None
+        pkt.final_fgr = self.blender.blend(pkt.fgr, pkt.swapped, pkt.mask, face, crops=pkt.faces)
+        return pkt
+
+    def _stage_compose(self, pkt: FramePacket) -> Optional[FramePacket]:
+        # Single worker per stage + FIFO queues keep frames in order; the guard
+        # makes the output sequence strictly monotonic even if a stage is restarted.
+        if pkt.seq <= self._last_out_seq:
+            self._finish(pkt)
+            return None
+        self._last_out_seq = pkt.seq
+        out = None
+        if pkt.final_fgr is not None:
+            out = self._borrow(pkt, pkt.final_fgr.shape)
+        pkt.output = self.composer.compose(pkt.final_fgr, pkt.pha, None, out=out)
+        return pkt
+
+    def _stage_publish(self, pkt: FramePacket) -> None:
+        out = pkt.output
+        if out is not None:
+            # The output buffer is handed to the mailbox, which returns it to the pool
+            # once a newer frame replaces it and no reader holds it.
+            release = None
+            if pkt.owns(out):
+                pkt.buffers = [b for b in pkt.buffers if b is not out]
+                release = self.pool.release
+            if self.latest.publish(pkt.seq, pkt.ts, out, release=release):
+                self._count("frames_out")
+                self.quality.observe(time.time() - pkt.ts)
+                if self.error is not None:
+                    self.state, self.error = "PROCESSING", None
+            elif release is not None:
+                release(out)
+        # Everything else the frame borrowed goes back now that it has left q_out
+        self._finish(pkt)
+        return None
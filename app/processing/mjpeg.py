@@ -0,0 +1,102 @@
+import asyncio
+import threading
+from typing import AsyncIterator, Optional, Set
+
+from .jpeg import EncodedFrame, JpegCache
+from .mailbox import FrameMailbox
+
+
+class _Subscriber:
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.event = asyncio.Event()
+
+
+class MjpegBroadcaster:
+    """
+    MJPEG 推流广播：一个共享编码线程等待新输出帧，编码一次后通知所有订阅者。
+    订阅者只读取“最新已编码帧”，慢客户端直接跳到最新帧，不会积压队列。
+    编码线程只在有订阅者时运行。
+    """
+
+    def __init__(self, mailbox: FrameMailbox, jpeg: JpegCache, poll_interval: float = 0.5):
+        self._mailbox = mailbox
+        self._jpeg = jpeg
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._subs: Set[_Subscriber] = set()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self.latest: Optional[EncodedFrame] = None
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    @property
+    def subscribers(self) -> int:
+        with self._lock:
+            return len(self._subs)
+
+    def close(self):
+        """结束所有订阅（流水线停止时调用）。"""
+        with self._lock:
+            self._closed = True
+            subs = list(self._subs)
+        self._notify(subs)
+
+    async def frames(self) -> AsyncIterator[EncodedFrame]:
+        """异步迭代最新编码帧；帧序号严格递增，中间帧可能被跳过。"""
+        sub = self._subscribe()
+        try:
+            last_seq = -1
+            while not self._closed:
+                enc = self.latest
+                if enc is not None and enc.seq > last_seq:
+                    last_seq = enc.seq
+                    yield enc
+                    continue
+                await sub.event.wait()
+                sub.event.clear()
+        finally:
+            self._unsubscribe(sub)
+
+    def _subscribe(self) -> _Subscriber:
+        sub = _Subscriber(asyncio.get_running_loop())
+        with self._lock:
+            self._subs.add(sub)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="MjpegEncoder", daemon=True)
+                self._thread.start()
+        return sub
+
+    def _unsubscribe(self, sub: _Subscriber):
+        with self._lock:
+            self._subs.discard(sub)
+
+    def _notify(self, subs):
+        for sub in subs:
+            try:
+                sub.loop.call_soon_threadsafe(sub.event.set)
+            except RuntimeError:
+                # Event loop already closed
+                pass
+
+    def _run(self):
+        seq = self.latest.seq if self.latest is not None else -1
+        while True:
+            with self._lock:
+                if not self._subs or self._closed:
+                    self._thread = None
+                    return
+            snap = self._mailbox.wait_newer(seq, timeout=self.poll_interval)
+            if snap is None:
+                continue
+            enc = self._jpeg.get()
+            if enc is None:
+                continue
+            seq = enc.seq
+            self.latest = enc
+            with self._lock:
+                subs = list(self._subs)
+            self._notify(subs)
@@ -0,0 +1,34 @@
+from dataclasses import dataclass, field
+from typing import Any, List
+
+
+@dataclass
+class FramePacket:
+    """在流水线各阶段之间传递的单帧数据（每个阶段填充自己的字段）。"""
+
+    seq: int
+    ts: float  # capture timestamp (time.time())
+    frame: Any = None
+    # Lazy downscales of frame (processing.pyramid.FramePyramid) shared by detection, tracking and matting
+    pyramid: Any = None
+    detections: List[Any] = field(default_factory=list)
+    fgr: Any = None
+    pha: Any = None
+    # Per-frame aligned face crops (ai.face_crops.FaceCrops) shared by parsing, swap and blend
+    faces: Any = None
+    mask: Any = None
+    swapped: Any = None
+    final_fgr: Any = None
+    output: Any = None
+    # Pooled buffers owned by this frame; returned to the pool when it leaves q_out
+    buffers: List[Any] = field(default_factory=list)
+    # Holds a FairScheduler slot (multi-session mode) until the frame leaves the pipeline
+    scheduled: bool = False
+
+    def owns(self, arr) -> bool:
+        return any(b is arr for b in self.buffers)
+
+    def release(self, pool) -> None:
+        for b in self.buffers:
+            pool.release(b)
+        self.buffers.clear()
@@ -0,0 +1,169 @@
+import os
+import shutil
+import subprocess
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+CUDA_PROVIDER = "CUDAExecutionProvider"
+CPU_PROVIDER = "CPUExecutionProvider"
+
+# AI stages that own an ONNX model, and their relative per-frame cost (used for balancing)
+STAGE_MODELS = {"detect": "retinaface", "matting": "rvm", "parsing": "bisenet", "swap": "dfl"}
+STAGE_COST = {"detect": 1.0, "matting": 3.0, "parsing": 1.5, "swap": 4.0}
+
+
+@dataclass
+class DeviceGroup:
+    """
+    执行设备组：一个 ONNX Runtime provider（某块 GPU 或 CPU）加一组 CPU 核心。
+    组内各阶段的会话共享该组的线程预算，阶段线程绑定到该组核心上。
+    """
+
+    name: str
+    provider: str = CPU_PROVIDER
+    device_id: int = 0
+    cores: Tuple[int, ...] = ()
+    stages: List[str] = field(default_factory=list)
+
+    @property
+    def threads(self) -> int:
+        return max(len(self.cores), 1)
+
+    def intra_op_threads(self) -> int:
+        # Stages of one group run concurrently, so they split the group's cores
+        return max(self.threads // max(len(self.stages), 1), 1)
+
+    def pin_current_thread(self) -> None:
+        # On Linux sched_setaffinity(0, ...) applies to the calling thread only
+        if self.cores and hasattr(os, "sched_setaffinity"):
+            try:
+                os.sched_setaffinity(0, self.cores)
+            except OSError:
+                pass
+
+    def to_dict(self) -> dict:
+        return {
+            "provider": self.provider,
+            "device_id": self.device_id,
+            "cores": list(self.cores),
+            "stages": list(self.stages),
+            "intra_op_threads": self.intra_op_threads(),
+        }
+
+
+@dataclass
+class PlacementPlan:
+    groups: List[DeviceGroup]
+    assignment: Dict[str, str]  # stage -> group name
+
+    def group_for(self, stage: str) -> Optional[DeviceGroup]:
+        name = self.assignment.get(stage)
+        return next((g for g in self.groups if g.name == name), None)
+
+    def to_dict(self) -> dict:
+        return {"groups": {g.name: g.to_dict() for g in self.groups}, "assignment": dict(self.assignment)}
+
+
+def detect_gpu_count() -> int:
+    """可用于 ONNX Runtime 的 CUDA 设备数量；无 CUDA provider 时为 0。"""
+    try:
+        import onnxruntime as ort
+
+        if CUDA_PROVIDER not in ort.get_available_providers():
+            return 0
+    except Exception:
+        return 0
+    visible = os.getenv("CUDA_VISIBLE_DEVICES")
+    if visible is not None:
+        return len([d for d in visible.split(",") if d.strip() and d.strip() != "-1"])
+    if shutil.which("nvidia-smi"):
+        try:
+            out = subprocess.run(["nvidia-smi", "-L"], capture_output=True, text=True, timeout=5).stdout
+            return max(sum(1 for line in out.splitlines() if line.startswith("GPU ")), 1)
+        except Exception:
+            pass
+    return 1
+
+
+def _available_cores() -> List[int]:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def _balance(stages: Sequence[str], n_groups: int) -> List[List[str]]:
+    # Longest-processing-time first: heaviest stage goes to the least loaded group
+    buckets: List[List[str]] = [[] for _ in range(n_groups)]
+    loads = [0.0] * n_groups
+    for stage in sorted(stages, key=lambda s: -STAGE_COST.get(s, 1.0)):
+        i = loads.index(min(loads))
+        buckets[i].append(stage)
+        loads[i] += STAGE_COST.get(stage, 1.0)
+    return buckets
+
+
+def _split_cores(cores: Sequence[int], weights: Sequence[float]) -> List[Tuple[int, ...]]:
+    """按权重把核心切成连续区间，每组至少 1 个核心（核心不足时循环复用）。"""
+    n = len(weights)
+    if len(cores) < n:
+        return [(cores[i % len(cores)],) for i in range(n)]
+    total = sum(weights) or float(n)
+    counts = [max(int(len(cores) * w / total), 1) for w in weights]
+    # Hand out / take back the rounding remainder starting from the heaviest group
+    order = sorted(range(n), key=lambda i: -weights[i])
+    k = 0
+    while sum(counts) < len(cores):
+        counts[order[k % n]] += 1
+        k += 1
+    while sum(counts) > len(cores):
+        i = order[k % n]
+        if counts[i] > 1:
+            counts[i] -= 1
+        k += 1
+    out, start = [], 0
+    for c in counts:
+        out.append(tuple(cores[start:start + c]))
+        start += c
+    return out
+
+
+def plan_placement(
+    use_multi_gpu: bool,
+    gpu_count: Optional[int] = None,
+    cores: Optional[Sequence[int]] = None,
+    stages: Sequence[str] = tuple(STAGE_MODELS),
+) -> PlacementPlan:
+    """
+    把 AI 阶段分配到设备组：
+    - 有 GPU 且 use_multi_gpu：每块 GPU 一个组（最多与阶段数相同），按代价均衡分配阶段；
+    - 仅 CPU 且 use_multi_gpu：按核心切分为多个组（每组至少 2 核），各组独立会话与线程预算；
+    - use_multi_gpu=False：单一设备组。
+    gpu_count/cores 可显式传入，便于在无 GPU 的机器上验证规划结果。
+    """
+    gpu_count = detect_gpu_count() if gpu_count is None else gpu_count
+    cores = list(cores) if cores is not None else _available_cores()
+    stages = list(stages)
+
+    if gpu_count > 0:
+        n_groups = min(gpu_count, len(stages)) if use_multi_gpu else 1
+    else:
+        n_groups = min(len(stages), max(len(cores) // 2, 1)) if use_multi_gpu else 1
+    n_groups = max(n_groups, 1)
+
+    buckets = [b for b in _balance(stages, n_groups) if b]
+    weights = [sum(STAGE_COST.get(s, 1.0) for s in b) for b in buckets]
+    # GPU groups still need host cores for pre/post-processing; split evenly there
+    core_sets = _split_cores(cores, weights if gpu_count == 0 else [1.0] * len(buckets))
+
+    groups: List[DeviceGroup] = []
+    assignment: Dict[str, str] = {}
+    for i, (bucket, core_set) in enumerate(zip(buckets, core_sets)):
+        if gpu_count > 0:
+            group = DeviceGroup(f"cuda:{i}", CUDA_PROVIDER, device_id=i, cores=core_set, stages=bucket)
+        else:
+            group = DeviceGroup(f"cpu:{i}", CPU_PROVIDER, device_id=0, cores=core_set, stages=bucket)
+        groups.append(group)
+        for s in bucket:
+            assignment[s] = group.name
+    return PlacementPlan(groups=groups, assignment=assignment)
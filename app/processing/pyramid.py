@@ -0,0 +1,83 @@
+from typing import Callable, Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+Size = Tuple[int, int]  # (width, height)
+
+
+class FramePyramid:
+    """
+    单帧的惰性图像金字塔，随 FramePacket 在各阶段间传递：
+    - 某个尺寸第一次被请求时才生成，之后所有阶段共用（检测的 640 适配图、跟踪的灰度图、抠图的场景切换缩略图等）；
+    - 缩小一半以上时先逐级 pyrDown（各级也缓存），剩余部分再用 INTER_AREA 缩放，都从最接近的已有层开始；
+    - borrow(shape) 提供层缓冲（流水线中借自帧的缓冲池，随帧归还）。
+    各层只读，且只在该帧离开流水线前有效（随帧归还缓冲池）；跨帧保留须自行复制。
+    """
+
+    def __init__(self, frame: np.ndarray, borrow: Optional[Callable[[tuple], np.ndarray]] = None):
+        self.frame = frame
+        self.height, self.width = frame.shape[:2]
+        self._borrow = borrow
+        self._levels: Dict[Size, np.ndarray] = {(self.width, self.height): frame}
+        self._gray: Dict[Size, np.ndarray] = {}
+        self.built = 0
+        self.hits = 0
+
+    def get(self, width: int, height: int) -> np.ndarray:
+        """width×height 的 BGR 图像（不大于原图时缩小，否则返回原图）。"""
+        if width >= self.width or height >= self.height:
+            return self.frame
+        lv = self._levels.get((width, height))
+        if lv is not None:
+            self.hits += 1
+            return lv
+        # Smallest cached level that still covers the target
+        (sw, sh), src = min(
+            ((s, img) for s, img in self._levels.items() if s[0] >= width and s[1] >= height),
+            key=lambda item: item[0][0] * item[0][1],
+        )
+        while sw >= 2 * width and sh >= 2 * height:
+            dw, dh = (sw + 1) // 2, (sh + 1) // 2
+            down = self._levels.get((dw, dh))
+            if down is None:
+                down = cv2.pyrDown(src, dst=self._buffer(dh, dw, src), dstsize=(dw, dh))
+                self._levels[(dw, dh)] = down
+                self.built += 1
+            src, sw, sh = down, dw, dh
+        if (sw, sh) != (width, height):
+            src = cv2.resize(src, (width, height), dst=self._buffer(height, width, src), interpolation=cv2.INTER_AREA)
+            self._levels[(width, height)] = src
+            self.built += 1
+        return src
+
+    def fit(self, width: int, height: int) -> Tuple[np.ndarray, float]:
+        """保持比例缩小到能放进 width×height：返回 (图像, 缩放比)，缩放比 ≥1 时返回原图与 1.0。"""
+        r = min(width / float(self.width), height / float(self.height))
+        if r >= 1.0:
+            return self.frame, 1.0
+        nw, nh = max(int(round(self.width * r)), 1), max(int(round(self.height * r)), 1)
+        return self.get(nw, nh), r
+
+    def gray(self, width: int, height: int) -> np.ndarray:
+        """width×height 的灰度图（同样按尺寸缓存）。"""
+        g = self._gray.get((width, height))
+        if g is None:
+            src = self.get(width, height)
+            if src.ndim == 2:
+                return src
+            out = self._borrow((src.shape[0], src.shape[1])) if self._borrow is not None else None
+            g = self._gray[(width, height)] = cv2.cvtColor(src, cv2.COLOR_BGR2GRAY, dst=out)
+            self.built += 1
+        else:
+            self.hits += 1
+        return g
+
+    def stats(self) -> dict:
+        return {"levels": sorted(self._levels), "built": self.built, "hits": self.hits}
+
+    def _buffer(self, h: int, w: int, like: np.ndarray) -> Optional[np.ndarray]:
+        if self._borrow is None:
+            return None
+        return self._borrow((h, w) + like.shape[2:])
@@ -0,0 +1,194 @@
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, List, Optional, Sequence
+
+from ..config import settings
+
+
+@dataclass(frozen=True)
+class QualityLevel:
+    name: str
+    matting_size: int  # HumanMatting.target_size (internal RVM resolution, long side)
+    detect_interval: int  # full detection every N frames, tracking in between
+    parsing_size: int  # aligned crop side for BiSeNet (dynamic-shape models only)
+    parsing_reuse: int  # max frames a still face reuses its parsing mask
+    skip: int  # process 1 of every `skip` input frames
+
+
+# Best first. Each step is cheap to switch: no model reload, state is rebuilt on the next frame.
+LEVELS = (
+    QualityLevel("high", 512, 5, 512, 3, 1),
+    QualityLevel("medium", 384, 10, 512, 5, 1),
+    QualityLevel("low", 320, 15, 384, 8, 1),
+    QualityLevel("lower", 256, 20, 320, 12, 2),
+    QualityLevel("minimum", 192, 30, 256, 20, 3),
+)
+
+
+class QualityController:
+    """
+    闭环质量控制：按窗口测量端到端延迟（采集到发布）、输出帧率与各阶段耗时，
+    在 LEVELS 之间升降档以守住 target_fps / target_latency_ms。
+    - 过载（延迟超标、输出帧率低于应有值或输入端丢帧）连续 down_after 个窗口才降档，
+      明显富余（延迟低于 up_ratio × 目标且帧率达标）连续 up_after 个窗口才升档；
+    - 每次切换后 hold_s 内不再变动，避免来回振荡；
+    - decisions 记录最近的切换及原因，供 API 查看。
+    """
+
+    def __init__(
+        self,
+        target_fps: float = 25.0,
+        target_latency_ms: float = settings.quality_latency_ms,
+        levels: Sequence[QualityLevel] = LEVELS,
+        start_level: int = 1,
+        window_s: float = 1.0,
+        down_after: int = 2,
+        up_after: int = 5,
+        up_ratio: float = 0.6,
+        hold_s: float = 3.0,
+        enabled: bool = settings.adaptive_quality,
+        on_change: Optional[Callable[[QualityLevel], None]] = None,
+    ):
+        self.levels = list(levels)
+        self.target_fps = target_fps
+        self.target_latency_ms = target_latency_ms
+        self.window_s = window_s
+        self.down_after = down_after
+        self.up_after = up_after
+        self.up_ratio = up_ratio
+        self.hold_s = hold_s
+        self.enabled = enabled
+        self.on_change = on_change
+        self.index = min(max(start_level, 0), len(self.levels) - 1)
+        self.decisions: deque = deque(maxlen=20)
+
+        self._lock = threading.Lock()
+        self._latencies: List[float] = []
+        self._window_start = time.monotonic()
+        self._counts = (0, 0, 0)  # frames_in, frames_out, frames_dropped at window start
+        self._over = 0
+        self._under = 0
+        self._changed_at = 0.0
+        self.last: Dict[str, float] = {}
+
+    @property
+    def level(self) -> QualityLevel:
+        return self.levels[self.index]
+
+    def should_process(self, seq: int) -> bool:
+        """帧跳过：当前档位下只处理每 skip 帧中的一帧。"""
+        return seq % self.level.skip == 0
+
+    def observe(self, latency_s: float) -> None:
+        # Publish thread: one sample per output frame
+        with self._lock:
+            self._latencies.append(latency_s)
+
+    def configure(
+        self,
+        enabled: Optional[bool] = None,
+        target_fps: Optional[float] = None,
+        target_latency_ms: Optional[float] = None,
+        level: Optional[str] = None,
+    ) -> None:
+        changed = None
+        with self._lock:
+            if target_fps is not None:
+                self.target_fps = target_fps
+            if target_latency_ms is not None:
+                self.target_latency_ms = target_latency_ms
+            if enabled is not None:
+                self.enabled = enabled
+            if level is not None:
+                names = [lv.name for lv in self.levels]
+                if level not in names:
+                    raise ValueError(f"Unknown quality level: {level} (one of {', '.join(names)})")
+                changed = self._set(names.index(level), "manual")
+        self._notify(changed)
+
+    def update(self, frames_in: int, frames_out: int, frames_dropped: int, stage_ms: Dict[str, float]) -> None:
+        """每个窗口评估一次（调用方可按帧调用，不足一个窗口时直接返回）。"""
+        now = time.monotonic()
+        # The whole decision runs under the lock: configure() changes the same level and counters
+        with self._lock:
+            dt = now - self._window_start
+            if dt < self.window_s:
+                return
+            changed = self._evaluate(now, dt, frames_in, frames_out, frames_dropped, stage_ms)
+        self._notify(changed)
+
+    def to_dict(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "level": asdict(self.level),
+            "levels": [lv.name for lv in self.levels],
+            "target_fps": self.target_fps,
+            "target_latency_ms": self.target_latency_ms,
+            "measured": dict(self.last),
+            "decisions": list(self.decisions),
+        }
+
+    def _evaluate(
+        self, now: float, dt: float, frames_in: int, frames_out: int, frames_dropped: int, stage_ms: Dict[str, float]
+    ) -> Optional[QualityLevel]:
+        # Caller holds the lock; returns the new level if it changed
+        lat = sorted(self._latencies)
+        self._latencies = []
+        c_in, c_out, c_drop = self._counts
+        self._counts = (frames_in, frames_out, frames_dropped)
+        self._window_start = now
+        fps_in = (frames_in - c_in) / dt
+        fps_out = (frames_out - c_out) / dt
+        dropped = frames_dropped - c_drop
+        p90_ms = lat[int(len(lat) * 0.9)] * 1000.0 if lat else 0.0
+        # What the output should reach at this level given the input rate and frame skip
+        expected = min(self.target_fps, fps_in / self.level.skip)
+        self.last = {
+            "fps_in": round(fps_in, 2),
+            "fps_out": round(fps_out, 2),
+            "expected_fps": round(expected, 2),
+            "latency_p90_ms": round(p90_ms, 1),
+            "dropped": dropped,
+        }
+        if not self.enabled or fps_in <= 0:
+            self._over = self._under = 0
+            return None
+
+        over_latency = p90_ms > self.target_latency_ms
+        # Deliberately skipped frames are not counted as drops; drops mean the pipeline fell behind
+        behind = fps_out < 0.9 * expected or dropped > max(1.0, 0.05 * fps_in * dt)
+        if over_latency or behind:
+            self._over += 1
+            self._under = 0
+        elif p90_ms < self.up_ratio * self.target_latency_ms and fps_out >= 0.97 * expected:
+            self._under += 1
+            self._over = 0
+        else:
+            self._over = self._under = 0
+
+        if now - self._changed_at < self.hold_s:
+            return None
+        slowest = max(stage_ms, key=stage_ms.get) if stage_ms else None
+        if self._over >= self.down_after and self.index < len(self.levels) - 1:
+            why = "latency" if over_latency else "throughput"
+            return self._set(
+                self.index + 1, f"{why}: p90 {p90_ms:.0f} ms, {fps_out:.1f}/{expected:.1f} fps, slowest {slowest}"
+            )
+        if self._under >= self.up_after and self.index > 0:
+            return self._set(self.index - 1, f"headroom: p90 {p90_ms:.0f} ms, {fps_out:.1f}/{expected:.1f} fps")
+        return None
+
+    def _set(self, index: int, reason: str) -> QualityLevel:
+        # Caller holds the lock; on_change runs after it is released (see _notify)
+        prev = self.level.name
+        self.index = index
+        self._changed_at = time.monotonic()
+        self._over = self._under = 0
+        self.decisions.append({"ts": round(time.time(), 3), "from": prev, "to": self.level.name, "reason": reason})
+        return self.level
+
+    def _notify(self, level: Optional[QualityLevel]) -> None:
+        if level is not None and self.on_change is not None:
+            self.on_change(level)
@@ -0,0 +1,349 @@
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from ..config import settings
+from ..ai import runtime
+from ..ai.dfm_cache import DfmModelCache
+from ..ai.readiness import ModelReadiness
+from .embeddings import SourceEmbeddingCache
+from .manager import PipelineConfig, ProcessingManager
+from .placement import DeviceGroup, PlacementPlan, plan_placement
+
+
+class AdmissionError(RuntimeError):
+    """容量不足，无法接纳新的流会话。"""
+
+
+class UnknownSessionError(LookupError):
+    """指定的流会话不存在（API 返回 404）。"""
+
+    def __init__(self, sid: str):
+        super().__init__(f"Unknown session: {sid}")
+        self.sid = sid
+
+
+class FairScheduler:
+    """
+    跨会话的帧调度：全局限制同时在流水线中的帧数（slots），空闲槽位按
+    优先级（高者先）→ 加权虚拟时间（小者先）分配给等待中的会话；
+    每个会话另有令牌桶把准入速率限制在其 target_fps。
+    另记录槽位占用（slot·秒）与释放的帧数：由 Little 定律得到每帧平均占用时间，
+    slots / 占用时间即流水线不受令牌桶限制时的处理能力。
+    """
+
+    def __init__(self, slots: int = 4, burst: float = 2.0):
+        self.slots = max(int(slots), 1)
+        self.burst = burst
+        self._cond = threading.Condition()
+        self._inflight = 0
+        # sid -> [priority, weight, target_fps, vtime, tokens, last_refill, waiting, inflight]
+        self._sessions: Dict[str, list] = {}
+        self.granted = 0
+        self.rate_limited = 0
+        self.timed_out = 0
+        # Seconds during which a frame waited with every slot busy (capacity signal)
+        self._busy_since: Optional[float] = None
+        self.saturated_s = 0.0
+        # Integral of inflight over time, and frames that completed their slot
+        self.released = 0
+        self._slot_s = 0.0
+        self._slot_t = time.monotonic()
+
+    def register(self, sid: str, priority: int = 0, weight: float = 1.0, target_fps: float = 0.0):
+        with self._cond:
+            # New sessions start at the current minimum virtual time: no catch-up burst
+            vmin = min((s[3] for s in self._sessions.values()), default=0.0)
+            self._sessions[sid] = [priority, max(weight, 1e-3), target_fps, vmin, self.burst, time.monotonic(), 0, 0]
+
+    def set_rate(self, sid: str, target_fps: float):
+        with self._cond:
+            if sid in self._sessions:
+                self._sessions[sid][2] = target_fps
+
+    def unregister(self, sid: str):
+        with self._cond:
+            s = self._sessions.pop(sid, None)
+            if s is not None:
+                # Frames still queued in a stopped session never reach release()
+                self._accumulate()
+                self._inflight -= s[7]
+            self._cond.notify_all()
+
+    def acquire(self, sid: str, timeout: float = 1.0) -> bool:
+        """为 sid 的一帧申请流水线槽位；超速或超时返回 False（调用方丢帧）。"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            s = self._sessions.get(sid)
+            if s is None:
+                return True
+            if not self._take_token(s):
+                self.rate_limited += 1
+                return False
+            s[6] += 1
+            try:
+                while not (self._inflight < self.slots and self._next() == sid):
+                    if self._busy_since is None and self._inflight >= self.slots:
+                        self._busy_since = time.monotonic()
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or sid not in self._sessions:
+                        self.timed_out += 1
+                        return False
+                    self._cond.wait(remaining)
+                self._accumulate()
+                self._inflight += 1
+                s[7] += 1
+                s[3] += 1.0 / s[1]
+                self.granted += 1
+                return True
+            finally:
+                s[6] -= 1
+                self._cond.notify_all()
+
+    def release(self, sid: str):
+        with self._cond:
+            s = self._sessions.get(sid)
+            if s is None or s[7] <= 0:
+                return
+            self._accumulate()
+            s[7] -= 1
+            self._inflight -= 1
+            self.released += 1
+            if self._busy_since is not None:
+                self.saturated_s += time.monotonic() - self._busy_since
+                self._busy_since = None
+            self._cond.notify_all()
+
+    def occupancy(self) -> Tuple[int, float]:
+        """(已释放的帧数, 累计槽位占用 slot·秒)，供容量测量取差值。"""
+        with self._cond:
+            self._accumulate()
+            return self.released, self._slot_s
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "slots": self.slots,
+                "inflight": self._inflight,
+                "granted": self.granted,
+                "rate_limited": self.rate_limited,
+                "timed_out": self.timed_out,
+                "saturated_s": round(self.saturated_s, 3),
+            }
+
+    def _accumulate(self) -> None:
+        # Caller holds self._cond; call before every change of _inflight
+        now = time.monotonic()
+        self._slot_s += self._inflight * (now - self._slot_t)
+        self._slot_t = now
+
+    def _take_token(self, s: list) -> bool:
+        rate = s[2]
+        if rate <= 0:
+            return True
+        now = time.monotonic()
+        s[4] = min(s[4] + (now - s[5]) * rate, self.burst)
+        s[5] = now
+        if s[4] < 1.0:
+            return False
+        s[4] -= 1.0
+        return True
+
+    def _next(self) -> Optional[str]:
+        waiting = [(sid, s) for sid, s in self._sessions.items() if s[6] > 0]
+        if not waiting:
+            return None
+        return min(waiting, key=lambda item: (-item[1][0], item[1][3]))[0]
+
+
+@dataclass
+class StreamSession:
+    id: str
+    manager: ProcessingManager
+    priority: int = 0
+    weight: float = 1.0
+    target_fps: float = 25.0
+    degraded: bool = False
+    created: float = field(default_factory=time.time)
+
+    def to_dict(self) -> dict:
+        return {
+            "session_id": self.id,
+            "priority": self.priority,
+            "weight": self.weight,
+            "target_fps": self.target_fps,
+            "degraded": self.degraded,
+            "created": self.created,
+            "pipeline": self.manager.stats(),
+        }
+
+
+class SessionRegistry:
+    """
+    多路流会话注册表：每个会话拥有独立的 ProcessingManager（队列、状态、输出邮箱），
+    所有会话共享同一份设备分组（因而共享各组的模型会话与线程预算）和 FairScheduler。
+    新会话按实测容量（初值为配置的 capacity_fps，之后由调度器的槽位占用测得）做准入控制：余量足够则按目标帧率接纳，不足但高于 min_session_fps 时
+    降级接纳，否则拒绝。
+    """
+
+    # Frames per window needed before a capacity sample is trusted
+    MIN_SAMPLE_FRAMES = 10
+
+    def __init__(
+        self,
+        capacity_fps: float = settings.stream_capacity_fps,
+        slots: int = settings.stream_slots,
+        min_session_fps: float = settings.min_session_fps,
+        embeddings: Optional[SourceEmbeddingCache] = None,
+        models: Optional[DfmModelCache] = None,
+        readiness: Optional[ModelReadiness] = None,
+    ):
+        self.capacity_fps = capacity_fps
+        self.min_session_fps = min_session_fps
+        self.scheduler = FairScheduler(slots=slots)
+        self.embeddings = embeddings or SourceEmbeddingCache()
+        self.models = models or DfmModelCache()
+        self.readiness = readiness
+        self._lock = threading.RLock()
+        self._sessions: Dict[str, StreamSession] = {}
+        self._placement: Dict[bool, PlacementPlan] = {}
+        # (time, frames released, slot-seconds) from the previous capacity sample
+        self._sample: Optional[Tuple[float, int, float]] = None
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def get(self, sid: Optional[str] = None) -> Optional[StreamSession]:
+        """按 ID 取会话；sid 为空时返回最早创建的会话（兼容单流接口）。"""
+        with self._lock:
+            if sid:
+                return self._sessions.get(sid)
+            return next(iter(self._sessions.values()), None)
+
+    def manager(self, sid: Optional[str] = None, required: bool = True) -> Optional[ProcessingManager]:
+        """会话的 ProcessingManager；sid 为空时取最早的会话（没有会话时为 None）。
+        sid 不存在时 required 为真抛 UnknownSessionError，否则返回 None。"""
+        session = self.get(sid)
+        if session is None and sid and required:
+            raise UnknownSessionError(sid)
+        return session.manager if session is not None else None
+
+    def list(self) -> List[StreamSession]:
+        with self._lock:
+            return list(self._sessions.values())
+
+    def plan(self, use_multi_gpu: bool = True) -> PlacementPlan:
+        """设备放置方案（按 use_multi_gpu 缓存，各会话与启动预热共用同一份）。"""
+        with self._lock:
+            plan = self._placement.get(use_multi_gpu)
+            if plan is None:
+                plan = self._placement[use_multi_gpu] = plan_placement(use_multi_gpu)
+            return plan
+
+    def plans(self) -> List[PlacementPlan]:
+        """use_multi_gpu 两种取值的放置方案：启动时对两者都预热，任一种会话都不会冷加载。"""
+        return [self.plan(True), self.plan(False)]
+
+    def groups_for(self, stage: str, model_path: str) -> List[DeviceGroup]:
+        """各放置方案中 stage 所在的设备组，按会话身份去重（设备与线程预算相同的组只取一个）。"""
+        groups: Dict[tuple, DeviceGroup] = {}
+        for plan in self.plans():
+            group = plan.group_for(stage)
+            groups.setdefault(runtime.registry.key(model_path, group), group)
+        return list(groups.values())
+
+    def create(
+        self,
+        config: PipelineConfig,
+        priority: int = 0,
+        weight: float = 1.0,
+        target_fps: float = 25.0,
+        allow_degraded: bool = True,
+    ) -> StreamSession:
+        """创建并启动会话；容量不足时抛 AdmissionError，输入源配置错误时抛 ValueError。"""
+        with self._lock:
+            fps, degraded = self._admit(target_fps, allow_degraded)
+            sid = uuid.uuid4().hex[:12]
+            plan = self.plan(config.use_multi_gpu)
+            mgr = ProcessingManager(
+                config,
+                placement=plan,
+                scheduler=self.scheduler,
+                session_id=sid,
+                embeddings=self.embeddings,
+                models=self.models,
+                readiness=self.readiness,
+                target_fps=fps,
+            )
+            session = StreamSession(sid, mgr, priority=priority, weight=weight, target_fps=fps, degraded=degraded)
+            self.scheduler.register(sid, priority=priority, weight=weight, target_fps=fps)
+            self._sessions[sid] = session
+        try:
+            mgr.start()
+        except Exception:
+            self.remove(sid)
+            raise
+        return session
+
+    def remove(self, sid: str) -> bool:
+        with self._lock:
+            session = self._sessions.pop(sid, None)
+        if session is None:
+            return False
+        session.manager.stop()
+        self.scheduler.unregister(sid)
+        return True
+
+    def clear(self) -> None:
+        for session in self.list():
+            self.remove(session.id)
+
+    def headroom_fps(self) -> float:
+        with self._lock:
+            return self._measure_capacity() - sum(s.target_fps for s in self._sessions.values())
+
+    def stats(self) -> dict:
+        with self._lock:
+            capacity = self._measure_capacity()
+            reserved = sum(s.target_fps for s in self._sessions.values())
+        return {
+            "sessions": len(self._sessions),
+            "capacity_fps": round(capacity, 2),
+            "reserved_fps": round(reserved, 2),
+            "headroom_fps": round(capacity - reserved, 2),
+            "scheduler": self.scheduler.stats(),
+        }
+
+    def _admit(self, target_fps: float, allow_degraded: bool) -> Tuple[float, bool]:
+        headroom = self.headroom_fps()
+        if target_fps <= headroom:
+            return target_fps, False
+        if allow_degraded and headroom >= self.min_session_fps:
+            return headroom, True
+        raise AdmissionError(
+            f"Insufficient capacity: requested {target_fps:.1f} fps, headroom {max(headroom, 0.0):.1f} fps"
+        )
+
+    def _measure_capacity(self) -> float:
+        # Output fps is capped by each session's token bucket, so it can never show spare capacity.
+        # Measure the pipelines instead: by Little's law the mean time a frame holds a slot is
+        # slot-seconds / frames released, and with every slot busy they would complete
+        # slots / hold_time frames per second (stage latency and device contention included).
+        now = time.monotonic()
+        released, slot_s = self.scheduler.occupancy()
+        prev = self._sample
+        if prev is None:
+            self._sample = (now, released, slot_s)
+            return self.capacity_fps
+        dt = now - prev[0]
+        if dt < 1.0:
+            return self.capacity_fps
+        self._sample = (now, released, slot_s)
+        frames, busy = released - prev[1], slot_s - prev[2]
+        if frames < self.MIN_SAMPLE_FRAMES or busy <= 0:
+            return self.capacity_fps
+        measured = self.scheduler.slots * frames / busy
+        self.capacity_fps = 0.7 * self.capacity_fps + 0.3 * measured
+        return self.capacity_fps
@@ -0,0 +1,280 @@
+import logging
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+import av
+
+from ..config import ASSETS_DIR
+
+
+logger = logging.getLogger("fusion.pipeline")
+
+# sink(frame_bgr, capture_ts)
+FrameSink = Callable[[object, float], None]
+
+
+class FrameSource:
+    """
+    输入源基类：在独立解码线程中用 PyAV（多线程解码）读取视频帧并交给 sink。
+    sink 通常是 ProcessingManager.submit（q_in 满时丢弃最旧帧），因此慢流水线不会累积采集延迟。
+    打开失败、读流出错或流意外结束时按指数退避重连；只有真正送出帧后退避才复位。
+    """
+
+    kind = "base"
+
+    def __init__(
+        self,
+        sink: FrameSink,
+        on_error: Optional[Callable[[str, Exception], None]] = None,
+        backoff_initial: float = 0.5,
+        backoff_max: float = 10.0,
+        on_open: Optional[Callable[[], None]] = None,
+    ):
+        self.sink = sink
+        self.on_error = on_error
+        # Called whenever a (re)opened stream starts delivering: temporal models reset their state
+        self.on_open = on_open
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+        self.state = "stopped"
+        self.frames = 0
+        self.reconnects = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=f"Source-{self.kind}", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+        self._thread = None
+        self.state = "stopped"
+
+    def stats(self) -> dict:
+        return {
+            "type": self.kind,
+            "state": self.state,
+            "frames": self.frames,
+            "reconnects": self.reconnects,
+            "last_error": self.last_error,
+        }
+
+    # ---- subclass hooks ----
+
+    def _open(self) -> av.container.InputContainer:
+        raise NotImplementedError
+
+    def _on_eof(self, container, stream) -> bool:
+        """流结束时调用；返回 True 表示已在原容器上继续（如文件循环），False 表示重新打开。"""
+        return False
+
+    def _pace(self, frame: av.VideoFrame, stream) -> None:
+        """实时源无需节流；文件源按 pts 节流到原始帧率。"""
+
+    # ---- decode loop ----
+
+    def _run(self):
+        backoff = self.backoff_initial
+        first = True
+        while not self._stop_event.is_set():
+            if not first:
+                self.reconnects += 1
+            first = False
+            self.state = "connecting"
+            try:
+                container = self._open()
+            except Exception as e:
+                self._report(e)
+                self._stop_event.wait(backoff)
+                backoff = min(backoff * 2, self.backoff_max)
+                continue
+            try:
+                stream = container.streams.video[0]
+                # Let FFmpeg pick frame/slice threading for the decoder
+                stream.thread_type = "AUTO"
+                self.state = "running"
+                if self.on_open:
+                    self.on_open()
+                while not self._stop_event.is_set():
+                    got_frame = False
+                    for frame in container.decode(stream):
+                        if self._stop_event.is_set():
+                            break
+                        if not got_frame:
+                            got_frame = True
+                            # Only a stream that actually delivers frames resets the reconnect backoff
+                            backoff = self.backoff_initial
+                        self._pace(frame, stream)
+                        self.frames += 1
+                        self.sink(frame.to_ndarray(format="bgr24"), time.time())
+                    if self._stop_event.is_set() or not (got_frame and self._on_eof(container, stream)):
+                        break
+                # Ended without a loop restart (server closed the stream, nothing decodable):
+                # back off before reopening instead of spinning on connect/EOF
+                self.state = "reconnecting"
+            except Exception as e:
+                self._report(e)
+            finally:
+                try:
+                    container.close()
+                except Exception:
+                    pass
+            self._stop_event.wait(backoff)
+            backoff = min(backoff * 2, self.backoff_max)
+        self.state = "stopped"
+
+    def _report(self, exc: Exception):
+        self.last_error = f"{type(exc).__name__}: {exc}"
+        self.state = "reconnecting"
+        logger.warning("source %s error: %s", self.kind, self.last_error)
+        if self.on_error:
+            self.on_error("source", exc)
+
+
+class FileSource(FrameSource):
+    """本地视频文件；默认循环播放，并按文件帧率节流以模拟实时输入。"""
+
+    kind = "file"
+
+    def __init__(self, sink: FrameSink, path: str, loop: bool = True, realtime: bool = True, **kwargs):
+        super().__init__(sink, **kwargs)
+        self.path = path
+        self.loop = loop
+        self.realtime = realtime
+        self._t0: Optional[float] = None
+        self._pts0: Optional[float] = None
+        # Pacing clock carried across loop restarts: pts offset of the current pass,
+        # last paced time and frame duration (the first frame of a pass follows the last one)
+        self._offset = 0.0
+        self._last: Optional[float] = None
+        self._dur = 0.0
+        self._next_pass: Optional[float] = None
+
+    def _open(self):
+        self._t0, self._last, self._offset, self._next_pass = None, None, 0.0, None
+        return av.open(self.path)
+
+    def _on_eof(self, container, stream) -> bool:
+        if not self.loop:
+            self._stop_event.set()
+            return False
+        container.seek(0, stream=stream)
+        if self._last is not None:
+            rate = stream.average_rate
+            self._next_pass = self._last + (self._dur or (1.0 / float(rate) if rate else 0.0))
+        if self.on_open:
+            self.on_open()
+        return True
+
+    def _pace(self, frame, stream):
+        if not self.realtime or frame.time is None:
+            return
+        if self._next_pass is not None:
+            self._offset, self._next_pass = self._next_pass - frame.time, None
+        t = frame.time + self._offset
+        if self._last is not None and t > self._last:
+            self._dur = t - self._last
+        self._last = t
+        now = time.monotonic()
+        if self._t0 is None:
+            self._t0, self._pts0 = now, t
+            return
+        delay = (t - self._pts0) - (now - self._t0)
+        if delay > 0:
+            self._stop_event.wait(delay)
+
+
+class V4L2Source(FrameSource):
+    """服务器本地摄像头（Linux v4l2）。"""
+
+    kind = "local_cam"
+
+    def __init__(self, sink: FrameSink, device: str, width: int = 0, height: int = 0, fps: int = 0, **kwargs):
+        super().__init__(sink, **kwargs)
+        self.device = device
+        self.options = {}
+        if width and height:
+            self.options["video_size"] = f"{width}x{height}"
+        if fps:
+            self.options["framerate"] = str(fps)
+
+    def _open(self):
+        return av.open(self.device, format="v4l2", options=self.options)
+
+
+class RtspSource(FrameSource):
+    """RTSP 拉流；断流或结束后按退避重连。"""
+
+    kind = "rtsp"
+
+    def __init__(self, sink: FrameSink, url: str, transport: str = "tcp", timeout_s: float = 5.0, **kwargs):
+        super().__init__(sink, **kwargs)
+        self.url = url
+        self.options = {
+            "rtsp_transport": transport,
+            "timeout": str(int(timeout_s * 1_000_000)),
+            # Low-latency demux: do not buffer input before decoding
+            "fflags": "nobuffer",
+            "flags": "low_delay",
+        }
+
+    def _open(self):
+        return av.open(self.url, options=self.options, timeout=max(float(self.options["timeout"]) / 1e6, 1.0))
+
+
+def create_source(input_source: Optional[dict], sink: FrameSink, **kwargs) -> Optional[FrameSource]:
+    """
+    根据 StreamStartRequest.input_source 创建输入源：
+    - {"type": "file", "path": "...", "loop": true, "realtime": true}（相对路径相对于 assets/user）
+    - {"type": "local_cam", "cam_id": 0, "width": 1280, "height": 720, "fps": 30}（或 "device": "/dev/video0"）
+    - {"type": "rtsp", "url": "rtsp://..."}（也接受 "rtsp_url"）
+    - {"type": "webrtc_client"} 或空：帧由其他通道送入，不创建解码线程
+    """
+    if not input_source:
+        return None
+    kind = input_source.get("type")
+    if kind in (None, "webrtc_client"):
+        return None
+    if kind == "file":
+        path = input_source.get("path")
+        if not path:
+            raise ValueError("input_source.path is required for type=file")
+        if not os.path.isabs(path):
+            path = os.path.join(str(ASSETS_DIR), "user", path)
+        return FileSource(
+            sink,
+            path,
+            loop=bool(input_source.get("loop", True)),
+            realtime=bool(input_source.get("realtime", True)),
+            **kwargs,
+        )
+    if kind == "local_cam":
+        device = input_source.get("device") or f"/dev/video{int(input_source.get('cam_id', 0))}"
+        return V4L2Source(
+            sink,
+            device,
+            width=int(input_source.get("width", 0)),
+            height=int(input_source.get("height", 0)),
+            fps=int(input_source.get("fps", 0)),
+            **kwargs,
+        )
+    if kind == "rtsp":
+        url = input_source.get("url") or input_source.get("rtsp_url")
+        if not url:
+            raise ValueError("input_source.url is required for type=rtsp")
+        return RtspSource(sink, url, transport=input_source.get("transport", "tcp"), **kwargs)
+    raise ValueError(f"Unsupported input_source type: {kind}")
@@ -0,0 +1,117 @@
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Optional
+
+
+logger = logging.getLogger("fusion.pipeline")
+
+
+class StageWorker:
+    """
+    流水线中的单个阶段：独立线程从 in_q 取数据，调用 fn 处理后放入 out_q。
+    - fn 返回 None 表示丢弃该帧（不向下游传递）。
+    - fn 抛出的异常不会终止线程，而是计数并通过 on_error 回调上报；出错的数据项交给 on_drop 回收。
+    - 停止时未能交给下游的结果同样交给 on_drop 回收。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[[Any], Any],
+        in_q: queue.Queue,
+        out_q: Optional[queue.Queue] = None,
+        on_error: Optional[Callable[[str, Exception], None]] = None,
+        poll_interval: float = 0.1,
+        on_thread_start: Optional[Callable[[], None]] = None,
+        on_drop: Optional[Callable[[Any], None]] = None,
+    ):
+        self.name = name
+        self.fn = fn
+        self.in_q = in_q
+        self.out_q = out_q
+        self.on_error = on_error
+        self.poll_interval = poll_interval
+        # Runs inside the worker thread before the loop (e.g. CPU affinity for a device group)
+        self.on_thread_start = on_thread_start
+        # Called with an item that failed in fn, or a result that could not be handed on
+        # because the worker is stopping, so the owner can return its resources
+        self.on_drop = on_drop
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+        # Stats (written only by the worker thread)
+        self.processed = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+        self.avg_ms = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=f"Stage-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+        self._thread = None
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "processed": self.processed,
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "avg_ms": round(self.avg_ms, 3),
+            "queue_in": self.in_q.qsize(),
+        }
+
+    def _put(self, item) -> bool:
+        # Blocking put (backpressure) that still honours stop requests
+        while not self._stop_event.is_set():
+            try:
+                self.out_q.put(item, timeout=self.poll_interval)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self):
+        if self.on_thread_start:
+            self.on_thread_start()
+        while not self._stop_event.is_set():
+            try:
+                item = self.in_q.get(timeout=self.poll_interval)
+            except queue.Empty:
+                continue
+
+            t0 = time.perf_counter()
+            try:
+                result = self.fn(item)
+            except Exception as e:
+                self.errors += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                logger.exception("stage %s failed", self.name)
+                if self.on_error:
+                    self.on_error(self.name, e)
+                if self.on_drop:
+                    self.on_drop(item)
+                continue
+            dt_ms = (time.perf_counter() - t0) * 1000.0
+            self.avg_ms = (0.9 * self.avg_ms + 0.1 * dt_ms) if self.processed else dt_ms
+            self.processed += 1
+
+            if result is None or self.out_q is None:
+                continue
+            if not self._put(result):
+                if self.on_drop:
+                    self.on_drop(result)
+                break
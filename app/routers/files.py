@@ -1,10 +1,12 @@
-from fastapi import APIRouter, UploadFile, File
+from fastapi import APIRouter, BackgroundTasks, Request, UploadFile, File
+import logging
 import os
 import pathlib
 from ..config import ASSETS_DIR
 
 
 router = APIRouter()
+logger = logging.getLogger("fusion.pipeline")
 
 USER_DIR = os.path.join(str(ASSETS_DIR), "user")
 ASSETS_FACE = os.path.join(USER_DIR, "face")
@@ -14,12 +16,26 @@ pathlib.Path(ASSETS_FACE).mkdir(parents=True, exist_ok=True)
 pathlib.Path(ASSETS_BG).mkdir(parents=True, exist_ok=True)
 
 
+def _precompute_embedding(cache, path: str) -> None:
+    # Fire-and-forget on the cache's own encoder thread; failures are only logged
+    def done(fut):
+        if fut.exception() is not None:
+            logger.error("source embedding failed: %s: %s", path, fut.exception())
+
+    try:
+        cache.submit(path).add_done_callback(done)
+    except Exception:
+        logger.exception("source embedding failed: %s", path)
+
+
 @router.post("/upload/face")
-async def upload_face(file: UploadFile = File(...)):
+async def upload_face(request: Request, background: BackgroundTasks, file: UploadFile = File(...)):
     dst = os.path.join(ASSETS_FACE, file.filename)
     contents = await file.read()
     with open(dst, "wb") as f:
         f.write(contents)
+    # Detect/align/encode once after the response; streams switching to this face load the .npy
+    background.add_task(_precompute_embedding, request.app.state.embeddings, dst)
     return {"ok": True, "path": dst}
 
 
@@ -0,0 +1,49 @@
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Request
+from pydantic import BaseModel
+
+from ..ai.dfm_cache import list_dfm_models, resolve_dfm_path
+
+
+router = APIRouter()
+
+
+class DfmRequest(BaseModel):
+    path: str  # absolute, or relative to assets/models/dfm
+    session_id: Optional[str] = None
+
+
+def _model_path(path: str) -> str:
+    try:
+        return resolve_dfm_path(path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Model not found: {path}")
+
+
+@router.get("/dfm")
+def list_models(request: Request):
+    cache = request.app.state.dfm_models
+    return {"available": list_dfm_models(), "cache": cache.stats()}
+
+
+@router.post("/dfm/prewarm")
+def prewarm_model(request: Request, body: DfmRequest):
+    """在后台加载并预热下一个模型（不切换），供随后的 select 立即生效。
+    没有运行中的会话时，按各放置方案中换脸阶段所在的设备组预热，之后启动的流同样命中缓存。"""
+    sessions = request.app.state.sessions
+    mgr = sessions.manager(body.session_id)
+    path = _model_path(body.path)
+    groups = [mgr.placement.group_for("swap")] if mgr else sessions.groups_for("swap", path)
+    futs = [request.app.state.dfm_models.prewarm(path, group) for group in groups]
+    return {"ok": True, "state": "ready" if all(f.done() for f in futs) else "loading"}
+
+
+@router.post("/dfm/select")
+def select_model(request: Request, body: DfmRequest):
+    """切换会话（默认最早的会话）使用的换脸模型；未预热时后台加载，完成后在帧间切换。"""
+    mgr = request.app.state.sessions.manager(body.session_id)
+    path = _model_path(body.path)
+    if not mgr:
+        raise HTTPException(status_code=409, detail="Stream not running")
+    return {"ok": True, "state": mgr.set_dfm_model(path)}
@@ -1,78 +1,275 @@
+import asyncio
+import os
+from typing import Optional
+
 from fastapi import APIRouter, HTTPException, Request
-from fastapi.responses import Response
+from fastapi.responses import Response, StreamingResponse
 import cv2
 import numpy as np
 from pydantic import BaseModel
 
-from ..processing.manager import ProcessingManager, PipelineConfig
+from ..config import ASSETS_DIR, settings
+from ..ai.dfm_cache import resolve_dfm_path
+from ..processing.jpeg import encode_jpeg
+from ..processing.manager import PipelineConfig
+from ..processing.sessions import AdmissionError
 
 
 router = APIRouter()
 
 
+def _make_placeholder():
+    # 占位图（1280x720 黑底，白字）
+    h, w = 720, 1280
+    img = np.zeros((h, w, 3), dtype=np.uint8)
+    cv2.putText(img, "No output frame", (60, 120), cv2.FONT_HERSHEY_SIMPLEX, 2.0, (255, 255, 255), 4, cv2.LINE_AA)
+    cv2.putText(img, "Start pipeline or enable local preview", (60, 200), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (255, 255, 255), 2, cv2.LINE_AA)
+    return img
+
+
+# Pre-encoded once at import (app startup) instead of per request
+PLACEHOLDER_JPEG = encode_jpeg(_make_placeholder(), settings.jpeg_quality)
+PLACEHOLDER_ETAG = '"placeholder"'
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [t.strip() for t in if_none_match.split(",")]
+    # Weak comparison per RFC 9110 for If-None-Match
+    return "*" in candidates or any(t.removeprefix("W/") == etag for t in candidates)
+
+
 class StreamStartRequest(BaseModel):
     use_multi_gpu: bool = True
     input_source: dict
+    # Multi-session scheduling: higher priority is served first, weight shares slots
+    # among equal priorities, target_fps is what admission control reserves
+    priority: int = 0
+    weight: float = 1.0
+    target_fps: float = 25.0
+    allow_degraded: bool = True
+    # Source face image (relative paths are under assets/user/face)
+    source_face: Optional[str] = None
+    # Face swap model (relative paths are under assets/models/dfm)
+    dfm_model: Optional[str] = None
+
+
+class SourceFaceRequest(BaseModel):
+    path: str
+    session_id: Optional[str] = None
+
+
+class QualityRequest(BaseModel):
+    session_id: Optional[str] = None
+    enabled: Optional[bool] = None
+    target_fps: Optional[float] = None
+    target_latency_ms: Optional[float] = None
+    # Pin a level by name (usually together with enabled=false)
+    level: Optional[str] = None
+
+
+def _face_path(path: str) -> str:
+    if not os.path.isabs(path):
+        path = os.path.join(str(ASSETS_DIR), "user", "face", path)
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail=f"Source face not found: {path}")
+    return path
+
+
+def _sync_default(app) -> None:
+    # app.state.manager stays the oldest session's manager for single-stream clients
+    session = app.state.sessions.get()
+    app.state.manager = session.manager if session else None
+    if session is None:
+        app.state.status.update({"state": "IDLE", "error": None})
 
 
 @router.post("/start")
 def start_stream(request: Request, body: StreamStartRequest):
+    # No models_ready gate: stages whose model is still missing/loading pass frames through
+    # and are attached to the running session once their model is ready
     status = request.app.state.status
-    if not status.get("models_ready", False):
-        raise HTTPException(status_code=503, detail="Models not ready")
-
-    if request.app.state.manager:
-        raise HTTPException(status_code=409, detail="Stream already running")
-
     cfg = PipelineConfig(use_multi_gpu=body.use_multi_gpu, input_source=body.input_source)
-    request.app.state.manager = ProcessingManager(cfg)
-    request.app.state.manager.start()
-    request.app.state.status.update({"state": "PROCESSING", "error": None})
-    return {"ok": True}
+    face = _face_path(body.source_face) if body.source_face else None
+    try:
+        dfm = resolve_dfm_path(body.dfm_model) if body.dfm_model else None
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Model not found: {body.dfm_model}")
+    try:
+        session = request.app.state.sessions.create(
+            cfg,
+            priority=body.priority,
+            weight=body.weight,
+            target_fps=body.target_fps,
+            allow_degraded=body.allow_degraded,
+        )
+    except AdmissionError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if face:
+        session.manager.set_source_face(face)
+    if dfm:
+        session.manager.set_dfm_model(dfm)
+    _sync_default(request.app)
+    status.update({"state": "PROCESSING", "error": None})
+    return {
+        "ok": True,
+        "session_id": session.id,
+        "target_fps": session.target_fps,
+        "degraded": session.degraded,
+        "active_stages": session.manager.active_stages(),
+        "models": {stage: m["state"] for stage, m in request.app.state.readiness.to_dict().items()},
+    }
 
 
 @router.post("/stop")
-def stop_stream(request: Request):
-    if not request.app.state.manager:
-        return {"ok": True}
-    request.app.state.manager.stop()
-    request.app.state.manager = None
-    request.app.state.status.update({"state": "IDLE", "error": None})
+def stop_stream(request: Request, session_id: Optional[str] = None):
+    """停止指定会话；不带 session_id 时停止全部会话。"""
+    sessions = request.app.state.sessions
+    if session_id:
+        if not sessions.remove(session_id):
+            raise HTTPException(status_code=404, detail=f"Unknown session: {session_id}")
+    else:
+        sessions.clear()
+    _sync_default(request.app)
     return {"ok": True}
 
 
+@router.post("/face")
+def switch_source_face(request: Request, body: SourceFaceRequest):
+    """切换源人脸，不阻塞流水线：向量未就绪时返回 pending，编码完成后自动生效。"""
+    mgr = request.app.state.sessions.manager(body.session_id)
+    if not mgr:
+        raise HTTPException(status_code=409, detail="Stream not running")
+    return {"ok": True, "state": mgr.set_source_face(_face_path(body.path))}
+
+
+@router.get("/quality")
+def get_quality(request: Request, session_id: Optional[str] = None):
+    """自适应质量控制器的当前档位、目标、测量值与最近的切换决策。"""
+    mgr = request.app.state.sessions.manager(session_id)
+    if not mgr:
+        raise HTTPException(status_code=409, detail="Stream not running")
+    return mgr.quality.to_dict()
+
+
+@router.post("/quality")
+def set_quality(request: Request, body: QualityRequest):
+    mgr = request.app.state.sessions.manager(body.session_id)
+    if not mgr:
+        raise HTTPException(status_code=409, detail="Stream not running")
+    try:
+        mgr.quality.configure(
+            enabled=body.enabled,
+            target_fps=body.target_fps,
+            target_latency_ms=body.target_latency_ms,
+            level=body.level,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return mgr.quality.to_dict()
+
+
 @router.get("/status")
 def stream_status(request: Request):
-    return request.app.state.status
+    sessions = request.app.state.sessions
+    mgr = request.app.state.manager
+    if not mgr:
+        return {**request.app.state.status, "sessions": [], "admission": sessions.stats()}
+    # state/error of the default session (errors are tracked per session, see sessions[].pipeline)
+    return {
+        **request.app.state.status,
+        **mgr.status(),
+        "pipeline": mgr.stats(),
+        "sessions": [s.to_dict() for s in sessions.list()],
+        "admission": sessions.stats(),
+    }
+
+
+@router.get("/sessions")
+def list_sessions(request: Request):
+    return {"sessions": [s.to_dict() for s in request.app.state.sessions.list()]}
+
+
+@router.post("/stage/{name}/start")
+def start_stage(request: Request, name: str, session_id: Optional[str] = None):
+    mgr = request.app.state.sessions.manager(session_id)
+    if not mgr:
+        raise HTTPException(status_code=409, detail="Stream not running")
+    if name not in mgr.stages:
+        raise HTTPException(status_code=404, detail=f"Unknown stage: {name}")
+    mgr.start_stage(name)
+    return {"ok": True}
+
+
+@router.post("/stage/{name}/stop")
+def stop_stage(request: Request, name: str, session_id: Optional[str] = None):
+    mgr = request.app.state.sessions.manager(session_id)
+    if not mgr:
+        raise HTTPException(status_code=409, detail="Stream not running")
+    if name not in mgr.stages:
+        raise HTTPException(status_code=404, detail=f"Unknown stage: {name}")
+    mgr.stop_stage(name)
+    return {"ok": True}
 
 
 @router.get("/frame")
-def get_latest_frame(request: Request):
-    """返回当前流水线的最新融合帧（JPEG）。若无帧则返回占位图。"""
-    mgr = getattr(request.app.state, "manager", None)
-    img = None
-    if mgr:
-        try:
-            # 尝试取队列中最新的一帧（将队列清空，仅保留最后一项）
-            last = None
-            while True:
-                last = mgr.q_out.get_nowait()
-            # 不可达：循环结束在异常处
-        except Exception:
-            # 取不到更多则使用最后一次成功取到的帧
-            try:
-                img = last  # type: ignore[name-defined]
-            except Exception:
-                img = None
-
-    if img is None:
-        # 构造占位图（1280x720 黑底，白字）
-        h, w = 720, 1280
-        img = np.zeros((h, w, 3), dtype=np.uint8)
-        cv2.putText(img, "No output frame", (60, 120), cv2.FONT_HERSHEY_SIMPLEX, 2.0, (255, 255, 255), 4, cv2.LINE_AA)
-        cv2.putText(img, "Start pipeline or enable local preview", (60, 200), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (255, 255, 255), 2, cv2.LINE_AA)
-
-    ok, buf = cv2.imencode(".jpg", img)
-    if not ok:
-        raise HTTPException(status_code=500, detail="Failed to encode frame")
-    return Response(content=buf.tobytes(), media_type="image/jpeg")
\ No newline at end of file
+def get_latest_frame(request: Request, session_id: Optional[str] = None):
+    """返回指定会话（默认最早的会话）的最新融合帧（JPEG）。若无帧则返回占位图。
+    每帧只编码一次（按帧序号缓存），并支持 ETag/If-None-Match 返回 304。"""
+    mgr = request.app.state.sessions.manager(session_id)
+    try:
+        enc = mgr.jpeg.get() if mgr else None
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if enc is None:
+        data, etag, headers = PLACEHOLDER_JPEG, PLACEHOLDER_ETAG, {}
+    else:
+        data, etag = enc.data, enc.etag
+        headers = {"X-Frame-Seq": str(enc.seq), "X-Frame-Ts": f"{enc.ts:.6f}"}
+    headers.update({"ETag": etag, "Cache-Control": "no-cache"})
+
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=data, media_type="image/jpeg", headers=headers)
+
+
+MJPEG_BOUNDARY = "frame"
+
+
+def _mjpeg_part(data: bytes) -> bytes:
+    head = f"--{MJPEG_BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(data)}\r\n\r\n"
+    return head.encode("ascii") + data + b"\r\n"
+
+
+async def _mjpeg_stream(request: Request, session_id: Optional[str] = None):
+    # 跟随指定会话（默认 app.state.manager）：无流水线时推送占位图，启动后推送实时帧，停止后回到占位图
+    sessions = request.app.state.sessions
+    while True:
+        mgr = sessions.manager(session_id, required=False)
+        if mgr is None:
+            yield _mjpeg_part(PLACEHOLDER_JPEG)
+            while sessions.manager(session_id, required=False) is None:
+                if await request.is_disconnected():
+                    return
+                await asyncio.sleep(0.5)
+            continue
+        async for enc in mgr.mjpeg.frames():
+            yield _mjpeg_part(enc.data)
+        while sessions.manager(session_id, required=False) is mgr:
+            if await request.is_disconnected():
+                return
+            await asyncio.sleep(0.5)
+
+
+@router.get("/mjpeg")
+async def stream_mjpeg(request: Request, session_id: Optional[str] = None):
+    """multipart/x-mixed-replace 推流：每个新输出帧编码一次并推送给所有订阅者；慢客户端跳到最新帧。"""
+    return StreamingResponse(
+        _mjpeg_stream(request, session_id),
+        media_type=f"multipart/x-mixed-replace; boundary={MJPEG_BOUNDARY}",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
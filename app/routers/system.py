@@ -1,9 +1,26 @@
 from fastapi import APIRouter, Request
 
+from ..ai import runtime
+from .webrtc import pool_stats
+
 
 router = APIRouter()
 
 
 @router.get("/status")
 def get_status(request: Request):
-    return request.app.state.status
\ No newline at end of file
+    state = request.app.state
+    out = {**state.status, "models": state.readiness.to_dict()}
+    downloader = getattr(state, "downloader", None)
+    if downloader is not None:
+        out["downloads"] = downloader.progress()
+    return out
+
+
+@router.get("/metrics")
+def get_metrics(request: Request):
+    return {
+        "event_loop": request.app.state.loop_monitor.stats(),
+        "webrtc_pool": pool_stats(),
+        "onnxruntime": runtime.registry.stats(),
+    }
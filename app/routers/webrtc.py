@@ -1,5 +1,7 @@
 import asyncio
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Set, Optional
 
 import av
@@ -15,7 +17,8 @@ from aiortc.contrib.media import MediaRelay
 import os
 import numpy as np
 
-from ..config import ASSETS_DIR
+from ..ai.composition import AlphaCompositor
+from ..config import ASSETS_DIR, settings
 
 
 router = APIRouter()
@@ -24,6 +27,78 @@ router = APIRouter()
 pcs: Set[RTCPeerConnection] = set()
 relay = MediaRelay()
 
+# Per-frame CPU work (to_ndarray, composition, HUD, from_ndarray) runs on this bounded
+# pool; the event loop only awaits results so SDP/ICE/HTTP handling stays responsive.
+_WORKERS = max(settings.webrtc_workers, 1)
+_executor = ThreadPoolExecutor(max_workers=_WORKERS, thread_name_prefix="webrtc-frame")
+_slots = asyncio.Semaphore(_WORKERS * 2)
+# Peak compute time is reported over the last full window, so an old spike does not stick forever
+_POOL_WINDOW_S = 10.0
+_pool = {"submitted": 0, "completed": 0, "in_flight": 0, "compute_avg_ms": 0.0, "compute_max_ms": 0.0}
+# Updated from worker threads (completion) and the event loop (submission)
+_pool_lock = threading.Lock()
+_window = {"start": time.monotonic(), "max_ms": 0.0, "prev_max_ms": 0.0}
+
+
+def _roll_window(now: float) -> None:
+    # Caller holds _pool_lock
+    elapsed = now - _window["start"]
+    if elapsed >= _POOL_WINDOW_S:
+        # A window with no completed jobs leaves nothing to carry over
+        _window["prev_max_ms"] = _window["max_ms"] if elapsed < 2 * _POOL_WINDOW_S else 0.0
+        _window["max_ms"] = 0.0
+        _window["start"] = now
+    _pool["compute_max_ms"] = max(_window["max_ms"], _window["prev_max_ms"])
+
+
+def pool_stats() -> dict:
+    with _pool_lock:
+        _roll_window(time.monotonic())
+        return {
+            "workers": _WORKERS,
+            **_pool,
+            "compute_avg_ms": round(_pool["compute_avg_ms"], 3),
+            "compute_max_ms": round(_pool["compute_max_ms"], 3),
+            "window_s": _POOL_WINDOW_S,
+        }
+
+
+def _timed(fn, *args):
+    t0 = time.perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        dt_ms = (time.perf_counter() - t0) * 1000.0
+        with _pool_lock:
+            n = _pool["completed"]
+            _pool["compute_avg_ms"] = (0.9 * _pool["compute_avg_ms"] + 0.1 * dt_ms) if n else dt_ms
+            _roll_window(time.monotonic())
+            _window["max_ms"] = max(_window["max_ms"], dt_ms)
+            _pool["compute_max_ms"] = max(_pool["compute_max_ms"], dt_ms)
+            _pool["completed"] = n + 1
+
+
+async def run_in_pool(fn, *args):
+    """在有界线程池中执行逐帧计算；最多 2x workers 个任务同时排队。"""
+    async with _slots:
+        with _pool_lock:
+            _pool["submitted"] += 1
+            _pool["in_flight"] += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(_executor, _timed, fn, *args)
+        finally:
+            with _pool_lock:
+                _pool["in_flight"] -= 1
+
+
+def _update_fps(track, now: float) -> None:
+    if track._last_ts is not None:
+        dt = now - track._last_ts
+        if dt > 0:
+            inst = 1.0 / dt
+            track._fps = (0.9 * track._fps + 0.1 * inst) if track._fps > 0 else inst
+    track._last_ts = now
+
 
 class ProcessorTrack(VideoStreamTrack):
     """Single-source track that overlays frame counter and FPS."""
@@ -37,24 +112,20 @@ class ProcessorTrack(VideoStreamTrack):
 
     async def recv(self) -> av.VideoFrame:
         frame = await self.source.recv()
-        img = frame.to_ndarray(format="bgr24")
         self._counter += 1
-        now = time.time()
-        if self._last_ts is not None:
-            dt = now - self._last_ts
-            if dt > 0:
-                inst = 1.0 / dt
-                self._fps = (0.9 * self._fps + 0.1 * inst) if self._fps > 0 else inst
-        self._last_ts = now
-
+        _update_fps(self, time.time())
         text = f"Frames: {self._counter}  FPS: {self._fps:.1f}"
-        cv2.putText(img, text, (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 255, 0), 2)
-
-        new_frame = av.VideoFrame.from_ndarray(img, format="bgr24")
+        new_frame = await run_in_pool(self._render, frame, text)
         new_frame.pts = frame.pts
         new_frame.time_base = frame.time_base
         return new_frame
 
+    @staticmethod
+    def _render(frame: av.VideoFrame, text: str) -> av.VideoFrame:
+        img = frame.to_ndarray(format="bgr24")
+        cv2.putText(img, text, (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 255, 0), 2)
+        return av.VideoFrame.from_ndarray(img, format="bgr24")
+
 
 class ComposedTrack(VideoStreamTrack):
     """
@@ -70,12 +141,14 @@ class ComposedTrack(VideoStreamTrack):
         self._latest_mask: Optional[av.VideoFrame] = None
         self._mask_task: Optional[asyncio.Task] = None
         self._bg: Optional[any] = None  # numpy array BGR background
+        self._bg_loaded = False  # loaded lazily on the worker pool (file I/O + decode)
+        self._compositor = AlphaCompositor()
+        self._out: Optional[np.ndarray] = None  # reused output buffer (from_ndarray copies it)
         self._counter = 0
         self._last_ts: Optional[float] = None
         self._fps = 0.0
         if self.mask_src is not None:
             self._mask_task = asyncio.create_task(self._pump_mask())
-        self._load_background()
 
     async def _pump_mask(self):
         try:
@@ -93,27 +166,29 @@ class ComposedTrack(VideoStreamTrack):
 
     async def recv(self) -> av.VideoFrame:
         fg_frame = await self.fg.recv()
-        img = fg_frame.to_ndarray(format="bgr24")
 
         # Stats
         self._counter += 1
-        now = time.time()
-        if self._last_ts is not None:
-            dt = now - self._last_ts
-            if dt > 0:
-                inst = 1.0 / dt
-                self._fps = (0.9 * self._fps + 0.1 * inst) if self._fps > 0 else inst
-        self._last_ts = now
+        _update_fps(self, time.time())
+        text = f"Frames: {self._counter}  FPS: {self._fps:.1f}"
+
+        out = await run_in_pool(self._render, fg_frame, self._latest_mask, text)
+        out.pts = fg_frame.pts
+        out.time_base = fg_frame.time_base
+        return out
+
+    def _render(self, fg_frame: av.VideoFrame, mask_frame: Optional[av.VideoFrame], text: str) -> av.VideoFrame:
+        # Runs on the worker pool; recv() is sequential per track so self._bg is not shared
+        if not self._bg_loaded:
+            self._load_background()
+            self._bg_loaded = True
+        img = fg_frame.to_ndarray(format="bgr24")
 
         # If mask available, compose foreground with simple alpha cutout on black bg
-        mask_frame = self._latest_mask
         if mask_frame is not None:
             try:
+                # Mask is resized to the foreground size inside the compositor
                 m = mask_frame.to_ndarray(format="gray")
-                # Resize mask to match foreground size
-                if m.shape[0] != img.shape[0] or m.shape[1] != img.shape[1]:
-                    m = cv2.resize(m, (img.shape[1], img.shape[0]), interpolation=cv2.INTER_LINEAR)
-                alpha = (m.astype("float32") / 255.0).reshape(img.shape[0], img.shape[1], 1)
                 # Background composition (image or black)
                 if self._bg is None or self._bg.shape[:2] != img.shape[:2]:
                     bg = self._bg
@@ -122,20 +197,15 @@ class ComposedTrack(VideoStreamTrack):
                     else:
                         bg = cv2.resize(bg, (img.shape[1], img.shape[0]), interpolation=cv2.INTER_AREA)
                     self._bg = bg
-                fg_f = img.astype("float32")
-                bg_f = self._bg.astype("float32")
-                img = (fg_f * alpha + bg_f * (1.0 - alpha)).astype("uint8")
+                if self._out is None or self._out.shape != img.shape:
+                    self._out = np.empty_like(img)
+                img = self._compositor.blend(img, m, self._bg, out=self._out)
             except Exception:
                 pass
 
         # Overlay HUD
-        text = f"Frames: {self._counter}  FPS: {self._fps:.1f}"
         cv2.putText(img, text, (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 255, 0), 2)
-
-        out = av.VideoFrame.from_ndarray(img, format="bgr24")
-        out.pts = fg_frame.pts
-        out.time_base = fg_frame.time_base
-        return out
+        return av.VideoFrame.from_ndarray(img, format="bgr24")
 
     def _make_black(self, w: int, h: int):
         return (np.zeros((h, w, 3), dtype=np.uint8))
@@ -74,7 +74,8 @@ if _is_fullscreen_mode():
         unsafe_allow_html=True,
     )
     import streamlit.components.v1 as components
-    # 接入后端快照轮询 /stream/frame（每 500ms 刷新一次），避免 f-string 花括号冲突
+    # 接入后端 MJPEG 推流 /stream/mjpeg（按流水线帧率实时推送）；断开后回退为 /stream/frame 快照并定时重连
+    # 使用占位符注入后端地址，避免 f-string 花括号冲突
     _backend_js = json.dumps(_ui_cfg.get("backend", "http://localhost:8000"))
     html = """
     <div id=fullwrap style=\"position:fixed;inset:0;background:#000;display:flex;align-items:center;justify-content:center\">
@@ -83,23 +84,27 @@ if _is_fullscreen_mode():
     <script>
       (function(){
         const img = document.getElementById('fusionOut');
-        const backend = "+_backend_js+";
-        const url = new URL('/stream/frame', backend).toString();
-        let running = true;
-        async function tick(){
-          while(running){
-            try {
-              const u = url + '?_ts=' + Date.now();
-              img.src = u;
-            } catch(e) {}
-            await new Promise(r => setTimeout(r, 500));
-          }
+        const backend = __BACKEND__;
+        const mjpegUrl = new URL('/stream/mjpeg', backend).toString();
+        const frameUrl = new URL('/stream/frame', backend).toString();
+        let retrying = false;
+        function connect(){
+          retrying = false;
+          img.src = mjpegUrl + '?_ts=' + Date.now();
         }
-        tick();
-        window.addEventListener('beforeunload', ()=>{ running=false; });
+        img.onerror = () => {
+          // 推流断开：先显示一帧快照，1 秒后重连
+          if (retrying) return;
+          retrying = true;
+          img.src = frameUrl + '?_ts=' + Date.now();
+          setTimeout(connect, 1000);
+        };
+        connect();
+        window.addEventListener('beforeunload', ()=>{ img.onerror = null; img.src = ''; });
       })();
     </script>
     """
+    html = html.replace("__BACKEND__", _backend_js)
     components.html(html, height=0)
     st.stop()
 
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""Benchmark: per-prior Python-loop RetinaFace post-processing vs the vectorized retinaface_post module."""
+import argparse
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.ai import retinaface_post as post  # noqa: E402
+
+
+SIZES = (640, 1280)
+FACE_COUNTS = (1, 5, 10, 20)
+
+
+def loop_priors(h: int, w: int):
+    # Reference PriorBox.forward (itertools over feature-map cells)
+    out = []
+    for step, sizes in zip(post.STEPS, post.MIN_SIZES):
+        for i in range(math.ceil(h / step)):
+            for j in range(math.ceil(w / step)):
+                for s in sizes:
+                    out.append([(j + 0.5) * step / w, (i + 0.5) * step / h, s / w, s / h])
+    return out
+
+
+def loop_nms(dets, thresh):
+    dets = sorted(dets, key=lambda d: -d[4])
+    keep = []
+    for d in dets:
+        ok = True
+        for k in keep:
+            iw = max(min(d[2], k[2]) - max(d[0], k[0]), 0)
+            ih = max(min(d[3], k[3]) - max(d[1], k[1]), 0)
+            inter = iw * ih
+            union = (d[2] - d[0]) * (d[3] - d[1]) + (k[2] - k[0]) * (k[3] - k[1]) - inter
+            if union > 0 and inter / union > thresh:
+                ok = False
+                break
+        if ok:
+            keep.append(d)
+    return keep
+
+
+def loop_postprocess(loc, conf, landms, h, w, conf_thresh=0.5, nms_thresh=0.4):
+    # Old style: priors rebuilt per call, every prior decoded in Python, then filtered
+    pri = loop_priors(h, w)
+    v0, v1 = post.VARIANCE
+    dets = []
+    for n, p in enumerate(pri):
+        l = loc[0, n]
+        cx, cy = p[0] + l[0] * v0 * p[2], p[1] + l[1] * v0 * p[3]
+        bw, bh = p[2] * math.exp(l[2] * v1), p[3] * math.exp(l[3] * v1)
+        pts = [(p[0] + landms[0, n, 2 * k] * v0 * p[2]) * w for k in range(5)]
+        score = conf[0, n, 1]
+        if score > conf_thresh:
+            dets.append([(cx - bw / 2) * w, (cy - bh / 2) * h, (cx + bw / 2) * w, (cy + bh / 2) * h, score, pts])
+    return loop_nms(dets, nms_thresh)
+
+
+def make_outputs(size: int, faces: int, batch: int = 1):
+    """Synthetic network outputs: each face lights up a cluster of overlapping priors."""
+    rng = np.random.default_rng(faces)
+    n = post.priors(size, size).shape[0]
+    loc = rng.normal(0, 0.05, (batch, n, 4)).astype(np.float32)
+    landms = rng.normal(0, 0.5, (batch, n, 10)).astype(np.float32)
+    conf = np.zeros((batch, n, 2), dtype=np.float32)
+    conf[..., 1] = rng.uniform(0, 0.3, (batch, n))
+    # Level-1 priors (stride 16) give 64-128 px faces; each face hits ~12 neighbouring cells
+    base = (size // 8) ** 2 * 2
+    cols = size // 16
+    for b in range(batch):
+        for f in range(faces):
+            r, c = 2 + (f // 5) * 6, 2 + (f % 5) * 6
+            for dr in range(-1, 2):
+                for dc in range(-1, 1):
+                    idx = base + ((r + dr) * cols + (c + dc)) * 2
+                    conf[b, idx:idx + 2, 1] = rng.uniform(0.6, 0.99, 2)
+    conf[..., 0] = 1 - conf[..., 1]
+    return loc, conf, landms
+
+
+def bench(fn, repeat: int) -> float:
+    fn()  # warmup
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) * 1000.0 / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare loop and vectorized RetinaFace post-processing.")
+    parser.add_argument("--repeat", type=int, default=20, help="Iterations per measurement")
+    parser.add_argument("--batch", type=int, default=8, help="Frames per batched call")
+    args = parser.parse_args()
+
+    print(f"{'size':>5} {'faces':>6} {'loop ms':>9} {'vec ms':>8} {'speedup':>8} {'batch ms/frame':>15} {'kept':>5}")
+    for size in SIZES:
+        for faces in FACE_COUNTS:
+            loc, conf, landms = make_outputs(size, faces)
+            t_loop = bench(lambda: loop_postprocess(loc, conf, landms, size, size), max(args.repeat // 10, 1))
+            t_vec = bench(lambda: post.postprocess(loc, conf, landms, (size, size), [1.0]), args.repeat)
+            bl, bc, bm = make_outputs(size, faces, args.batch)
+            scales = [1.0] * args.batch
+            t_batch = bench(lambda: post.postprocess(bl, bc, bm, (size, size), scales), args.repeat) / args.batch
+            kept = len(post.postprocess(loc, conf, landms, (size, size), [1.0], keep_top_k=1000)[0][0])
+            ref = len(loop_postprocess(loc, conf, landms, size, size))
+            assert kept == ref, (kept, ref)
+            print(f"{size:>5} {faces:>6} {t_loop:>9.2f} {t_vec:>8.3f} {t_loop / t_vec:>7.0f}x {t_batch:>15.3f} {kept:>5}")
+
+
+if __name__ == "__main__":
+    main()
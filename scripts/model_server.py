@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""Local stand-in for the model download host: serves a directory with HTTP Range support.
+
+Point the backend at it with MODEL_URL_RVM=http://127.0.0.1:8765/rvm.onnx (etc.). --rate throttles
+the transfer and --drop-after closes connections mid-file, to exercise progress reporting and resume.
+"""
+import argparse
+import os
+import re
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+
+class RangeHandler(SimpleHTTPRequestHandler):
+    rate = 0  # bytes/s, 0 = unlimited
+    drop_after = 0  # bytes per response before the connection is cut, 0 = never
+
+    def do_GET(self):
+        path = self.translate_path(self.path)
+        if not os.path.isfile(path):
+            self.send_error(404)
+            return
+        size = os.path.getsize(path)
+        start, end = 0, size - 1
+        m = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        if m:
+            start = int(m.group(1))
+            if m.group(2):
+                end = min(int(m.group(2)), size - 1)
+            if start >= size:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+        sent = 0
+        with open(path, "rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = f.read(min(64 * 1024, remaining))
+                if not chunk:
+                    break
+                if self.drop_after and sent + len(chunk) > self.drop_after:
+                    self.wfile.write(chunk[: self.drop_after - sent])
+                    self.close_connection = True
+                    return
+                self.wfile.write(chunk)
+                sent += len(chunk)
+                remaining -= len(chunk)
+                if self.rate:
+                    time.sleep(len(chunk) / self.rate)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("directory")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--rate", type=int, default=0, help="throttle to this many bytes/s")
+    ap.add_argument("--drop-after", type=int, default=0, help="cut each response after this many bytes")
+    args = ap.parse_args()
+
+    RangeHandler.rate = args.rate
+    RangeHandler.drop_after = args.drop_after
+    server = ThreadingHTTPServer((args.host, args.port), partial(RangeHandler, directory=args.directory))
+    print(f"serving {args.directory} on http://{args.host}:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
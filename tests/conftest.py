@@ -0,0 +1,19 @@
+import av
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def clip(tmp_path):
+    """5-frame 64x48 MPEG-4 clip written with PyAV."""
+    path = str(tmp_path / "clip.mp4")
+    with av.open(path, mode="w") as out:
+        stream = out.add_stream("mpeg4", rate=25)
+        stream.width, stream.height, stream.pix_fmt = 64, 48, "yuv420p"
+        for i in range(5):
+            img = np.full((48, 64, 3), i * 40, np.uint8)
+            for packet in stream.encode(av.VideoFrame.from_ndarray(img, format="bgr24")):
+                out.mux(packet)
+        for packet in stream.encode():
+            out.mux(packet)
+    return path
@@ -0,0 +1,104 @@
+import os
+import threading
+
+import cv2
+import numpy as np
+import pytest
+
+from app.ai import retinaface_post as post
+from app.ai.face_detection import Detection, FaceDetector
+from app.ai.face_swap import FaceSwap
+from app.processing.batch import BatchConfig, BatchRenderer
+
+
+class _Node:
+    def __init__(self, name, shape):
+        self.name, self.shape = name, shape
+
+
+class _FakeDfm:
+    """NHWC DFM stand-in with a dynamic batch dimension: returns the input face inverted."""
+
+    def __init__(self):
+        self.batches = []
+
+    def get_inputs(self):
+        return [_Node("in_face", ["N", 64, 64, 3])]
+
+    def get_outputs(self):
+        return [_Node("out_celeb_face", ["N", 64, 64, 3])]
+
+    def run(self, names, feeds):
+        blob = feeds["in_face"]
+        self.batches.append(len(blob))
+        return [1.0 - blob]
+
+
+class _FakeRunner:
+    def __init__(self, input_size):
+        self.n = len(post.priors(*input_size))
+        self.batches = []
+
+    def run(self, feeds):
+        b = len(next(iter(feeds.values())))
+        self.batches.append(b)
+        return np.zeros((b, self.n, 4), np.float32), np.zeros((b, self.n, 2), np.float32), np.zeros((b, self.n, 10), np.float32)
+
+
+def _render(cfg):
+    result = {}
+
+    def run():
+        try:
+            result["report"] = BatchRenderer(cfg).run()
+        except Exception as e:
+            result["error"] = e
+
+    t = threading.Thread(target=run, daemon=True)
+    t.start()
+    t.join(30)
+    assert not t.is_alive(), "render hung"
+    return result
+
+
+@pytest.fixture
+def face(tmp_path):
+    path = str(tmp_path / "face.jpg")
+    cv2.imwrite(path, np.full((112, 112, 3), 128, np.uint8))
+    return path
+
+
+def test_unwritable_output_fails_instead_of_hanging(clip, face):
+    result = _render(BatchConfig(clip, face, "/nonexistent/dir/out.mp4", batch_size=2, queue_depth=1))
+    assert "error" in result
+
+
+def test_render_leaves_source_directory_untouched(clip, face, tmp_path):
+    before = set(os.listdir(os.path.dirname(face)))
+    out = str(tmp_path / "out.mp4")
+    result = _render(BatchConfig(clip, face, out, batch_size=2, codec="mpeg4"))
+    assert result["report"]["frames"] == 5
+    assert set(os.listdir(os.path.dirname(face))) == before | {"out.mp4"}
+
+
+def test_detect_batch_is_one_model_call():
+    fd = FaceDetector(tracking=False, model_path="/nonexistent.onnx", input_size=(64, 64))
+    fd.session, fd._runner, fd._input_name = object(), _FakeRunner((64, 64)), "input"
+    frames = [np.zeros((48, 64, 3), np.uint8) for _ in range(4)]
+    assert fd.detect_batch(frames) == [[], [], [], []]
+    assert fd._runner.batches == [4]
+
+
+def test_swap_batch_is_one_model_call():
+    swapper = FaceSwap(model_path="/nonexistent.onnx")
+    session = _FakeDfm()
+    swapper._active = ("fake", session)
+    frames = [np.full((120, 160, 3), 40 * i, np.uint8) for i in range(3)]
+    faces = [Detection((50, 30, 110, 90), 0.9), None, Detection((40, 20, 100, 80), 0.9)]
+    out = swapper.swap_batch(frames, faces, None)
+    assert session.batches == [2]
+    assert out[1] is None
+    assert out[0] is not None and out[2] is not None
+    # Single-frame swap goes through the same path
+    assert swapper.swap(frames[0], faces[0], None) is not None
+    assert session.batches == [2, 1]
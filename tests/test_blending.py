@@ -0,0 +1,39 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.ai.blending import FaceBlender
+
+
+def _frame():
+    rng = np.random.default_rng(0)
+    fgr = rng.integers(0, 255, (96, 96, 3), dtype=np.uint8)
+    swapped = rng.integers(0, 255, (96, 96, 3), dtype=np.uint8)
+    mask = np.zeros((96, 96), np.uint8)
+    mask[24:72, 24:72] = 255
+    return fgr, swapped, mask
+
+
+def _face(track_id):
+    return SimpleNamespace(bbox=np.array([24, 24, 72, 72], np.float32), track_id=track_id)
+
+
+def test_lut_reused_for_a_steady_track():
+    blender = FaceBlender(lut_interval=10)
+    fgr, swapped, mask = _frame()
+    for _ in range(5):
+        blender.blend(fgr.copy(), swapped, mask, _face(1))
+    assert blender.lut_builds == 1
+
+
+def test_luts_of_lost_tracks_are_dropped():
+    blender = FaceBlender(max_idle=5)
+    fgr, swapped, mask = _frame()
+    # Track churn: every call sees a new track id
+    for tid in range(100):
+        blender.blend(fgr.copy(), swapped, mask, _face(tid))
+    assert len(blender._luts) <= blender.max_idle + 1
+    # A track that stays in view keeps its LUT
+    for _ in range(20):
+        blender.blend(fgr.copy(), swapped, mask, _face(7))
+    assert list(blender._luts) == [7]
@@ -0,0 +1,58 @@
+import time
+
+import numpy as np
+
+from app.processing.buffer_pool import BufferPool
+from app.processing.manager import PipelineConfig, ProcessingManager
+
+
+def test_reuse_is_keyed_by_shape_and_dtype():
+    pool = BufferPool()
+    a = pool.acquire((4, 4, 3))
+    pool.release(a)
+    assert pool.acquire((4, 4, 3), np.float32) is not a
+    assert pool.acquire((4, 4)) is not a
+    assert pool.acquire([4, 4, 3], "uint8") is a  # same key however the shape/dtype is spelled
+    assert pool.stats()["reuses"] == 1 and pool.stats()["allocations"] == 3
+
+
+def test_views_and_none_are_not_pooled():
+    pool = BufferPool()
+    base = pool.acquire((8, 8))
+    pool.release(base[:4])
+    pool.release(None)
+    assert pool.stats()["idle"] == 0
+
+
+def test_exhausted_pool_allocates_and_caps_idle_buffers():
+    pool = BufferPool(max_per_key=2)
+    held = [pool.acquire((2, 2)) for _ in range(5)]  # nothing free: never blocks, allocates
+    assert len({id(b) for b in held}) == 5 and pool.stats()["allocations"] == 5
+    for b in held:
+        pool.release(b)
+    stats = pool.stats()
+    assert stats["idle"] == 2 and stats["discarded"] == 3
+
+
+def test_frames_dropped_in_the_pipeline_return_their_buffers():
+    mgr = ProcessingManager(PipelineConfig(use_multi_gpu=False))
+    mgr._modules_ready = True
+
+    def broken(pkt):
+        raise RuntimeError("blend failed")
+
+    mgr.stages["blend"].fn = broken
+    mgr.start()
+    for _ in range(6):
+        mgr.submit(np.zeros((16, 16, 3), np.uint8))
+    deadline = time.time() + 5
+    while mgr.stages["blend"].errors < 6 and time.time() < deadline:
+        time.sleep(0.01)
+    mgr.stop()
+
+    # Every buffer borrowed by matting came back when the failed frame was dropped
+    stats = mgr.pool.stats()
+    assert mgr.stages["blend"].errors == 6 and mgr.frames_out == 0
+    assert stats["allocations"] >= 1
+    assert stats["idle"] == stats["allocations"]
+    assert mgr.status()["state"] == "ERROR"
@@ -0,0 +1,87 @@
+import cv2
+import numpy as np
+
+from app.ai.composition import AlphaCompositor, Composer
+
+
+def _inputs(w=96, h=64, seed=0):
+    rng = np.random.default_rng(seed)
+    fgr = rng.integers(0, 256, (h, w, 3), dtype=np.uint8)
+    bgr = rng.integers(0, 256, (h, w, 3), dtype=np.uint8)
+    pha = rng.integers(0, 256, (h, w), dtype=np.uint8)
+    return fgr, pha, bgr
+
+
+def _reference(fgr, pha, bgr):
+    a = (pha.astype(np.float64) / 255.0)[..., None]
+    return np.rint(fgr * a + bgr * (1.0 - a))
+
+
+def _blob(w, h):
+    pha = np.zeros((h, w), np.uint8)
+    cv2.ellipse(pha, (w // 2, h // 2), (w // 6, h // 4), 0, 0, 360, 255, -1)
+    return cv2.GaussianBlur(pha, (9, 9), 0)
+
+
+def test_uint8_matches_float_reference_within_one_lsb():
+    fgr, pha, bgr = _inputs()
+    pha[:4] = 0
+    pha[-4:] = 255  # exact ends: background and foreground pass through unchanged
+    out = AlphaCompositor().blend(fgr, pha, bgr, roi=None)
+    assert np.abs(out.astype(np.int16) - _reference(fgr, pha, bgr)).max() <= 1
+    np.testing.assert_array_equal(out[:4], bgr[:4])
+    np.testing.assert_array_equal(out[-4:], fgr[-4:])
+
+
+def test_float_alpha_and_black_background():
+    fgr, pha, _ = _inputs()
+    out = AlphaCompositor().blend(fgr, pha.astype(np.float32) / 255.0, None, roi=None)
+    black = np.zeros_like(fgr)
+    assert np.abs(out.astype(np.int16) - _reference(fgr, pha, black)).max() <= 1
+
+
+def test_auto_roi_matches_full_frame_and_keeps_background_outside():
+    fgr, _, bgr = _inputs()
+    pha = _blob(96, 64)
+    eng = AlphaCompositor()
+    full = eng.blend(fgr, pha, bgr, roi=None)
+    auto = eng.blend(fgr, pha, bgr, roi="auto")
+    np.testing.assert_array_equal(auto, full)
+    x, y, w, h = cv2.boundingRect(pha)
+    outside = np.ones(pha.shape, bool)
+    outside[y:y + h, x:x + w] = False
+    np.testing.assert_array_equal(auto[outside], bgr[outside])
+    # Fully transparent: the background is returned as is
+    np.testing.assert_array_equal(eng.blend(fgr, np.zeros_like(pha), bgr), bgr)
+
+
+def test_in_place_into_background():
+    fgr, pha, bgr = _inputs()
+    expected = AlphaCompositor().blend(fgr, pha, bgr, roi=None)
+    out = bgr.copy()
+    assert AlphaCompositor().blend(fgr, pha, out, out=out, roi=None) is out
+    np.testing.assert_array_equal(out, expected)
+
+
+def test_buffers_grow_only_and_follow_shape_changes():
+    eng = AlphaCompositor()
+    small = _inputs(32, 24, seed=1)
+    large = _inputs(96, 64, seed=2)
+    eng.blend(*small, roi=None)
+    assert eng._shape == (24, 32)
+    out = eng.blend(*large, roi=None)
+    assert eng._shape == (64, 96)
+    assert np.abs(out.astype(np.int16) - _reference(*large)).max() <= 1
+    buffers = eng._a3
+    out = eng.blend(*small, roi=None)
+    # Smaller frames reuse views of the larger buffers
+    assert eng._a3 is buffers and eng._shape == (64, 96)
+    assert np.abs(out.astype(np.int16) - _reference(*small)).max() <= 1
+
+
+def test_low_res_alpha_is_resized_to_the_frame():
+    fgr, _, bgr = _inputs()
+    pha = _blob(48, 32)
+    out = Composer().compose(fgr, pha, bgr)
+    up = cv2.resize(pha, (96, 64), interpolation=cv2.INTER_LINEAR)
+    assert np.abs(out.astype(np.int16) - _reference(fgr, up, bgr)).max() <= 1
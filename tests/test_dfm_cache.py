@@ -0,0 +1,66 @@
+from fastapi.testclient import TestClient
+
+from app.ai import runtime
+from app.ai.dfm_cache import DfmModelCache
+from app.processing.placement import DeviceGroup, plan_placement
+
+
+def _registry(monkeypatch):
+    registry = runtime.OrtSessionRegistry()
+    created = []
+    monkeypatch.setattr(runtime, "registry", registry)
+    monkeypatch.setattr(registry, "create_session", lambda path, device=None: created.append(device) or object())
+    monkeypatch.setattr(registry, "warmup", lambda sess, path: 0.0)
+    return created
+
+
+def _model(tmp_path, name, nbytes):
+    path = tmp_path / name
+    path.write_bytes(b"\0" * nbytes)
+    return str(path)
+
+
+def test_one_large_load_evicts_until_within_budget(monkeypatch, tmp_path):
+    _registry(monkeypatch)
+    cache = DfmModelCache(max_models=8)
+    cache.budget_bytes = 1000
+    small = [_model(tmp_path, f"s{i}.onnx", 300) for i in range(3)]
+    for path in small:
+        cache.prewarm(path).result()
+    cache.pin(small[2])
+    cache.prewarm(_model(tmp_path, "big.onnx", 600)).result()
+    # Both unpinned small models have to go to fit the big one; the pinned one stays
+    assert cache.evictions == 2
+    assert [m["path"] for m in cache.stats()["models"]] == [small[2], str(tmp_path / "big.onnx")]
+
+
+def test_key_includes_thread_budget(monkeypatch, tmp_path):
+    created = _registry(monkeypatch)
+    cache = DfmModelCache()
+    path = _model(tmp_path, "a.onnx", 10)
+    wide = DeviceGroup("cpu:0", cores=(0, 1, 2, 3), stages=["swap"])
+    narrow = DeviceGroup("cpu:0", cores=(0, 1, 2, 3), stages=["swap", "detect"])
+    cache.prewarm(path, wide).result()
+    assert cache.get(path, narrow) is None
+    cache.prewarm(path, narrow).result()
+    assert len(created) == 2
+    assert sorted(m["threads"] for m in cache.stats()["models"]) == [2, 4]
+
+
+def test_prewarm_without_session_is_used_by_later_streams(monkeypatch, tmp_path):
+    from app.main import create_app
+
+    created = _registry(monkeypatch)
+    app = create_app()
+    sessions = app.state.sessions
+    sessions._placement = {flag: plan_placement(flag, gpu_count=0, cores=range(8)) for flag in (True, False)}
+    path = _model(tmp_path, "next.onnx", 10)
+
+    r = TestClient(app).post("/models/dfm/prewarm", json={"path": path})
+    assert r.status_code == 200
+    cache = app.state.dfm_models
+    for flag in (True, False):
+        group = sessions.plan(flag).group_for("swap")
+        cache.prewarm(path, group).result()
+        assert cache.get(path, group) is not None
+    assert len(created) == 2  # one per distinct swap placement, none loaded again
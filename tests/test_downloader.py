@@ -0,0 +1,88 @@
+import hashlib
+import importlib.util
+import os
+import threading
+from functools import partial
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from app import downloader as dl
+from app.downloader import ModelDownload, ModelDownloader
+
+_spec = importlib.util.spec_from_file_location(
+    "model_server", os.path.join(os.path.dirname(__file__), "..", "scripts", "model_server.py")
+)
+model_server = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(model_server)
+
+
+@pytest.fixture
+def server(tmp_path):
+    """scripts/model_server.py on a free port; yields (serve dir, base url, handler class)."""
+    root = tmp_path / "srv"
+    root.mkdir()
+    handler = type("Handler", (model_server.RangeHandler,), {"drop_after": 0})
+    handler.log_message = lambda *args: None
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), partial(handler, directory=str(root)))
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield root, f"http://127.0.0.1:{httpd.server_address[1]}", handler
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture(autouse=True)
+def no_retry_sleep(monkeypatch):
+    monkeypatch.setattr(dl.time, "sleep", lambda s: None)
+
+
+def _payload(root, name="m.onnx", size=1 << 20):
+    data = os.urandom(size)
+    (root / name).write_bytes(data)
+    return data, hashlib.sha256(data).hexdigest()
+
+
+def test_dropped_connections_resume_from_part_file(server, tmp_path):
+    root, url, handler = server
+    data, sha = _payload(root)
+    handler.drop_after = 300_000
+    out = tmp_path / "models"
+    d = ModelDownload("m.onnx", f"{url}/m.onnx", sha256=sha)
+    failed = ModelDownloader(str(out), [d], retries=8).run()
+    assert failed == []
+    assert d.state == "ready" and d.resumed_from > 0
+    assert (out / "m.onnx").read_bytes() == data
+    assert not (out / "m.onnx.part").exists()
+
+
+def test_checksum_mismatch_is_an_error_and_leaves_nothing_behind(server, tmp_path):
+    root, url, _ = server
+    _payload(root)
+    out = tmp_path / "models"
+    d = ModelDownload("m.onnx", f"{url}/m.onnx", sha256="0" * 64)
+    failed = ModelDownloader(str(out), [d]).run()
+    assert failed == [d] and "SHA-256" in d.error
+    assert not os.listdir(out)
+
+
+def test_corrupt_existing_file_is_downloaded_again(server, tmp_path):
+    root, url, _ = server
+    data, sha = _payload(root, size=4096)
+    out = tmp_path / "models"
+    out.mkdir()
+    (out / "m.onnx").write_bytes(b"truncated")
+    states = []
+    d = ModelDownload("m.onnx", f"{url}/m.onnx", sha256=sha)
+    ModelDownloader(str(out), [d], on_state=lambda x: states.append(x.state)).run()
+    assert (out / "m.onnx").read_bytes() == data
+    assert states == ["verifying", "downloading", "verifying", "ready"]
+
+
+def test_parallel_downloads(server, tmp_path):
+    root, url, _ = server
+    shas = {f"m{i}.onnx": _payload(root, f"m{i}.onnx", 64 * 1024)[1] for i in range(4)}
+    out = tmp_path / "models"
+    downloads = [ModelDownload(n, f"{url}/{n}", sha256=s) for n, s in shas.items()]
+    assert ModelDownloader(str(out), downloads, workers=4).run() == []
+    assert sorted(os.listdir(out)) == sorted(shas)
@@ -0,0 +1,63 @@
+import threading
+
+import cv2
+import numpy as np
+from fastapi.testclient import TestClient
+
+from app.processing.embeddings import SourceEmbeddingCache
+
+
+class _Encoder:
+    def __init__(self, gate=None):
+        self.gate = gate
+        self.calls = 0
+
+    def encode_image(self, img):
+        if self.gate is not None:
+            self.gate.wait(5)
+        self.calls += 1
+        return np.full(4, img.mean(), np.float32)
+
+
+def _face(tmp_path, name, value):
+    path = str(tmp_path / name)
+    cv2.imwrite(path, np.full((8, 8, 3), value, np.uint8))
+    return path
+
+
+def test_embedding_computed_once_and_persisted(tmp_path):
+    encoder = _Encoder()
+    cache = SourceEmbeddingCache(encoder_factory=lambda: encoder)
+    path = _face(tmp_path, "a.png", 10)
+    first = cache.submit(path).result()
+    assert np.array_equal(cache.submit(path).result(), first)
+    assert encoder.calls == 1
+    # A fresh cache (restart) loads the .npy instead of encoding again
+    other = SourceEmbeddingCache(encoder_factory=lambda: encoder)
+    assert np.array_equal(other.submit(path).result(), first)
+    assert encoder.calls == 1 and other.disk_loads == 1
+
+
+def test_digest_memo_is_bounded(tmp_path):
+    cache = SourceEmbeddingCache(capacity=3, encoder_factory=_Encoder)
+    for i in range(10):
+        cache.digest(_face(tmp_path, f"f{i}.png", i))
+    assert len(cache._digests) == 3
+
+
+def test_upload_does_not_wait_for_encoding(tmp_path, monkeypatch):
+    from app.main import create_app
+    from app.routers import files
+
+    gate = threading.Event()
+    encoder = _Encoder(gate)
+    app = create_app()
+    app.state.embeddings = SourceEmbeddingCache(encoder_factory=lambda: encoder)
+    monkeypatch.setattr(files, "ASSETS_FACE", str(tmp_path))
+    ok, png = cv2.imencode(".png", np.zeros((8, 8, 3), np.uint8))
+    r = TestClient(app).post("/files/upload/face", files={"file": ("face.png", png.tobytes(), "image/png")})
+    # The background task returned while the encoder is still blocked
+    assert r.status_code == 200 and encoder.calls == 0
+    gate.set()
+    assert np.array_equal(app.state.embeddings.submit(r.json()["path"]).result(), np.zeros(4, np.float32))
+    assert encoder.calls == 1
@@ -0,0 +1,77 @@
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+
+from app.ai import alignment
+from app.ai.face_crops import FaceCrops
+
+
+def _frame():
+    rng = np.random.default_rng(0)
+    return cv2.GaussianBlur(rng.integers(0, 256, (200, 200, 3), dtype=np.uint8), (7, 7), 0)
+
+
+def _face(track_id=1):
+    lm = np.array([[38.3, 51.7], [73.5, 51.5], [56.0, 71.7], [41.5, 92.4], [70.7, 92.2]], np.float32) + 40
+    return SimpleNamespace(track_id=track_id, landmarks=lm, bbox=np.array([70, 80, 130, 150], np.float32))
+
+
+def test_one_warp_per_face_size_and_padding():
+    frame, det = _frame(), _face()
+    crops = FaceCrops(frame)
+    a = crops.crop(det, 64, 0.25)
+    # Parsing, swap and blend asking for the same crop share one warp
+    assert crops.crop(det, 64, 0.25) is a and crops.crop(_face(), 64, 0.25) is a
+    assert crops.stats() == {"faces": 1, "warps": 1, "resizes": 0, "hits": 2}
+    expected = alignment.warp_crop(frame, alignment.face_affine(det, 64, 0.25), 64)
+    np.testing.assert_array_equal(a, expected)
+    # Another padding is another aligned space; another track is another face
+    crops.crop(det, 64, 0.0)
+    crops.crop(_face(track_id=2), 64, 0.25)
+    assert crops.stats()["warps"] == 3 and crops.stats()["faces"] == 2
+
+
+def test_smaller_size_is_resized_from_a_larger_crop():
+    frame, det = _frame(), _face()
+    crops = FaceCrops(frame)
+    big = crops.crop(det, 128)
+    small = crops.crop(det, 64)
+    assert crops.warps == 1 and crops.resizes == 1
+    np.testing.assert_array_equal(small, cv2.resize(big, (64, 64), interpolation=cv2.INTER_AREA))
+    direct = alignment.warp_crop(frame, alignment.face_affine(det, 64), 64)
+    assert np.abs(small.astype(int) - direct).mean() < 4
+
+
+def test_affine_is_estimated_once_per_padding():
+    det = _face()
+    crops = FaceCrops(_frame())
+    M64, inv64 = crops.affine(det, 64, 0.25)
+    M128, _ = crops.affine(det, 128, 0.25)
+    np.testing.assert_allclose(M128, M64 * 2, rtol=1e-6)
+    np.testing.assert_allclose(M128, alignment.face_affine(det, 128, 0.25), atol=1e-2)
+    assert crops.affine(det, 64, 0.25)[1] is inv64
+
+
+def test_paste_records_the_region_per_role():
+    frame, det = _frame(), _face()
+    crops = FaceCrops(frame)
+    mask = np.full((64, 64), 255, np.uint8)
+    dst = np.zeros(frame.shape[:2], np.uint8)
+    assert crops.paste(det, mask, 0.25, dst, "mask")
+    x1, y1, x2, y2 = crops.pasted(det, "mask")
+    ys, xs = np.nonzero(dst)
+    assert x1 <= xs.min() and xs.max() < x2 and y1 <= ys.min() and ys.max() < y2
+    assert crops.pasted(det, "swap") is None
+
+
+def test_crop_buffers_are_borrowed():
+    borrowed = []
+
+    def borrow(shape):
+        borrowed.append(np.empty(shape, np.uint8))
+        return borrowed[-1]
+
+    crops = FaceCrops(_frame(), borrow=borrow)
+    c = crops.crop(_face(), 64)
+    assert len(borrowed) == 1 and c is borrowed[0]
@@ -0,0 +1,87 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.ai import runtime
+from app.ai.face_crops import FaceCrops
+from app.ai.face_parsing import FaceParsing
+
+
+class _Session:
+    def get_inputs(self):
+        return [SimpleNamespace(name="input", shape=[1, 3, 64, 64])]
+
+    def get_outputs(self):
+        return [SimpleNamespace(name="logits")]
+
+
+class _Runner:
+    """BiSeNet stand-in: skin (class 1) in the centre of the aligned crop, background elsewhere."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def run(self, feeds):
+        self.calls += 1
+        size = feeds["input"].shape[-1]
+        logits = np.zeros((1, 19, size, size), np.float32)
+        logits[0, 1, size // 4:3 * size // 4, size // 4:3 * size // 4] = 1.0
+        return [logits]
+
+
+def _parser(monkeypatch, tmp_path, **kw):
+    model = tmp_path / "bisenet.onnx"
+    model.write_bytes(b"")
+    monkeypatch.setattr(runtime, "get_session", lambda path, device=None: _Session())
+    parser = FaceParsing(model_path=str(model), size=64, **kw)
+    parser._runner = _Runner()
+    return parser
+
+
+def _face(dx=0.0, track_id=1):
+    lm = (np.array([[38.3, 51.7], [73.5, 51.5], [56.0, 71.7], [41.5, 92.4], [70.7, 92.2]], np.float32) + 40 + dx)
+    return SimpleNamespace(track_id=track_id, landmarks=lm, bbox=np.array([70 + dx, 80, 130 + dx, 150], np.float32))
+
+
+def _parse(parser, det, frame=None):
+    frame = np.zeros((200, 200, 3), np.uint8) if frame is None else frame
+    return parser.parse(frame, [det], crops=FaceCrops(frame))
+
+
+def test_mask_is_reused_while_the_track_is_still(monkeypatch, tmp_path):
+    parser = _parser(monkeypatch, tmp_path, max_reuse=5)
+    first = _parse(parser, _face()).copy()
+    assert first.any()
+    again = _parse(parser, _face(dx=0.5))  # well under 3% of the eye distance
+    assert parser._runner.calls == 1 and parser.reused == 1
+    # Same aligned-space mask, pasted back with this frame's (half-pixel shifted) transform
+    a, b = first > 127, again > 127
+    assert (a & b).sum() / (a | b).sum() > 0.9
+
+
+def test_mask_is_recomputed_when_the_face_moves(monkeypatch, tmp_path):
+    parser = _parser(monkeypatch, tmp_path)
+    first = _parse(parser, _face()).copy()
+    moved = _parse(parser, _face(dx=10))
+    assert parser._runner.calls == 2 and parser.reused == 0
+    # The new mask follows the face
+    xs_first, xs_moved = np.nonzero(first)[1], np.nonzero(moved)[1]
+    assert abs((xs_moved.mean() - xs_first.mean()) - 10) < 1.5
+
+
+def test_reuse_is_capped_by_max_reuse(monkeypatch, tmp_path):
+    parser = _parser(monkeypatch, tmp_path, max_reuse=2)
+    for _ in range(7):
+        _parse(parser, _face())
+    # parse, reuse, reuse, parse, reuse, reuse, parse
+    assert parser._runner.calls == 3 and parser.reused == 4
+
+
+def test_new_track_and_lost_track_are_not_reused(monkeypatch, tmp_path):
+    parser = _parser(monkeypatch, tmp_path)
+    _parse(parser, _face(track_id=1))
+    _parse(parser, _face(track_id=2))
+    assert parser._runner.calls == 2
+    assert parser.stats()["tracks"] == 1  # track 1 left the frame and was forgotten
+    frame = np.zeros((200, 200, 3), np.uint8)
+    assert parser.parse(frame, []) is None and parser.stats()["tracks"] == 0
@@ -0,0 +1,62 @@
+import threading
+from concurrent.futures import Future
+
+from app.ai.face_swap import FaceSwap
+
+
+class _Models:
+    """DfmModelCache stand-in: prewarm hands out futures the test completes by hand."""
+
+    def __init__(self):
+        self.futures = {}
+
+    def prewarm(self, path, device=None):
+        return self.futures.setdefault(path, Future())
+
+    def pin(self, path, device=None):
+        pass
+
+    def unpin(self, path, device=None):
+        pass
+
+
+class _RacingFuture(Future):
+    """Reports done, and while the swap thread is polling it the API selects another model."""
+
+    def __init__(self, swapper):
+        super().__init__()
+        self.swapper = swapper
+        self.api = None
+
+    def done(self):
+        if self.api is None:
+            self.api = threading.Thread(target=self.swapper.use_model, args=("b.onnx",))
+            self.api.start()
+            self.api.join(0.2)
+        return super().done()
+
+
+def test_model_switch_during_poll_is_not_lost():
+    models = _Models()
+    swapper = FaceSwap(models=models, model_path="/nonexistent.onnx")
+    racing = models.futures["a.onnx"] = _RacingFuture(swapper)
+    racing.set_result("session-a")
+    swapper._pending = ("a.onnx", racing)
+
+    swapper._poll_pending()
+    racing.api.join(2)
+    # The selection made while the poll ran is still pending and wins once loaded
+    assert swapper.stats()["pending"] == "b.onnx"
+    models.futures["b.onnx"].set_result("session-b")
+    swapper._poll_pending()
+    assert swapper._active == ("b.onnx", "session-b")
+
+
+def test_ready_model_switches_immediately():
+    models = _Models()
+    swapper = FaceSwap(models=models, model_path="/nonexistent.onnx")
+    models.prewarm("a.onnx").set_result("session-a")
+    assert swapper.use_model("a.onnx") == "ready"
+    assert swapper.model_path == "a.onnx"
+    assert swapper.use_model("b.onnx") == "loading"
+    assert swapper.model_path == "a.onnx"
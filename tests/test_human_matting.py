@@ -0,0 +1,124 @@
+import numpy as np
+import pytest
+
+from app.ai.human_matting import STATE_NAMES, HumanMatting, auto_downsample_ratio
+
+
+def _view(value):
+    # Writable numpy view of a CPU OrtValue, the way ORT writes bound outputs
+    n = int(np.prod(value.shape()))
+    raw = (np.ctypeslib.as_ctypes_type(np.float32) * n).from_address(value.data_ptr())
+    return np.ctypeslib.as_array(raw).reshape(value.shape())
+
+
+class _Rvm:
+    """RVM stand-in: each recurrent state output is its input + 1, fgr = src, pha = 0.5."""
+
+    def __init__(self):
+        self.ratios = []
+        self.first_runs = 0
+        self.bound_runs = 0
+
+    def run(self, names, feeds):
+        self.first_runs += 1
+        self.ratios.append(float(feeds["downsample_ratio"][0]))
+        src = feeds["src"]
+        states = [np.full((1, 4, 2, 2), feeds[f"{n}i"].max() + 1, np.float32) for n in STATE_NAMES]
+        return [src.copy(), np.full(src[:, :1].shape, 0.5, np.float32)] + states
+
+    def io_binding(self):
+        session = self
+
+        class _Binding:
+            inputs, outputs = {}, {}
+
+            def bind_cpu_input(self, name, arr):
+                self.inputs[name] = arr
+
+            def bind_ortvalue_output(self, name, value):
+                self.outputs[name] = value
+
+        session.binding = _Binding()
+        return session.binding
+
+    def run_with_iobinding(self, io):
+        self.bound_runs += 1
+        self.ratios.append(float(io.inputs["downsample_ratio"][0]))
+        _view(io.outputs["fgr"])[:] = io.inputs["src"]
+        _view(io.outputs["pha"])[:] = 0.5
+        for n in STATE_NAMES:
+            _view(io.outputs[f"{n}o"])[:] = io.inputs[f"{n}i"] + 1
+
+
+def _engine():
+    mt = HumanMatting(model_path="/nonexistent/rvm.onnx")
+    mt.session = _Rvm()
+    return mt
+
+
+def _frame(h=36, w=64, v=100):
+    return np.full((h, w, 3), v, np.uint8)
+
+
+def _state_value(mt):
+    return float(mt.state[mt._cur][0].max())
+
+
+def test_recurrent_state_carries_over_between_frames():
+    mt = _engine()
+    mt.infer(_frame())
+    buffers = [id(b) for half in mt.state for b in half]
+    for n in range(2, 6):
+        fgr, pha = mt.infer(_frame())
+        assert _state_value(mt) == n
+    # Ping-pong buffers are reused in place; only the first frame ran without IO binding
+    assert [id(b) for half in mt.state for b in half] == buffers
+    assert mt.session.first_runs == 1 and mt.session.bound_runs == 4
+    assert fgr[0, 0].tolist() == [100, 100, 100] and pha[0, 0] == 128
+
+
+def test_state_resets_on_resolution_change():
+    mt = _engine()
+    for _ in range(3):
+        mt.infer(_frame())
+    mt.infer(_frame(72, 128))
+    assert _state_value(mt) == 1 and mt.session.first_runs == 2
+
+
+def test_state_resets_when_the_source_changes():
+    mt = _engine()
+    for _ in range(3):
+        mt.infer(_frame())
+    resets = mt.resets
+    mt.reset()
+    mt.infer(_frame())
+    assert _state_value(mt) == 1 and mt.resets == resets + 1
+
+
+def test_state_resets_on_scene_cut():
+    mt = _engine()
+    for _ in range(3):
+        mt.infer(_frame(v=20))
+    mt.infer(_frame(v=220))
+    assert mt.scene_cuts == 1 and _state_value(mt) == 1
+    mt.infer(_frame(v=220))
+    assert _state_value(mt) == 2
+
+
+@pytest.mark.parametrize(
+    "h, w, ratio",
+    [(240, 320, 1.0), (720, 1280, 0.375), (1080, 1920, 0.25), (2160, 3840, 0.125), (4320, 7680, 1 / 16)],
+)
+def test_auto_downsample_ratio(h, w, ratio):
+    assert auto_downsample_ratio(h, w, 512) == ratio
+    # Portrait frames use the long side too
+    assert auto_downsample_ratio(w, h, 512) == ratio
+
+
+def test_ratio_follows_resolution_and_target_size():
+    mt = _engine()
+    mt.infer(_frame(720, 1280))
+    assert mt.session.ratios[-1] == 0.375 and mt.downsample_ratio == 0.375
+    mt.set_target_size(256)
+    mt.infer(_frame(720, 1280))
+    assert mt.session.ratios[-1] == 0.1875 and _state_value(mt) == 1
@@ -0,0 +1,48 @@
+import time
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from app.processing.jpeg import JpegCache
+from app.processing.mailbox import FrameMailbox
+from app.processing.manager import PipelineConfig, ProcessingManager
+from app.processing.sessions import StreamSession
+
+
+def _img(v=0):
+    return np.full((16, 16, 3), v, np.uint8)
+
+
+def test_jpeg_encoded_once_per_frame():
+    box = FrameMailbox()
+    cache = JpegCache(box)
+    assert cache.get() is None
+    box.publish(1, time.time(), _img(10))
+    a, b = cache.get(), cache.get()
+    assert a is b and cache.encodes == 1
+    box.publish(2, time.time(), _img(20))
+    c = cache.get()
+    assert c.seq == 2 and c.etag != a.etag and cache.encodes == 2
+
+
+def test_frame_endpoint_etag_and_304():
+    from app.main import create_app
+
+    app = create_app()
+    mgr = ProcessingManager(PipelineConfig(use_multi_gpu=False), session_id="s")
+    app.state.sessions._sessions["s"] = StreamSession("s", mgr)
+    mgr.latest.publish(1, time.time(), _img(50))
+    client = TestClient(app)
+
+    r = client.get("/stream/frame")
+    assert r.status_code == 200 and r.headers["content-type"] == "image/jpeg"
+    assert r.headers["x-frame-seq"] == "1"
+    etag = r.headers["etag"]
+    r = client.get("/stream/frame", headers={"If-None-Match": etag})
+    assert r.status_code == 304 and not r.content
+    assert client.get("/stream/frame", headers={"If-None-Match": f"W/{etag}"}).status_code == 304
+
+    mgr.latest.publish(2, time.time(), _img(60))
+    r = client.get("/stream/frame", headers={"If-None-Match": etag})
+    assert r.status_code == 200 and r.headers["etag"] != etag
+    assert mgr.jpeg.encodes == 2
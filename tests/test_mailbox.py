@@ -0,0 +1,39 @@
+import threading
+import time
+
+import numpy as np
+
+from app.processing.mailbox import FrameMailbox
+
+
+def _img(v=0):
+    return np.full((16, 16, 3), v, np.uint8)
+
+
+def test_latest_frame_wins_and_reads_do_not_consume():
+    box = FrameMailbox()
+    for seq in (1, 2, 3):
+        assert box.publish(seq, time.time(), _img(seq))
+    assert not box.publish(2, time.time(), _img())  # older than the current frame
+    assert box.read().seq == 3
+    assert box.read().seq == 3
+
+
+def test_replaced_buffer_is_released_only_after_readers_let_go():
+    box = FrameMailbox()
+    released = []
+    first = _img(1)
+    box.publish(1, time.time(), first, release=released.append)
+    with box.hold() as snap:
+        box.publish(2, time.time(), _img(2), release=released.append)
+        assert snap.image is first and released == []
+    assert released == [first]
+
+
+def test_wait_newer_wakes_on_publish():
+    box = FrameMailbox()
+    box.publish(1, time.time(), _img())
+    timer = threading.Timer(0.05, lambda: box.publish(2, time.time(), _img()))
+    timer.start()
+    assert box.wait_newer(1, timeout=2).seq == 2
+    assert box.wait_newer(2, timeout=0.05) is None
@@ -0,0 +1,113 @@
+import os
+
+import onnxruntime as ort
+import pytest
+
+from app.ai import runtime
+from app.ai.ort_cache import OptimizedModelCache
+from app.processing.placement import CUDA_PROVIDER, DeviceGroup
+
+
+class _FakeOrt:
+    """InferenceSession stand-in: 'optimizes' by writing the artifact ORT would save."""
+
+    def __init__(self):
+        self.loaded = []
+        self.fail_on = None
+
+    def __call__(self, src, sess_options=None, providers=None):
+        if isinstance(src, bytes) and src == self.fail_on:
+            raise RuntimeError("corrupt model")
+        self.loaded.append(src)
+        out = sess_options.optimized_model_filepath
+        if out:
+            with open(out, "wb") as f:
+                f.write(b"optimized:" + open(src, "rb").read())
+            try:
+                data = sess_options.get_session_config_entry(
+                    "session.optimized_model_external_initializers_file_name"
+                )
+            except RuntimeError:  # not set: ORT-format save, initializers inline
+                data = None
+            if data:
+                # Relative to the saved model, like ORT's external initializers
+                with open(os.path.join(os.path.dirname(out), data), "wb") as f:
+                    f.write(b"weights")
+        return object()
+
+
+@pytest.fixture
+def env(monkeypatch, tmp_path):
+    fake = _FakeOrt()
+    monkeypatch.setattr(ort, "InferenceSession", fake)
+    model = tmp_path / "model.onnx"
+    model.write_bytes(b"graph-v1")
+    cache = OptimizedModelCache(cache_dir=str(tmp_path / "cache"), enabled=True)
+    return fake, str(model), cache, runtime.OrtSessionRegistry(cache)
+
+
+def _files(cache):
+    return sorted(n for n in os.listdir(cache.cache_dir) if n != "index.json")
+
+
+def test_cpu_artifact_is_ort_format_and_loaded_from_bytes(env):
+    fake, model, cache, registry = env
+    registry.create_session(model)
+    (name,) = _files(cache)
+    assert name.endswith(".cpu.ort")
+    registry.create_session(model)
+    assert cache.hits == 1 and fake.loaded[-1] == b"optimized:graph-v1"
+
+
+def test_gpu_artifact_is_onnx_with_external_data(env):
+    fake, model, cache, registry = env
+    gpu = DeviceGroup("cuda:0", CUDA_PROVIDER, cores=(0,), stages=["swap"])
+    registry.create_session(model, gpu)
+    onnx, data = _files(cache)
+    assert onnx.endswith(".cuda.onnx") and data == onnx + ".data"
+    registry.create_session(model, gpu)
+    assert cache.hits == 1 and fake.loaded[-1] == os.path.join(cache.cache_dir, onnx)
+
+
+def test_changed_model_gets_a_new_artifact_and_the_old_one_is_pruned(env):
+    fake, model, cache, registry = env
+    registry.create_session(model)
+    (old,) = _files(cache)
+    with open(model, "wb") as f:
+        f.write(b"graph-v2 longer")  # new size and mtime
+    registry.create_session(model)
+    (new,) = _files(cache)
+    assert new != old and cache.hits == 0
+    assert fake.loaded[-1] == model  # optimized from source again
+
+
+def test_same_mtime_and_size_reuses_the_indexed_hash(env):
+    _, model, cache, _ = env
+    digest = cache.digest(model)
+    st = os.stat(model)
+    with open(model, "wb") as f:
+        f.write(b"graph-v9")  # same size
+    os.utime(model, ns=(st.st_atime_ns, st.st_mtime_ns))
+    # Hash comes from index.json, also for a fresh cache instance after a restart
+    assert OptimizedModelCache(cache_dir=cache.cache_dir).digest(model) == digest
+    os.utime(model, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    assert cache.digest(model) != digest
+
+
+def test_new_ort_version_invalidates(env, monkeypatch):
+    _, model, cache, registry = env
+    registry.create_session(model)
+    (old,) = _files(cache)
+    monkeypatch.setattr(ort, "__version__", "99.0.0")
+    registry.create_session(model)
+    (new,) = _files(cache)
+    assert "ort99.0.0" in new and new != old and cache.hits == 0
+
+
+def test_unloadable_artifact_is_discarded_and_rebuilt(env):
+    fake, model, cache, registry = env
+    registry.create_session(model)
+    fake.fail_on = b"optimized:graph-v1"
+    registry.create_session(model)
+    assert cache.failures == 1
+    assert fake.loaded[-1] == model and len(_files(cache)) == 1
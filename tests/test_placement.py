@@ -0,0 +1,70 @@
+import os
+import threading
+
+import pytest
+
+from app.processing.placement import CPU_PROVIDER, CUDA_PROVIDER, STAGE_MODELS, plan_placement
+
+
+def _cores(plan):
+    return [c for g in plan.groups for c in g.cores]
+
+
+def test_single_group_without_multi_gpu():
+    for gpus in (0, 2):
+        plan = plan_placement(False, gpu_count=gpus, cores=range(8))
+        assert len(plan.groups) == 1
+        group = plan.groups[0]
+        assert group.provider == (CUDA_PROVIDER if gpus else CPU_PROVIDER)
+        assert set(plan.assignment) == set(STAGE_MODELS)
+        assert set(plan.assignment.values()) == {group.name}
+        assert group.cores == tuple(range(8))
+        assert group.intra_op_threads() == 2  # four concurrent stages share eight cores
+
+
+def test_cpu_only_multi_splits_cores_by_stage_cost():
+    plan = plan_placement(True, gpu_count=0, cores=range(8))
+    assert [g.name for g in plan.groups] == ["cpu:0", "cpu:1", "cpu:2", "cpu:3"]
+    assert all(g.provider == CPU_PROVIDER for g in plan.groups)
+    # One stage per group, heaviest first; cores are disjoint, contiguous and cover the machine
+    assert plan.assignment == {"swap": "cpu:0", "matting": "cpu:1", "parsing": "cpu:2", "detect": "cpu:3"}
+    assert _cores(plan) == list(range(8))
+    # Core counts follow STAGE_COST (swap 4, matting 3, parsing 1.5, detect 1), at least one each
+    assert [len(g.cores) for g in plan.groups] == [4, 2, 1, 1]
+    assert plan.group_for("swap").intra_op_threads() == 4
+
+
+def test_gpu_multi_balances_stages_across_devices():
+    plan = plan_placement(True, gpu_count=2, cores=range(8))
+    assert [(g.name, g.provider, g.device_id) for g in plan.groups] == [
+        ("cuda:0", CUDA_PROVIDER, 0),
+        ("cuda:1", CUDA_PROVIDER, 1),
+    ]
+    assert plan.assignment == {"swap": "cuda:0", "detect": "cuda:0", "matting": "cuda:1", "parsing": "cuda:1"}
+    # Host cores are split evenly between GPU groups for pre/post-processing
+    assert [g.cores for g in plan.groups] == [(0, 1, 2, 3), (4, 5, 6, 7)]
+
+
+def test_more_gpus_than_stages_and_too_few_cores():
+    plan = plan_placement(True, gpu_count=8, cores=range(2))
+    assert len(plan.groups) == len(STAGE_MODELS)
+    assert all(len(g.cores) == 1 for g in plan.groups)  # cores reused round-robin
+    small = plan_placement(True, gpu_count=0, cores=range(3))
+    assert len(small.groups) == 1
+
+
+@pytest.mark.skipif(not hasattr(os, "sched_setaffinity"), reason="needs sched_setaffinity")
+def test_stage_thread_is_pinned_to_its_group():
+    available = sorted(os.sched_getaffinity(0))
+    group = plan_placement(True, gpu_count=0, cores=available[:1]).groups[0]
+    seen = []
+
+    def run():
+        group.pin_current_thread()
+        seen.append(os.sched_getaffinity(0))
+
+    t = threading.Thread(target=run)
+    t.start()
+    t.join()
+    assert seen == [set(available[:1])]
+    assert sorted(os.sched_getaffinity(0)) == available  # only the stage thread was pinned
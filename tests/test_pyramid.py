@@ -0,0 +1,75 @@
+import cv2
+import numpy as np
+
+from app.processing.pyramid import FramePyramid
+
+
+def _frame(w=640, h=360):
+    # Smooth content, so pyrDown and a direct INTER_AREA resize agree closely
+    rng = np.random.default_rng(0)
+    return cv2.resize(rng.integers(0, 256, (3, 4, 3), dtype=np.uint8), (w, h), interpolation=cv2.INTER_CUBIC)
+
+
+def test_get_builds_each_level_once():
+    frame = _frame()
+    pyr = FramePyramid(frame)
+    a = pyr.get(480, 270)
+    assert pyr.get(480, 270) is a
+    assert pyr.stats()["built"] == 1 and pyr.stats()["hits"] == 1
+    assert pyr.get(640, 360) is frame and pyr.get(800, 600) is frame
+
+
+def test_mild_downscale_matches_cv2_resize():
+    frame = _frame()
+    got = FramePyramid(frame).get(480, 270)
+    np.testing.assert_array_equal(got, cv2.resize(frame, (480, 270), interpolation=cv2.INTER_AREA))
+
+
+def test_large_downscale_goes_through_cached_pyrdown_levels():
+    frame = _frame()
+    pyr = FramePyramid(frame)
+    small = pyr.get(100, 56)
+    # 640x360 -> 320x180 -> 160x90 by pyrDown, then INTER_AREA to the target
+    assert {(320, 180), (160, 90), (100, 56)} <= set(pyr.stats()["levels"])
+    assert pyr.stats()["built"] == 3
+    ref = cv2.resize(frame, (100, 56), interpolation=cv2.INTER_AREA)
+    assert np.abs(small.astype(int) - ref).mean() < 2
+    # A nearby size starts from the closest cached level, not the full frame
+    pyr.get(150, 84)
+    assert pyr.stats()["built"] == 4
+    pyr.get(160, 90)
+    assert pyr.stats()["built"] == 4 and pyr.stats()["hits"] == 1
+
+
+def test_fit_keeps_the_aspect_ratio():
+    frame = _frame()
+    pyr = FramePyramid(frame)
+    img, r = pyr.fit(320, 320)
+    assert img.shape[:2] == (180, 320) and r == 0.5
+    assert pyr.fit(320, 320)[0] is img
+    assert pyr.fit(1280, 1280) == (frame, 1.0)
+
+
+def test_gray_is_cached_and_matches_cvtcolor():
+    frame = _frame()
+    pyr = FramePyramid(frame)
+    g = pyr.gray(320, 180)
+    np.testing.assert_array_equal(g, cv2.cvtColor(pyr.get(320, 180), cv2.COLOR_BGR2GRAY))
+    built = pyr.stats()["built"]
+    assert pyr.gray(320, 180) is g and pyr.stats()["built"] == built
+    full = pyr.gray(640, 360)
+    np.testing.assert_array_equal(full, cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
+
+
+def test_levels_are_written_into_borrowed_buffers():
+    borrowed = []
+
+    def borrow(shape):
+        borrowed.append(np.empty(shape, np.uint8))
+        return borrowed[-1]
+
+    pyr = FramePyramid(_frame(), borrow=borrow)
+    level = pyr.get(160, 90)
+    gray = pyr.gray(160, 90)
+    assert any(level is b for b in borrowed) and any(gray is b for b in borrowed)
+    assert len(borrowed) == pyr.stats()["built"]
@@ -0,0 +1,92 @@
+import pytest
+
+from app.processing import quality
+from app.processing.quality import QualityController
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = _Clock()
+    monkeypatch.setattr(quality, "time", c)
+    return c
+
+
+def _controller(**kw):
+    changes = []
+    q = QualityController(
+        target_fps=25, target_latency_ms=100, start_level=1, window_s=1.0,
+        down_after=2, up_after=3, hold_s=5.0, enabled=True, on_change=changes.append, **kw,
+    )
+    q.frames = 0
+    return q, changes
+
+
+def _window(q, clock, latency_s):
+    # One measurement window at 25 fps in and out
+    clock.now += 1.0
+    for _ in range(25):
+        q.observe(latency_s)
+    q.frames += 25
+    q.update(q.frames, q.frames, 0, {"swap": 20.0})
+
+
+def test_steps_down_only_after_down_after_overloaded_windows(clock):
+    q, changes = _controller()
+    _window(q, clock, 0.3)
+    assert q.level.name == "medium"
+    _window(q, clock, 0.3)
+    assert q.level.name == "low" and [lv.name for lv in changes] == ["low"]
+    assert q.decisions[-1]["reason"].startswith("latency")
+
+
+def test_hold_blocks_changes_right_after_a_switch(clock):
+    q, changes = _controller()
+    for _ in range(2):
+        _window(q, clock, 0.3)
+    assert q.level.name == "low"
+    for _ in range(4):  # still overloaded, but inside hold_s
+        _window(q, clock, 0.3)
+    assert q.level.name == "low"
+    _window(q, clock, 0.3)  # hold over, over-count already past down_after
+    assert q.level.name == "lower"
+
+
+def test_steps_up_only_after_up_after_healthy_windows(clock):
+    q, changes = _controller()
+    clock.now += 10  # outside the hold of any earlier change
+    for _ in range(2):
+        _window(q, clock, 0.01)
+    assert q.level.name == "medium"
+    _window(q, clock, 0.01)
+    assert q.level.name == "high"
+
+
+def test_in_between_window_resets_the_streak(clock):
+    q, changes = _controller()
+    clock.now += 10
+    for latency in (0.01, 0.01, 0.08, 0.01, 0.01):  # 80 ms: under target, but not clearly
+        _window(q, clock, latency)
+    assert q.level.name == "medium" and not changes
+
+
+def test_manual_level_pins_quality(clock):
+    q, changes = _controller()
+    q.configure(enabled=False, level="high")
+    assert q.level.name == "high" and changes[-1].name == "high"
+    assert q.decisions[-1]["reason"] == "manual"
+    for _ in range(10):
+        _window(q, clock, 0.5)
+    assert q.level.name == "high" and len(changes) == 1
+    with pytest.raises(ValueError):
+        q.configure(level="ultra")
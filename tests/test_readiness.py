@@ -0,0 +1,50 @@
+import os
+from types import SimpleNamespace
+
+from app import events
+from app.ai import runtime
+from app.ai.readiness import ModelReadiness
+from app.config import settings
+from app.processing.placement import plan_placement
+from app.processing.sessions import SessionRegistry
+
+
+def _app(monkeypatch):
+    registry = runtime.OrtSessionRegistry()
+    created = []
+    monkeypatch.setattr(runtime, "registry", registry)
+    monkeypatch.setattr(registry, "create_session", lambda path, device=None: created.append(device) or object())
+    monkeypatch.setattr(registry, "warmup", lambda sess, path: 0.0)
+    sessions = SessionRegistry()
+    # Eight CPU cores: the multi-group plan splits thread budgets, the single-group plan does not
+    sessions._placement = {flag: plan_placement(flag, gpu_count=0, cores=range(8)) for flag in (True, False)}
+    app = SimpleNamespace(state=SimpleNamespace(readiness=ModelReadiness(), sessions=sessions, status={}))
+    return app, registry, created
+
+
+def test_ready_stage_is_warm_for_every_placement(monkeypatch):
+    app, registry, created = _app(monkeypatch)
+    events.load_model(app, "detect")
+    assert app.state.readiness.state("detect") == "ready"
+    path = os.path.join(settings.models_dir, app.state.readiness.models["detect"])
+    for flag in (True, False):
+        key = registry.key(path, app.state.sessions.plan(flag).group_for("detect"))
+        assert key in registry._sessions
+    assert len(created) == 2  # different thread budgets -> two sessions
+    # Starting a stream afterwards never creates a session on the request path
+    n = len(created)
+    for flag in (True, False):
+        registry.session(path, app.state.sessions.plan(flag).group_for("detect"))
+    assert len(created) == n
+
+
+def test_load_failure_marks_stage_error(monkeypatch):
+    app, registry, _ = _app(monkeypatch)
+
+    def fail(path, device=None):
+        raise RuntimeError("bad model")
+
+    monkeypatch.setattr(registry, "create_session", fail)
+    events.load_model(app, "matting")
+    assert app.state.readiness.state("matting") == "error"
+    assert "bad model" in app.state.readiness.to_dict()["matting"]["error"]
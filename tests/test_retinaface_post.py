@@ -0,0 +1,81 @@
+import math
+
+import numpy as np
+import pytest
+
+from app.ai import retinaface_post as post
+
+
+def _loop_postprocess(loc, conf, landms, h, w, conf_thresh=0.5, nms_thresh=0.4, keep_top_k=50):
+    # Reference: per-prior Python loop (priors, decode, threshold, greedy NMS)
+    pri = []
+    for step, sizes in zip(post.STEPS, post.MIN_SIZES):
+        for i in range(math.ceil(h / step)):
+            for j in range(math.ceil(w / step)):
+                for s in sizes:
+                    pri.append(((j + 0.5) * step / w, (i + 0.5) * step / h, s / w, s / h))
+    v0, v1 = post.VARIANCE
+    dets = []
+    for n, p in enumerate(pri):
+        if conf[n, 1] <= conf_thresh:
+            continue
+        l = loc[n]
+        cx, cy = p[0] + l[0] * v0 * p[2], p[1] + l[1] * v0 * p[3]
+        bw, bh = p[2] * math.exp(l[2] * v1), p[3] * math.exp(l[3] * v1)
+        dets.append(((cx - bw / 2) * w, (cy - bh / 2) * h, (cx + bw / 2) * w, (cy + bh / 2) * h, float(conf[n, 1])))
+    dets.sort(key=lambda d: -d[4])
+    keep = []
+    for d in dets:
+        for k in keep:
+            iw = max(min(d[2], k[2]) - max(d[0], k[0]), 0)
+            ih = max(min(d[3], k[3]) - max(d[1], k[1]), 0)
+            inter = iw * ih
+            if inter / ((d[2] - d[0]) * (d[3] - d[1]) + (k[2] - k[0]) * (k[3] - k[1]) - inter) > nms_thresh:
+                break
+        else:
+            keep.append(d)
+    return keep[:keep_top_k]
+
+
+def _outputs(size, faces, batch=1, seed=0):
+    rng = np.random.default_rng(seed)
+    n = post.priors(size, size).shape[0]
+    loc = rng.normal(0, 0.05, (batch, n, 4)).astype(np.float32)
+    landms = rng.normal(0, 0.5, (batch, n, 10)).astype(np.float32)
+    conf = np.zeros((batch, n, 2), np.float32)
+    conf[..., 1] = rng.uniform(0, 0.3, (batch, n))
+    for b in range(batch):
+        idx = rng.choice(n, faces * 6, replace=False)
+        conf[b, idx, 1] = rng.uniform(0.6, 1.0, idx.size)
+    return loc, conf, landms
+
+
+def test_priors_match_reference_order():
+    pri = post.priors(64, 96)
+    first = [(0.5 * 8 / 96, 0.5 * 8 / 64, 16 / 96, 16 / 64), (0.5 * 8 / 96, 0.5 * 8 / 64, 32 / 96, 32 / 64)]
+    assert np.allclose(pri[:2], first)
+    assert pri.shape[0] == sum(math.ceil(64 / s) * math.ceil(96 / s) * 2 for s in post.STEPS)
+    assert post.priors(64, 96) is pri  # cached per resolution
+
+
+@pytest.mark.parametrize("faces", [1, 5, 20, 60])
+def test_vectorized_matches_loop(faces):
+    size = 320
+    loc, conf, landms = _outputs(size, faces, seed=faces)
+    boxes, scores, pts = post.postprocess(loc, conf, landms, (size, size), [1.0])[0]
+    ref = _loop_postprocess(loc[0], conf[0], landms[0], size, size)
+    assert len(boxes) == len(ref)
+    assert np.allclose(boxes, np.array([d[:4] for d in ref]), atol=1e-3)
+    assert np.allclose(scores, [d[4] for d in ref])
+    assert pts.shape == (len(ref), 5, 2)
+
+
+def test_batch_equals_single_frames_with_scales():
+    size = 320
+    loc, conf, landms = _outputs(size, 4, batch=3, seed=7)
+    scales = [1.0, 0.5, 2.0]
+    batched = post.postprocess(loc, conf, landms, (size, size), scales)
+    for b, s in enumerate(scales):
+        single = post.postprocess(loc[b:b + 1], conf[b:b + 1], landms[b:b + 1], (size, size), [s])[0]
+        for x, y in zip(batched[b], single):
+            assert np.allclose(x, y)
@@ -0,0 +1,123 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.ai import runtime
+from app.processing.placement import DeviceGroup
+
+
+class _Session:
+    """InferenceSession stand-in: y = x * 2, with an IO binding that writes into the bound buffer."""
+
+    def __init__(self, inputs=()):
+        self.inputs = list(inputs)
+        self.runs = []
+        self.bound_runs = 0
+        self.bound = {}
+
+    def get_inputs(self):
+        return self.inputs
+
+    def get_outputs(self):
+        return [SimpleNamespace(name="y")]
+
+    def run(self, names, feeds):
+        self.runs.append({k: v.shape for k, v in feeds.items()})
+        return [next(iter(feeds.values())) * 2]
+
+    def io_binding(self):
+        session = self
+
+        class _Binding:
+            def bind_cpu_input(self, name, arr):
+                session.bound["x"] = arr
+
+            def bind_ortvalue_output(self, name, value):
+                session.bound[name] = value
+
+        return _Binding()
+
+    def run_with_iobinding(self, io):
+        self.bound_runs += 1
+        x = self.bound["x"]
+        # Write through the bound OrtValue's memory, as ORT does for CPU outputs
+        raw = (np.ctypeslib.as_ctypes_type(x.dtype) * x.size).from_address(self.bound["y"].data_ptr())
+        out = np.ctypeslib.as_array(raw).reshape(x.shape)
+        np.multiply(x, 2, out=out)
+
+
+def test_bound_runner_reuses_output_buffers_per_shape():
+    sess = _Session()
+    runner = runtime.BoundRunner(sess, max_shapes=2)
+    x = np.arange(6, dtype=np.float32).reshape(2, 3)
+    first = runner.run({"x": x})[0]
+    assert len(sess.runs) == 1 and sess.bound_runs == 0
+    second = runner.run({"x": x + 1})[0]
+    # Steady state: same buffer, written in place through the IO binding
+    assert second is first and sess.bound_runs == 1
+    np.testing.assert_array_equal(second, (x + 1) * 2)
+    # A new shape learns its own buffers; the oldest shape is evicted past max_shapes
+    runner.run({"x": np.zeros((1, 3), np.float32)})
+    runner.run({"x": np.zeros((4, 3), np.float32)})
+    assert len(runner._outputs) == 2
+    runner.run({"x": x})
+    assert len(sess.runs) == 4
+
+
+def _registry(monkeypatch):
+    registry = runtime.OrtSessionRegistry()
+    created = []
+
+    def create(path, device=None):
+        time.sleep(0.01)
+        sess = _Session()
+        created.append((path, device))
+        return sess
+
+    monkeypatch.setattr(registry, "create_session", create)
+    return registry, created
+
+
+def test_registry_creates_each_session_once(monkeypatch):
+    registry, created = _registry(monkeypatch)
+    group = DeviceGroup("cpu:0", cores=(0, 1, 2, 3), stages=["detect"])
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.session("m.onnx", group))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(created) == 1 and all(r is results[0] for r in results)
+    # Same provider/device/thread budget under another group name shares the session
+    twin = DeviceGroup("cpu:1", cores=(4, 5, 6, 7), stages=["matting"])
+    assert registry.session("m.onnx", twin) is results[0]
+    # A different thread budget does not
+    narrow = DeviceGroup("cpu:2", cores=(0, 1), stages=["detect"])
+    assert registry.session("m.onnx", narrow) is not results[0]
+    assert len(created) == 2
+    assert len(registry.stats()["sessions"]) == 2
+
+
+def test_warmup_uses_expected_input_shapes():
+    registry = runtime.OrtSessionRegistry()
+    inp = SimpleNamespace(name="input", shape=[1, 3, "h", "w"], type="tensor(float)")
+    sess = _Session([inp])
+    registry.warmup(sess, "/models/retinaface_mnet.onnx")
+    assert sess.runs == [{"input": (1, 3, 640, 640)}, {"input": (1, 3, 320, 320)}]
+    other = _Session([inp])
+    registry.warmup(other, "/models/other.onnx")
+    assert other.runs == [{"input": (1, 3, 1, 1)}]  # dynamic dims default to 1
+
+
+def test_warmup_failure_is_logged_not_raised():
+    registry = runtime.OrtSessionRegistry()
+    sess = _Session([SimpleNamespace(name="x", shape=[1], type="tensor(float)")])
+
+    def fail(names, feeds):
+        raise RuntimeError("bad input")
+
+    sess.run = fail
+    assert registry.warmup(sess, "/models/x.onnx") >= 0.0
+    assert "x.onnx" in registry.warm
@@ -0,0 +1,97 @@
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.processing.sessions import (
+    AdmissionError,
+    FairScheduler,
+    SessionRegistry,
+    StreamSession,
+    UnknownSessionError,
+)
+
+
+def _hammer(scheduler, sid, hold_s, until, counts):
+    while time.monotonic() < until:
+        if scheduler.acquire(sid, timeout=0.2):
+            counts[sid] = counts.get(sid, 0) + 1
+            time.sleep(hold_s)
+            scheduler.release(sid)
+
+
+def _run(scheduler, sids, hold_s, duration):
+    counts = {}
+    until = time.monotonic() + duration
+    threads = [threading.Thread(target=_hammer, args=(scheduler, sid, hold_s, until, counts)) for sid in sids]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return counts
+
+
+def test_scheduler_shares_slots_by_weight():
+    scheduler = FairScheduler(slots=1)
+    scheduler.register("a", weight=1.0)
+    scheduler.register("b", weight=3.0)
+    counts = _run(scheduler, ["a", "a", "b", "b"], 0.005, 1.0)
+    ratio = counts["b"] / counts["a"]
+    assert 2.0 < ratio < 4.5
+
+
+def test_scheduler_rate_limits_each_session():
+    scheduler = FairScheduler(slots=4, burst=1.0)
+    scheduler.register("slow", target_fps=10.0)
+    counts = _run(scheduler, ["slow"], 0.0, 1.0)
+    assert counts["slow"] <= 13
+    assert scheduler.rate_limited > 0
+
+
+def test_admission_degrades_then_rejects():
+    reg = SessionRegistry(capacity_fps=30.0, min_session_fps=10.0)
+    assert reg._admit(25.0, allow_degraded=True) == (25.0, False)
+    reg._sessions["a"] = StreamSession("a", manager=None, target_fps=18.0)
+    assert reg._admit(25.0, allow_degraded=True) == (12.0, True)
+    with pytest.raises(AdmissionError):
+        reg._admit(25.0, allow_degraded=False)
+    reg._sessions["b"] = StreamSession("b", manager=None, target_fps=8.0)
+    with pytest.raises(AdmissionError):
+        reg._admit(25.0, allow_degraded=True)
+
+
+def test_capacity_is_measured_from_slot_occupancy_not_capped_output():
+    # Configured estimate 30 fps, but 4 slots each freed after ~10 ms sustain far more
+    reg = SessionRegistry(capacity_fps=30.0, slots=4, min_session_fps=10.0)
+    reg._sessions["a"] = StreamSession("a", manager=None, target_fps=25.0)
+    with pytest.raises(AdmissionError):
+        reg._admit(25.0, allow_degraded=True)
+    reg.scheduler.register("a")
+    reg._measure_capacity()
+    _run(reg.scheduler, ["a"] * 4, 0.01, 1.2)
+    capacity = reg._measure_capacity()
+    assert capacity > 60.0
+    assert reg._admit(25.0, allow_degraded=False) == (25.0, False)
+
+
+def test_unknown_session_lookup():
+    reg = SessionRegistry()
+    assert reg.manager() is None
+    assert reg.manager("nope", required=False) is None
+    with pytest.raises(UnknownSessionError):
+        reg.manager("nope")
+
+
+def test_unknown_session_is_404_in_every_router():
+    from app.main import create_app
+
+    client = TestClient(create_app())
+    responses = [
+        client.get("/stream/quality", params={"session_id": "nope"}),
+        client.post("/stream/face", json={"path": "x.jpg", "session_id": "nope"}),
+        client.post("/models/dfm/select", json={"path": "x.onnx", "session_id": "nope"}),
+    ]
+    for r in responses:
+        assert r.status_code == 404
+        assert r.json() == {"detail": "Unknown session: nope"}
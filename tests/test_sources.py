@@ -0,0 +1,100 @@
+import time
+
+import av
+
+from app.processing.sources import FileSource, FrameSource
+
+
+class _Stream:
+    thread_type = None
+
+
+class _EmptyContainer:
+    """Accepts the connection, then ends the stream without a single frame."""
+
+    def __init__(self):
+        self.streams = type("Streams", (), {"video": [_Stream()]})()
+
+    def decode(self, stream):
+        return iter(())
+
+    def close(self):
+        pass
+
+
+class _EmptySource(FrameSource):
+    kind = "fake"
+
+    def __init__(self, **kwargs):
+        super().__init__(lambda frame, ts: None, **kwargs)
+        self.opens = 0
+
+    def _open(self):
+        self.opens += 1
+        return _EmptyContainer()
+
+
+class _ReopeningSource(FrameSource):
+    """Local stand-in for an RTSP server that closes the connection after a short clip."""
+
+    kind = "rtsp"
+
+    def __init__(self, sink, path, **kwargs):
+        super().__init__(sink, **kwargs)
+        self.path = path
+
+    def _open(self):
+        return av.open(self.path)
+
+
+def test_empty_stream_backs_off_instead_of_spinning():
+    src = _EmptySource(backoff_initial=0.05, backoff_max=1.0)
+    src.start()
+    time.sleep(0.5)
+    src.stop()
+    # 0.05 + 0.1 + 0.2 + 0.4 s of backoff: a handful of opens, not a tight loop
+    assert 2 <= src.opens <= 5
+    assert src.frames == 0
+
+
+def test_file_source_delivers_every_frame_then_stops(clip):
+    frames = []
+    src = FileSource(lambda f, ts: frames.append(f.shape), clip, loop=False, realtime=False)
+    src.start()
+    assert _wait(lambda: not src.running)
+    assert frames == [(48, 64, 3)] * 5
+    assert src.reconnects == 0
+
+
+def test_closed_stream_reconnects_with_backoff(clip):
+    opened = []
+    frames = []
+    src = _ReopeningSource(lambda f, ts: frames.append(ts), clip, backoff_initial=0.1, on_open=lambda: opened.append(1))
+    src.start()
+    assert _wait(lambda: src.reconnects >= 2)
+    src.stop()
+    assert len(opened) >= 3
+    # Each reopen delivers the clip again; backoff resets because frames were delivered
+    assert len(frames) >= 10
+    assert src.reconnects < 10
+
+
+def _wait(cond, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if cond():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_looping_file_keeps_its_pace_across_the_loop(clip):
+    stamps = []
+    src = FileSource(lambda f, ts: stamps.append(time.monotonic()), clip, loop=True, realtime=True)
+    src.start()
+    assert _wait(lambda: len(stamps) >= 12)
+    src.stop()
+    # 25 fps clip of 5 frames: the first frame of each pass follows the last one by a frame, too
+    gaps = [b - a for a, b in zip(stamps, stamps[1:12])]
+    assert min(gaps) > 0.025, gaps
+    assert abs((stamps[10] - stamps[0]) - 10 * 0.04) < 0.05
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from app.ai.face_detection import Detection
+from app.ai.face_tracking import FaceTracker
+from app.processing.buffer_pool import BufferPool
+from app.processing.pyramid import FramePyramid
+
+
+def _frames(n, w, h, step=6):
+    """Textured 200x200 'face' moving right by `step` px per frame over a flat background."""
+    rng = np.random.default_rng(0)
+    patch = rng.integers(0, 255, (200, 200, 3), dtype=np.uint8)
+    for i in range(n):
+        frame = np.full((h, w, 3), 90, np.uint8)
+        x = 300 + i * step
+        frame[200:400, x:x + 200] = patch
+        yield frame, (x, 200, x + 200, 400)
+
+
+def _track(w, h, use_pyramid):
+    pool = BufferPool()
+    tracker = FaceTracker(detect_interval=100, min_confidence=0.0)
+    boxes = []
+    for frame, truth in _frames(8, w, h):
+        buffers = []
+
+        def borrow(shape):
+            buf = pool.acquire(shape)
+            buffers.append(buf)
+            return buf
+
+        pyramid = FramePyramid(frame, borrow) if use_pyramid else None
+        out = tracker.step(frame, lambda f: [Detection(truth, 0.9)], lambda f, roi: [], pyramid)
+        boxes.append((out[0][1], truth))
+        # Frame leaves the pipeline: its pyramid levels go back to the pool for the next frame
+        for buf in buffers:
+            pool.release(buf)
+    assert tracker.full_detections == 1
+    return boxes
+
+
+@pytest.mark.parametrize("use_pyramid", [False, True])
+@pytest.mark.parametrize("size", [(1280, 720), (640, 480)])
+def test_tracked_box_follows_motion_between_keyframes(size, use_pyramid):
+    boxes = _track(*size, use_pyramid)
+    (first, _), (last, truth) = boxes[0], boxes[-1]
+    assert last[0] - first[0] > 30  # moved 42 px in total
+    assert abs(last[0] - truth[0]) <= 6
@@ -0,0 +1,70 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.loop_monitor import LoopLagMonitor
+from app.routers import webrtc
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(webrtc, "_pool", dict.fromkeys(webrtc._pool, 0))
+    monkeypatch.setattr(webrtc, "_window", {"start": time.monotonic(), "max_ms": 0.0, "prev_max_ms": 0.0})
+    return webrtc
+
+
+def test_pool_bounds_concurrency_and_counts_every_job(pool):
+    running, peak = [0], [0]
+    lock = threading.Lock()
+
+    def job(i):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.005)
+        with lock:
+            running[0] -= 1
+        return i
+
+    async def main():
+        return await asyncio.gather(*(pool.run_in_pool(job, i) for i in range(40)))
+
+    assert asyncio.run(main()) == list(range(40))
+    stats = pool.pool_stats()
+    assert peak[0] <= pool._WORKERS
+    assert stats["submitted"] == stats["completed"] == 40 and stats["in_flight"] == 0
+
+
+def test_completions_from_many_threads_are_not_lost(pool):
+    threads = [threading.Thread(target=lambda: [pool._timed(int) for _ in range(500)]) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert pool.pool_stats()["completed"] == 4000
+
+
+def test_peak_compute_time_expires_with_its_window(pool, monkeypatch):
+    monkeypatch.setattr(pool, "_POOL_WINDOW_S", 0.05)
+    pool._timed(time.sleep, 0.03)
+    assert pool.pool_stats()["compute_max_ms"] >= 25
+    time.sleep(0.12)
+    pool._timed(int)
+    assert pool.pool_stats()["compute_max_ms"] < 25
+
+
+def test_loop_lag_monitor_sees_a_blocked_loop():
+    async def main():
+        monitor = LoopLagMonitor(interval=0.01, stall_ms=50.0)
+        monitor.start()
+        await asyncio.sleep(0.05)
+        time.sleep(0.1)  # blocks the event loop
+        await asyncio.sleep(0.05)
+        monitor.stop()
+        return monitor.stats()
+
+    stats = asyncio.run(main())
+    assert stats["stalls"] >= 1 and stats["lag_max_ms"] >= 50
+    assert stats["samples"] > 3